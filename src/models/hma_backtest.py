@@ -0,0 +1,356 @@
+"""
+HMAトレンド転換のシグナル生成とバックテスト（Experts/ExpertHMA_TrailingATR.mq5 を模擬）
+
+- シグナル・トレンド・モード判定は配列演算で一括計算
+- 約定・スプレッド・SL/TP・ATRトレーリングは NumPy 配列上のループで模擬
+  （numba があれば njit でコンパイル、なければ同じループを Python で実行）
+- 出力は取引一覧とバーごとの損益曲線
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# 決済理由
+EXIT_SIGNAL = 0
+EXIT_STOP_LOSS = 1
+EXIT_TAKE_PROFIT = 2
+EXIT_TRAILING_STOP = 3
+EXIT_END_OF_DATA = 4
+EXIT_REASONS = {
+    EXIT_SIGNAL: "signal",
+    EXIT_STOP_LOSS: "stop_loss",
+    EXIT_TAKE_PROFIT: "take_profit",
+    EXIT_TRAILING_STOP: "trailing_stop",
+    EXIT_END_OF_DATA: "end_of_data",
+}
+
+
+# === シグナル（配列演算） ===
+def hma_colors(hma):
+    """
+    hma_chart_plot_GV.mq5 の色バッファ（0: 上昇/緑, 1: 下降/赤）
+    HMAが計算できない位置は直前の色を引き継ぎ、先頭は NaN
+    """
+    hma = np.asarray(hma, dtype=np.float64)
+    dy = np.diff(hma, prepend=np.nan)
+    colors = np.where(dy > 0, 0.0, 1.0)
+    colors[np.isnan(dy)] = np.nan
+    return pd.Series(colors).ffill().values
+
+
+def flip_signals(colors):
+    """
+    確定足で色が変わったバーの次のバーに +1(買い転換) / -1(売り転換)
+    （i-2 → i-1 の色変化を i 本目の始値で執行。EAの GetM1Signal と同じ判定）
+    """
+    colors = np.asarray(colors, dtype=np.float64)
+    signals = np.zeros(len(colors), dtype=np.int8)
+    if len(colors) < 3:
+        return signals
+    prev2, prev1 = colors[:-2], colors[1:-1]
+    changed = (prev1 != prev2) & ~np.isnan(prev1) & ~np.isnan(prev2)
+    signals[2:][changed & (prev1 == 0)] = 1
+    signals[2:][changed & (prev1 == 1)] = -1
+    return signals
+
+
+def legacy_trend_signals(hma):
+    """
+    model_hma.py 従来ループと同じシグナル（'BUY' / 'SELL' / ''）
+
+    i 本目のトレンドは hma[i-2] と hma[i-1] の比較（上昇で 'SELL'、下降で 'BUY'、同値・NaNは前回を維持）、
+    トレンドが変わったバーにだけシグナルを付ける
+    """
+    hma = np.asarray(hma, dtype=np.float64)
+    n = len(hma)
+    signals = np.full(n, "", dtype=object)
+    if n < 3:
+        return signals
+    prev2, prev1 = hma[:-2], hma[1:-1]
+    trend = np.full(n, np.nan)
+    trend[2:] = np.where(prev2 < prev1, -1.0, np.where(prev2 > prev1, 1.0, np.nan))
+    trend = pd.Series(trend).ffill().values
+    prev_trend = np.concatenate(([np.nan], trend[:-1]))
+    flipped = ~np.isnan(prev_trend) & (trend != prev_trend)
+    signals[flipped & (trend == 1)] = "BUY"
+    signals[flipped & (trend == -1)] = "SELL"
+    return signals
+
+
+def average_true_range(high, low, close, period=14):
+    """MT5 の iATR と同じく True Range の単純移動平均"""
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    tr[0] = high[0] - low[0]
+    return pd.Series(tr).rolling(period).mean().values
+
+
+def align_higher_timeframe(times, htf_times, htf_values, htf_seconds):
+    """
+    上位足の値を下位足の各バーへ割り当てる（i 本目の始値時点で確定済みの上位足の値）
+
+    EA は形成中のM5足の色を参照するが、履歴データでは確定後の値しかないため、
+    先読みを避けて直前に確定した上位足を使う
+    """
+    times = np.asarray(times, dtype="datetime64[ns]")
+    htf_close_times = np.asarray(htf_times, dtype="datetime64[ns]") + np.timedelta64(int(htf_seconds), "s")
+    idx = np.searchsorted(htf_close_times, times, side="right") - 1
+    values = np.asarray(htf_values, dtype=np.float64)
+    out = np.full(len(times), np.nan)
+    valid = idx >= 0
+    out[valid] = values[idx[valid]]
+    return out
+
+
+def trading_modes(signal_hma, trend_colors, trend_hma):
+    """
+    EA の CheckAndExecuteTrades の前処理を配列で計算
+
+    Returns:
+    - trend: +1(M5上昇) / -1(M5下降) / 0(不明)
+    - reversal: M5上昇中にM1 HMA < M5 HMA、またはM5下降中にM1 HMA > M5 HMA（ドテンモード）
+    いずれも i 本目の始値で参照する値（確定足 i-1 の HMA を使用）
+    """
+    signal_hma = np.asarray(signal_hma, dtype=np.float64)
+    hma_m1 = np.concatenate(([np.nan], signal_hma[:-1]))
+    trend_colors = np.asarray(trend_colors, dtype=np.float64)
+    trend = np.where(trend_colors == 0, 1, np.where(trend_colors == 1, -1, 0)).astype(np.int8)
+    trend_hma = np.asarray(trend_hma, dtype=np.float64)
+    reversal = ((trend == 1) & (hma_m1 < trend_hma)) | ((trend == -1) & (hma_m1 > trend_hma))
+    return trend, reversal
+
+
+# === 約定シミュレーション ===
+def _simulate(open_, high, low, close, spread, signals, trend, reversal, atr, atr_multiplier,
+              use_trend, sl_distance, tp_distance, use_trailing, activation_distance):
+    """
+    バーごとの約定シミュレーション（価格はBid、Askは Bid + spread）
+
+    - シグナルは i 本目の始値で執行（買いは Ask、売りは Bid）
+    - SL/TP は i 本目の高値・安値で判定し、ギャップ時は始値で約定。同じバーで両方に掛かる場合はSLを優先
+    - トレーリングは i-1 本目のATRで、i 本目の有利側の極値から新SLを計算し、i+1 本目から適用
+
+    numba があれば NumPy 配列のまま njit で、なければ Python リストで同じループを実行する
+    （NaN 判定は両方で速い x != x を使う）
+    """
+    n = len(close)
+    entry_index = np.zeros(n, dtype=np.int64)
+    exit_index = np.zeros(n, dtype=np.int64)
+    sides = np.zeros(n, dtype=np.int8)
+    entry_prices = np.zeros(n)
+    exit_prices = np.zeros(n)
+    exit_reasons = np.zeros(n, dtype=np.int8)
+    equity = np.zeros(n)
+
+    nan = np.nan
+    n_trades = 0
+    position = 0
+    entry_price = 0.0
+    stop = nan
+    target = nan
+    trailed = False
+    realized = 0.0
+
+    for i in range(n):
+        sp = spread[i]
+        o = open_[i]
+
+        # --- 1. 始値でのシグナル執行（EA の CheckAndExecuteTrades） ---
+        sig = signals[i]
+        close_now = False
+        open_side = 0
+        if use_trend:
+            t = trend[i]
+            if t != 0:
+                if reversal[i]:
+                    # ドテンモード：M1の転換でドテン
+                    if sig == 1 and position <= 0:
+                        close_now = position == -1
+                        open_side = 1
+                    elif sig == -1 and position >= 0:
+                        close_now = position == 1
+                        open_side = -1
+                else:
+                    # 通常モード：M1転換またはM5トレンド逆行で決済、M5トレンド方向の転換でのみ新規
+                    if position == 1 and (sig == -1 or t == -1):
+                        close_now = True
+                    elif position == -1 and (sig == 1 or t == 1):
+                        close_now = True
+                    if position == 0 or close_now:
+                        if t == 1 and sig == 1:
+                            open_side = 1
+                        elif t == -1 and sig == -1:
+                            open_side = -1
+        elif sig != 0 and sig != position:
+            close_now = position != 0
+            open_side = sig
+
+        if close_now:
+            price = o if position == 1 else o + sp
+            exit_index[n_trades] = i
+            exit_prices[n_trades] = price
+            exit_reasons[n_trades] = EXIT_SIGNAL
+            realized += (price - entry_price) * position
+            n_trades += 1
+            position = 0
+
+        if open_side != 0 and position == 0:
+            position = open_side
+            entry_price = o + sp if position == 1 else o
+            entry_index[n_trades] = i
+            entry_prices[n_trades] = entry_price
+            sides[n_trades] = position
+            stop = entry_price - position * sl_distance if sl_distance > 0 else nan
+            target = entry_price + position * tp_distance if tp_distance > 0 else nan
+            trailed = False
+
+        # --- 2. バー内の SL/TP ---
+        if position != 0:
+            exit_price = nan
+            reason = EXIT_SIGNAL
+            if position == 1:
+                if stop == stop and low[i] <= stop:
+                    exit_price = min(o, stop)
+                    reason = EXIT_TRAILING_STOP if trailed else EXIT_STOP_LOSS
+                elif target == target and high[i] >= target:
+                    exit_price = max(o, target)
+                    reason = EXIT_TAKE_PROFIT
+            else:
+                if stop == stop and high[i] + sp >= stop:
+                    exit_price = max(o + sp, stop)
+                    reason = EXIT_TRAILING_STOP if trailed else EXIT_STOP_LOSS
+                elif target == target and low[i] + sp <= target:
+                    exit_price = min(o + sp, target)
+                    reason = EXIT_TAKE_PROFIT
+
+            if exit_price == exit_price:
+                exit_index[n_trades] = i
+                exit_prices[n_trades] = exit_price
+                exit_reasons[n_trades] = reason
+                realized += (exit_price - entry_price) * position
+                n_trades += 1
+                position = 0
+
+        # --- 3. トレーリングストップ更新（EA の DoTrailingStop、次のバーから有効） ---
+        if position != 0 and use_trailing and i > 0 and atr[i - 1] == atr[i - 1]:
+            distance = atr[i - 1] * atr_multiplier[i]
+            if position == 1:
+                best_bid = high[i]
+                if best_bid - entry_price > activation_distance:
+                    new_stop = best_bid - distance
+                    if stop != stop or new_stop > stop:
+                        stop = new_stop
+                        trailed = True
+            else:
+                best_ask = low[i] + sp
+                if entry_price - best_ask > activation_distance:
+                    new_stop = best_ask + distance
+                    if stop != stop or new_stop < stop:
+                        stop = new_stop
+                        trailed = True
+
+        # --- 4. 損益曲線（終値で評価） ---
+        if position == 1:
+            equity[i] = realized + close[i] - entry_price
+        elif position == -1:
+            equity[i] = realized + entry_price - (close[i] + sp)
+        else:
+            equity[i] = realized
+
+    if position != 0:
+        price = close[n - 1] if position == 1 else close[n - 1] + spread[n - 1]
+        exit_index[n_trades] = n - 1
+        exit_prices[n_trades] = price
+        exit_reasons[n_trades] = EXIT_END_OF_DATA
+        n_trades += 1
+
+    return (entry_index[:n_trades], exit_index[:n_trades], sides[:n_trades],
+            entry_prices[:n_trades], exit_prices[:n_trades], exit_reasons[:n_trades], equity)
+
+
+_simulate_compiled = njit(cache=True)(_simulate) if NUMBA_AVAILABLE else None
+
+
+def run_backtest(df, signals, trend=None, reversal=None, atr=None, point=0.00001,
+                 spread_points=None, sl_points=0.0, tp_points=0.0,
+                 use_trailing=True, activation_points=10.0, atr_multiplier=1.5,
+                 lot_size=0.01, contract_size=100000):
+    """
+    バックテストを実行
+
+    Parameters:
+    - df: time/open/high/low/close（Bid）と任意で spread（ポイント）列を持つDataFrame
+    - signals: flip_signals() の結果（+1 / -1 / 0, i 本目の始値で執行）
+    - trend, reversal: trading_modes() の結果。None なら転換のたびにドテン
+    - atr: トレーリング用ATR（None なら average_true_range(期間14)）
+    - spread_points: スプレッド（ポイント）。None なら df['spread']、列が無ければ0
+    - sl_points, tp_points: 固定SL/TP（ポイント、0で無効）
+    - activation_points, atr_multiplier: EAの TS_ActivationPips（×_Point）と ATR係数
+      （atr_multiplier は配列も可。EAの MIN + (MAX-MIN) × 信頼度 に相当）
+
+    Returns:
+    - trades: 取引一覧（pnl は口座通貨）
+    - equity: バーごとの損益曲線（終値評価、口座通貨）
+    """
+    n = len(df)
+    open_, high, low, close = (df[c].to_numpy(dtype=np.float64) for c in ("open", "high", "low", "close"))
+    if spread_points is None:
+        spread_points = df["spread"].to_numpy(dtype=np.float64) if "spread" in df else 0.0
+    spread = np.broadcast_to(np.asarray(spread_points, dtype=np.float64) * point, (n,)).copy()
+    if atr is None:
+        atr = average_true_range(high, low, close)
+    multiplier = np.broadcast_to(np.asarray(atr_multiplier, dtype=np.float64), (n,)).copy()
+
+    use_trend = trend is not None
+    trend = np.asarray(trend, dtype=np.int8) if use_trend else np.zeros(n, dtype=np.int8)
+    reversal = np.asarray(reversal, dtype=np.bool_) if reversal is not None else np.zeros(n, dtype=np.bool_)
+
+    args = (open_, high, low, close, spread, np.asarray(signals, dtype=np.int8), trend, reversal,
+            np.asarray(atr, dtype=np.float64), multiplier, use_trend,
+            float(sl_points) * point, float(tp_points) * point, bool(use_trailing),
+            float(activation_points) * point)
+    if NUMBA_AVAILABLE:
+        result = _simulate_compiled(*args)
+    else:
+        result = _simulate(*(a.tolist() if isinstance(a, np.ndarray) else a for a in args))
+    entry_idx, exit_idx, sides, entry_prices, exit_prices, reasons, equity = result
+
+    units = lot_size * contract_size
+    times = df["time"].to_numpy()
+    trades = pd.DataFrame({
+        "entry_time": times[entry_idx],
+        "exit_time": times[exit_idx],
+        "side": np.where(sides == 1, "BUY", "SELL"),
+        "entry_price": entry_prices,
+        "exit_price": exit_prices,
+        "exit_reason": [EXIT_REASONS[r] for r in reasons],
+        "bars_held": exit_idx - entry_idx,
+    })
+    trades["pnl"] = (exit_prices - entry_prices) * sides * units
+    trades["pnl_points"] = (exit_prices - entry_prices) * sides / point
+
+    equity_curve = pd.DataFrame({"time": times, "equity": equity * units})
+    equity_curve["drawdown"] = equity_curve["equity"] - equity_curve["equity"].cummax()
+    return trades, equity_curve
+
+
+def summarize(trades, equity_curve):
+    """主要な成績指標"""
+    if trades.empty:
+        return {"trades": 0}
+    wins = trades["pnl"] > 0
+    gross_loss = -trades.loc[~wins, "pnl"].sum()
+    return {
+        "trades": len(trades),
+        "win_rate": float(wins.mean()),
+        "net_pnl": float(trades["pnl"].sum()),
+        "profit_factor": float(trades.loc[wins, "pnl"].sum() / gross_loss) if gross_loss > 0 else float("inf"),
+        "max_drawdown": float(equity_curve["drawdown"].min()),
+        "exit_reasons": trades["exit_reason"].value_counts().to_dict(),
+    }
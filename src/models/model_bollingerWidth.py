@@ -1,5 +1,50 @@
+import math
+import os
+import sys
+
 import pandas as pd
-import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python_indicator"))
+from indicators import BollingerBands, band_width_rate
+
+
+def _sigma_key(sigma):
+    return f"{sigma:g}"
+
+
+def _sigma_columns(columns, sma, std, sigmas):
+    for sigma in sigmas:
+        key = _sigma_key(sigma)
+        band = sigma * std
+        columns[f'upper_{key}'] = sma + band
+        columns[f'lower_{key}'] = sma - band
+        columns[f'width_{key}'] = 2.0 * band
+    return columns
+
+
+def bollinger_width_series(close, period=20, sigmas=(3,), ddof=0):
+    """
+    全バーのボリンジャーバンドを複数のσでまとめて計算（移動平均・標準偏差は indicators.BollingerBands で1回だけ計算）
+
+    Parameters:
+    - close: pd.Series または 1次元配列
+    - period: 移動平均と標準偏差の期間
+    - sigmas: 標準偏差の乗数の一覧
+    - ddof: 既定の 0 は MQL5 の iStdDev と同じ母標準偏差（BollingerWidthStream と同じ）。
+      1 は標本標準偏差（従来の calculate_bollinger_width）
+
+    Returns:
+    - DataFrame: sma, std, width_rate と、σごとの upper_{σ}, lower_{σ}, width_{σ}
+      （width_rate は Indicators/BollingerWidth.mq5 の WidthChangeRate(%)。σによらず同じ値）
+    """
+    index = close.index if isinstance(close, pd.Series) else None
+    # nbdev=1 のバンド幅は 2σ
+    _, sma, _, width = BollingerBands(period, 1.0, ddof=ddof).batch(close)
+    std = width / 2.0
+
+    columns = {'sma': sma, 'std': std, 'width_rate': band_width_rate(width * max(sigmas))}
+    return pd.DataFrame(_sigma_columns(columns, sma, std, sigmas), index=index)
+
 
 def calculate_bollinger_width(df, period=20, sigma=3):
     """
@@ -9,39 +54,60 @@ def calculate_bollinger_width(df, period=20, sigma=3):
     - df: DataFrame, 必須カラム 'close'
     - period: 移動平均と標準偏差の期間（デフォルト: 20）
     - sigma: 標準偏差の乗数（デフォルト: 3）
+    標準偏差は従来どおり標本標準偏差（ddof=1）
 
     Returns:
     - 最新のボリンジャーバンド幅（上バンド - 下バンド）
     - 最新の中心線（SMA）、上バンド、下バンド
     """
-    close = df['close']
+    # 必要なのは最新値だけなので、最後の period 本だけで計算
+    bands = bollinger_width_series(df['close'].iloc[-period:], period, (sigma,), ddof=1)
+    key = _sigma_key(sigma)
+    latest = bands.iloc[-1]
 
-    sma = close.rolling(window=period).mean()
-    std = close.rolling(window=period).std()
+    return {
+        'width': latest[f'width_{key}'],
+        'sma': latest['sma'],
+        'upper_band': latest[f'upper_{key}'],
+        'lower_band': latest[f'lower_{key}']
+    }
 
-    upper = sma + sigma * std
-    lower = sma - sigma * std
 
-    # 最新バー（バー0）の値幅
-    latest_width = upper.iloc[-1] - lower.iloc[-1]
+class BollingerWidthStream:
+    """
+    ライブフィード用のボリンジャーバンド幅（1ティックあたり O(1)、計算は indicators.BollingerBands）
 
-    return {
-        'width': latest_width,
-        'sma': sma.iloc[-1],
-        'upper_band': upper.iloc[-1],
-        'lower_band': lower.iloc[-1]
-    }
+    - 新しいバーの最初のティックは update(close, new_bar=True)、同じバーの以降のティックは new_bar=False
+      （形成中バーの終値を差し替えるだけで、ウィンドウ全体は再計算しない）
+    - 既定の ddof=0 は Indicators/BollingerWidth.mq5（iStdDev）・bollinger_width_series と同じ
+    """
+
+    def __init__(self, period=20, sigmas=(3,), ddof=0):
+        self.period = period
+        self.sigmas = tuple(sigmas)
+        self.ddof = ddof
+        self._bands = BollingerBands(period, 1.0, ddof=ddof)
+        self._prev_std = float('nan')  # 直前の確定足の標準偏差
+        self._std = float('nan')
+
+    def update(self, close, new_bar=True):
+        if new_bar:
+            # 形成中だったバーが確定したので、その標準偏差を前回値として保持
+            self._prev_std = self._std
+        _, sma, _, width = self._bands.update(close, new_bar)
+        self._std = width / 2.0
+        if math.isnan(sma):
+            return None
+
+        prev = self._prev_std
+        max_sigma = max(self.sigmas)
+        if math.isnan(prev):
+            rate = float('nan')
+        elif prev * 2.0 * max_sigma > 1e-8:
+            rate = (self._std - prev) / prev * 100.0
+        else:
+            rate = 0.0
+
+        result = {'sma': sma, 'std': self._std, 'width_rate': rate}
+        return _sigma_columns(result, sma, self._std, self.sigmas)
 
-# --- 使用例 ---
-# 仮の終値データを生成
-# 実際はOHLCVのDataFrameを読み込んで使う
-data = {
-    'close': np.random.normal(loc=100, scale=1, size=100)
-}
-df = pd.DataFrame(data)
-
-result = calculate_bollinger_width(df)
-print(f"ボリンジャーバンド ±3σ の値幅: {result['width']:.4f}")
-print(f"中心線: {result['sma']:.4f}")
-print(f"上バンド: {result['upper_band']:.4f}")
-print(f"下バンド: {result['lower_band']:.4f}")
\ No newline at end of file
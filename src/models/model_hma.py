@@ -4,35 +4,32 @@ from datetime import datetime
 import sys
 
 sys.path.append("C:/MT5_portable/MQL5/src/python_indicator")
+sys.path.append("C:/MT5_portable/MQL5/src/utils")
+sys.path.append("C:/MT5_portable/MQL5/src/models")
 from hma import hull_moving_average
+from bar_store import BarStore
+from hma_backtest import (legacy_trend_signals, hma_colors, flip_signals,
+                          run_backtest, summarize)
 
 
-# ① M5データ読み込み
-input_path = "C:/MT5_portable/MQL5/src/data/EURUSD_M5.csv"
-df = pd.read_csv(input_path)
+# ① M5データ読み込み（指定期間のパーティションのみ読む。None は全期間）
+store_dir = "C:/MT5_portable/MQL5/src/data/bars"
+symbol = "EURUSD"
+timeframe = "M5"
+start = None  # 例: "2025-01-01"
+end = None
+df = BarStore(store_dir).read_range(symbol, timeframe, start, end)
+if df.empty:
+    period = "" if start is None and end is None else f" ({start or ''} - {end or ''})"
+    raise FileNotFoundError(f"no bars in store for {symbol} {timeframe}{period} — run fill_missing_bars first "
+                            f"(store: {store_dir})")
 df['time'] = pd.to_datetime(df['time']).dt.tz_localize('UTC')
 
 # ② HMA計算（期間21）
 df['hma'] = hull_moving_average(df['close'], period=21)
 
-# ③ シグナル判定
-df['signal'] = ""
-prev_trend = None
-
-for i in range(2, len(df)):
-    # 現在のトレンド判定
-    if df['hma'].iloc[i-2] < df['hma'].iloc[i-1]:
-        curr_trend = "SELL"
-    elif df['hma'].iloc[i-2] > df['hma'].iloc[i-1]:
-        curr_trend = "BUY"
-    else:
-        curr_trend = prev_trend  # 変化なし
-
-    # トレンドが変化した時だけシグナルを出す
-    if prev_trend is not None and curr_trend != prev_trend:
-        df.at[df.index[i], 'signal'] = curr_trend
-
-    prev_trend = curr_trend
+# ③ シグナル判定（従来ループと同じ判定を配列演算で）
+df['signal'] = legacy_trend_signals(df['hma'].values)
 
 #出力用のtrade_idを付ける
 df['trade_id'] = range(len(df))
@@ -58,4 +55,16 @@ df_out['label'] = df_out.index
 
 # CSV 出力
 df_out.to_csv(output_path, index=False)
-print(f"[INFO] 出力完了: {output_path}")
\ No newline at end of file
+print(f"[INFO] 出力完了: {output_path}")
+
+# ⑥ バックテスト（HMA転換でドテン + ATRトレーリング。ExpertHMA_TrailingATR.mq5 の既定値）
+signals = flip_signals(hma_colors(df['hma'].values))
+trades, equity = run_backtest(
+    df, signals,
+    activation_points=10.0,  # TS_ActivationPips
+    atr_multiplier=1.5,      # TS_AtrMultiplier_MIN
+    lot_size=0.01,
+)
+trades.to_csv(os.path.join(output_dir, f"model_hma_trades_{timestamp}.csv"), index=False)
+equity.to_csv(os.path.join(output_dir, f"model_hma_equity_{timestamp}.csv"), index=False)
+print(f"[INFO] バックテスト: {summarize(trades, equity)}")
\ No newline at end of file
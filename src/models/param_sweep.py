@@ -0,0 +1,225 @@
+"""
+HMA / ボリンジャーバンド幅ストラテジーのパラメータスイープ
+
+- 銘柄×時間足のバーは親プロセスで1回だけ読み込み、共有メモリに置いて全ワーカーから参照
+  （ワーカーへはブロック名と形状だけを渡すので、実行数が増えてもデータはコピーされない）
+- パラメータの組み合わせをプロセスプールに分配し、成績順に並べた表をCSVに出力
+"""
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+sys.path.append("C:/MT5_portable/MQL5/src/python_indicator")
+sys.path.append("C:/MT5_portable/MQL5/src/utils")
+sys.path.append("C:/MT5_portable/MQL5/src/models")
+from hma import hull_moving_average
+from indicators import BollingerBands, band_width_rate
+from hma_backtest import hma_colors, flip_signals, run_backtest, summarize
+
+# 共有メモリに置く列（time は秒単位で float64 に格納。2^53 秒まで誤差なし）
+SERIES_COLUMNS = ["time", "open", "high", "low", "close", "spread"]
+
+
+# === 共有メモリ ===
+def _open_shared(name):
+    """
+    既存の共有メモリに接続
+
+    プール内のワーカーは親と同じ resource_tracker を使うため、登録解除はしない
+    （解除すると親の unlink 時に未登録エラーになる）。削除は親の run_sweep が行う
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def share_series(df):
+    """バーを (列数, 本数) の float64 配列として共有メモリへ置く"""
+    values = np.empty((len(SERIES_COLUMNS), len(df)), dtype=np.float64)
+    values[0] = pd.to_datetime(df["time"]).to_numpy(dtype="datetime64[s]").astype(np.int64)
+    for row, col in enumerate(SERIES_COLUMNS[1:], start=1):
+        values[row] = df[col].to_numpy(dtype=np.float64) if col in df else 0.0
+
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+    return shm, {"name": shm.name, "shape": values.shape}
+
+
+# ワーカー内で接続済みの共有メモリ（プロセスごとに1回だけ接続）
+_worker_series = {}
+_worker_handles = []
+
+
+def _init_worker(descriptors):
+    for key, desc in descriptors.items():
+        shm = _open_shared(desc["name"])
+        _worker_handles.append(shm)
+        _worker_series[key] = np.ndarray(desc["shape"], dtype=np.float64, buffer=shm.buf)
+
+
+def _series_frame(values):
+    """共有メモリ上の配列をコピーせずに DataFrame 化（run_backtest の入力形式）"""
+    df = pd.DataFrame({col: values[row] for row, col in enumerate(SERIES_COLUMNS[1:], start=1)}, copy=False)
+    df.insert(0, "time", pd.to_datetime(values[0].astype(np.int64), unit="s"))
+    return df
+
+
+# === ストラテジー ===
+def hma_strategy_signals(df, period=21):
+    """HMAの色転換（model_hma.py / ExpertHMA_TrailingATR.mq5 と同じ判定）"""
+    hma = hull_moving_average(df["close"].to_numpy(), period)
+    return flip_signals(hma_colors(hma))
+
+
+def bb_width_strategy_signals(df, period=20, sigma=3.0, min_width_rate=0.0):
+    """
+    バンド幅拡大中のブレイクアウト
+
+    確定足の終値がバンド外にあり、バンド幅の変化率（Indicators/BollingerWidth.mq5 の WidthChangeRate, %）が
+    min_width_rate を超えていれば、次のバーの始値でブレイク方向へ（逆方向のブレイクでドテン）
+    """
+    close = df["close"].to_numpy()
+    upper, _, lower, width = BollingerBands(period, sigma, ddof=1).batch(close)
+    expanding = band_width_rate(width) > min_width_rate
+    raw = np.where(expanding & (close > upper), 1, np.where(expanding & (close < lower), -1, 0))
+    signals = np.zeros(len(close), dtype=np.int8)
+    signals[1:] = raw[:-1]
+    return signals
+
+
+STRATEGIES = {
+    "hma": hma_strategy_signals,
+    "bb_width": bb_width_strategy_signals,
+}
+
+
+def _run_one(task):
+    """1つのパラメータの組み合わせを実行（ワーカー側）"""
+    started = time.perf_counter()
+    df = _series_frame(_worker_series[(task["symbol"], task["timeframe"])])
+    signals = STRATEGIES[task["strategy"]](df, **task["params"])
+    trades, equity = run_backtest(df, signals, **task["backtest"])
+    stats = summarize(trades, equity)
+    stats.pop("exit_reasons", None)
+
+    row = {"strategy": task["strategy"], "symbol": task["symbol"], "timeframe": task["timeframe"]}
+    row.update(task["params"])
+    row.update(stats)
+    row["seconds"] = round(time.perf_counter() - started, 3)
+    return row
+
+
+# === スイープ ===
+def expand_grid(strategy_grids, symbols, timeframes):
+    """
+    {ストラテジー名: {パラメータ名: [候補, ...]}} を実行単位の一覧に展開
+
+    例: {'hma': {'period': [13, 21, 34]}, 'bb_width': {'period': [20], 'sigma': [2.0, 3.0]}}
+    """
+    tasks = []
+    for strategy, grid in strategy_grids.items():
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        names = list(grid)
+        for values in itertools.product(*(grid[name] for name in names)):
+            for symbol in symbols:
+                for timeframe in timeframes:
+                    tasks.append({"strategy": strategy, "symbol": symbol, "timeframe": timeframe,
+                                  "params": dict(zip(names, values))})
+    return tasks
+
+
+def run_sweep(load_series, strategy_grids, symbols, timeframes, workers=None,
+              backtest_kwargs=None, rank_by="net_pnl", log=print):
+    """
+    パラメータスイープを実行して成績順の DataFrame を返す
+
+    Parameters:
+    - load_series: (symbol, timeframe) -> DataFrame（time/open/high/low/close/spread）
+    - strategy_grids: expand_grid() の形式
+    - workers: プロセス数（None なら CPU コア数）
+    - backtest_kwargs: run_backtest に渡す共通の引数
+    - rank_by: 並べ替えの基準列（降順）
+    """
+    workers = workers or os.cpu_count() or 1
+    backtest_kwargs = backtest_kwargs or {}
+
+    handles = []
+    descriptors = {}
+    rows_by_series = {}
+    try:
+        for symbol in symbols:
+            for timeframe in timeframes:
+                df = load_series(symbol, timeframe)
+                if df is None or df.empty:
+                    log(f"[SWEEP] No bars for {symbol} {timeframe}, skipped")
+                    continue
+                shm, desc = share_series(df)
+                handles.append(shm)
+                descriptors[(symbol, timeframe)] = desc
+                rows_by_series[(symbol, timeframe)] = len(df)
+                log(f"[SWEEP] Shared {symbol} {timeframe}: {len(df)} bars ({shm.size / 1e6:.1f} MB)")
+
+        tasks = [t for t in expand_grid(strategy_grids, symbols, timeframes)
+                 if (t["symbol"], t["timeframe"]) in descriptors]
+        for task in tasks:
+            task["backtest"] = backtest_kwargs
+        # 長い系列から先に投入して、最後に1プロセスだけが走る時間を減らす
+        tasks.sort(key=lambda t: rows_by_series[(t["symbol"], t["timeframe"])], reverse=True)
+        log(f"[SWEEP] {len(tasks)} runs on {workers} workers")
+
+        started = time.perf_counter()
+        chunksize = max(1, len(tasks) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(descriptors,)) as pool:
+            rows = list(pool.map(_run_one, tasks, chunksize=chunksize))
+        elapsed = time.perf_counter() - started
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame(rows)
+    if not results.empty and rank_by in results:
+        results = results.sort_values(rank_by, ascending=False, kind="mergesort").reset_index(drop=True)
+        results.insert(0, "rank", range(1, len(results) + 1))
+    busy = results["seconds"].sum() if not results.empty else 0.0
+    log(f"[SWEEP] Done in {elapsed:.1f}s (worker time {busy:.1f}s, "
+        f"parallel efficiency {busy / (elapsed * workers) if elapsed > 0 else 0:.0%})")
+    return results
+
+
+if __name__ == "__main__":
+    from bar_store import BarStore
+
+    # === 設定 ===
+    store_dir = "C:/MT5_portable/MQL5/src/data/bars"
+    output_dir = "C:/MT5_portable/MQL5/src/models/results/"
+    symbols = ["EURUSD"]
+    timeframes = ["M5"]
+    start = None  # 例: "2024-01-01"
+    end = None
+    strategy_grids = {
+        "hma": {"period": [9, 13, 16, 21, 26, 34, 41, 55]},
+        "bb_width": {"period": [10, 14, 20, 26, 34], "sigma": [1.5, 2.0, 2.5, 3.0]},
+    }
+    backtest_kwargs = {"activation_points": 10.0, "atr_multiplier": 1.5, "lot_size": 0.01}
+
+    store = BarStore(store_dir)
+    results = run_sweep(
+        lambda symbol, tf: store.read_range(symbol, tf, start, end),
+        strategy_grids, symbols, timeframes, backtest_kwargs=backtest_kwargs
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"param_sweep_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv")
+    results.to_csv(output_path, index=False)
+    print(results.head(20).to_string(index=False))
+    print(f"[INFO] 出力完了: {output_path}")
@@ -0,0 +1,130 @@
+# HMAシグナルの配列演算版と従来ループの一致、および約定シミュレーションの決済ケースの確認
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from hma_backtest import legacy_trend_signals, run_backtest
+
+POINT = 0.0001
+
+
+def legacy_loop(hma):
+    """model_hma.py の従来のシグナル判定ループ"""
+    df = pd.DataFrame({'hma': hma})
+    df['signal'] = ""
+    prev_trend = None
+    for i in range(2, len(df)):
+        if df['hma'].iloc[i-2] < df['hma'].iloc[i-1]:
+            curr_trend = "SELL"
+        elif df['hma'].iloc[i-2] > df['hma'].iloc[i-1]:
+            curr_trend = "BUY"
+        else:
+            curr_trend = prev_trend
+        if prev_trend is not None and curr_trend != prev_trend:
+            df.at[df.index[i], 'signal'] = curr_trend
+        prev_trend = curr_trend
+    return df['signal'].values
+
+
+def test_legacy_trend_signals_matches_loop():
+    rng = np.random.default_rng(7)
+    hma = 1.1 + np.cumsum(rng.normal(0, 0.0005, 2000))
+    hma[:20] = np.nan           # ウォームアップ
+    hma[500:510] = hma[499]     # 横ばい（前回のトレンドを維持）
+    hma[1200] = np.nan          # 途中の欠損
+    result = legacy_trend_signals(hma)
+    expected = legacy_loop(hma)
+    np.testing.assert_array_equal(result, expected)
+    assert (result != "").sum() > 100
+
+
+@pytest.mark.parametrize("hma", [[], [1.0], [1.0, 1.1]])
+def test_legacy_trend_signals_short_input(hma):
+    assert (legacy_trend_signals(hma) == "").all()
+
+
+def bars(rows):
+    """(open, high, low, close) の行から1分足のDataFrame"""
+    df = pd.DataFrame(rows, columns=["open", "high", "low", "close"])
+    df.insert(0, "time", pd.date_range("2024-07-01", periods=len(df), freq="min"))
+    return df
+
+
+def backtest(df, signals, **kwargs):
+    kwargs.setdefault("spread_points", 0.0)
+    kwargs.setdefault("use_trailing", False)
+    return run_backtest(df, signals, point=POINT, **kwargs)
+
+
+def test_stop_loss_gap_fills_at_open():
+    df = bars([
+        (1.0000, 1.0005, 0.9995, 1.0000),
+        (1.0000, 1.0002, 0.9995, 1.0000),  # 買い（SL 0.9990）
+        (0.9980, 0.9985, 0.9975, 0.9980),  # SLより下で寄り付き
+        (0.9980, 0.9985, 0.9975, 0.9980),
+    ])
+    trades, _ = backtest(df, [0, 1, 0, 0], sl_points=10)
+    assert len(trades) == 1
+    trade = trades.iloc[0]
+    assert trade["exit_reason"] == "stop_loss"
+    assert trade["exit_price"] == pytest.approx(0.9980)
+    assert trade["bars_held"] == 1
+
+
+def test_take_profit_gap_fills_at_open():
+    df = bars([
+        (1.0000, 1.0005, 0.9995, 1.0000),
+        (1.0000, 1.0002, 0.9995, 1.0000),  # 買い（TP 1.0010）
+        (1.0020, 1.0025, 1.0015, 1.0020),  # TPより上で寄り付き
+    ])
+    trades, _ = backtest(df, [0, 1, 0], tp_points=10)
+    assert trades.iloc[0]["exit_reason"] == "take_profit"
+    assert trades.iloc[0]["exit_price"] == pytest.approx(1.0020)
+
+
+def test_stop_loss_wins_over_take_profit_in_same_bar():
+    df = bars([
+        (1.0000, 1.0005, 0.9995, 1.0000),
+        (1.0000, 1.0002, 0.9995, 1.0000),
+        (1.0000, 1.0020, 0.9980, 1.0000),  # SL・TPの両方に掛かる
+    ])
+    trades, _ = backtest(df, [0, 1, 0], sl_points=10, tp_points=10)
+    assert trades.iloc[0]["exit_reason"] == "stop_loss"
+    assert trades.iloc[0]["exit_price"] == pytest.approx(0.9990)
+
+
+def test_trailing_stop_applies_from_next_bar():
+    df = bars([
+        (1.0000, 1.0005, 0.9995, 1.0000),
+        (1.0000, 1.0002, 0.9995, 1.0000),  # 買い。含み益が発動幅未満なのでトレーリングしない
+        (1.0010, 1.0030, 1.0005, 1.0025),  # 高値 1.0030 - ATR 0.0010 → 新SL 1.0020（このバーでは未適用）
+        (1.0025, 1.0026, 1.0015, 1.0020),  # 新SLで決済
+        (1.0020, 1.0021, 1.0019, 1.0020),
+    ])
+    atr = np.full(len(df), 0.0010)
+    trades, _ = backtest(df, [0, 1, 0, 0, 0], use_trailing=True, atr=atr, atr_multiplier=1.0,
+                         activation_points=5)
+    trade = trades.iloc[0]
+    assert trade["exit_reason"] == "trailing_stop"
+    assert trade["exit_price"] == pytest.approx(1.0020)
+    assert trade["exit_time"] == df["time"].iloc[3]
+
+
+def test_open_position_closes_at_end_of_data():
+    df = bars([
+        (1.0000, 1.0005, 0.9995, 1.0000),
+        (1.0000, 1.0002, 0.9995, 1.0000),  # 売り（Bid で約定）
+        (0.9990, 0.9995, 0.9985, 0.9990),
+    ])
+    trades, equity = backtest(df, [0, -1, 0], spread_points=2)
+    trade = trades.iloc[0]
+    assert trade["side"] == "SELL"
+    assert trade["exit_reason"] == "end_of_data"
+    # 売りの決済は Ask（終値 + スプレッド）
+    assert trade["exit_price"] == pytest.approx(0.9990 + 2 * POINT)
+    assert trade["pnl_points"] == pytest.approx(8)
+    assert equity["equity"].iloc[-1] == pytest.approx(trade["pnl"])
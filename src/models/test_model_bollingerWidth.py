@@ -0,0 +1,59 @@
+# 全バー版・ストリーミング版・従来の calculate_bollinger_width の一致確認
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from model_bollingerWidth import BollingerWidthStream, bollinger_width_series, calculate_bollinger_width
+
+SIGMAS = (2, 2.5, 3)
+ATOL = 1e-10
+
+
+@pytest.fixture(scope="module")
+def close():
+    rng = np.random.default_rng(42)
+    return pd.Series(1.1 + np.cumsum(rng.normal(0, 0.0005, 5000)))
+
+
+def test_series_matches_stream_by_default(close):
+    bands = bollinger_width_series(close, 20, SIGMAS)
+    stream = BollingerWidthStream(20, SIGMAS)
+    rows = []
+    for price in close:
+        # 形成中バーへのティックを模擬（最後のティックが確定終値）
+        stream.update(price + 0.001, new_bar=True)
+        stream.update(price - 0.001, new_bar=False)
+        rows.append(stream.update(price, new_bar=False) or {})
+    streamed = pd.DataFrame(rows, index=close.index).reindex(columns=bands.columns)
+    np.testing.assert_array_equal(bands.isna().values, streamed.isna().values)
+    prices = bands.columns.drop('width_rate')
+    np.testing.assert_allclose(streamed[prices].values, bands[prices].values, rtol=0, atol=ATOL, equal_nan=True)
+    # 変化率(%)は標準偏差の丸め誤差を 100/std 倍するので相対誤差で比較
+    np.testing.assert_allclose(streamed['width_rate'], bands['width_rate'], rtol=1e-6, atol=1e-6, equal_nan=True)
+
+
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_series_matches_pandas_rolling(close, ddof):
+    bands = bollinger_width_series(close, 20, SIGMAS, ddof=ddof)
+    sma = close.rolling(20).mean()
+    std = close.rolling(20).std(ddof=ddof)
+    np.testing.assert_allclose(bands['sma'], sma, rtol=0, atol=ATOL, equal_nan=True)
+    np.testing.assert_allclose(bands['std'], std, rtol=0, atol=ATOL, equal_nan=True)
+    for sigma in SIGMAS:
+        np.testing.assert_allclose(bands[f'width_{sigma:g}'], 2 * sigma * std, rtol=0, atol=ATOL, equal_nan=True)
+
+
+def test_calculate_bollinger_width_keeps_sample_std(close):
+    # 従来どおり pandas の rolling().std()（ddof=1）
+    df = pd.DataFrame({'close': close})
+    result = calculate_bollinger_width(df, period=20, sigma=3)
+    sma = close.iloc[-20:].mean()
+    std = close.iloc[-20:].std()
+    assert result['sma'] == pytest.approx(sma, abs=ATOL)
+    assert result['width'] == pytest.approx(6 * std, abs=ATOL)
+    assert result['upper_band'] == pytest.approx(sma + 3 * std, abs=ATOL)
+    assert result['lower_band'] == pytest.approx(sma - 3 * std, abs=ATOL)
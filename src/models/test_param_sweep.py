@@ -0,0 +1,69 @@
+# 共有メモリ＋プロセスプールのスイープが、同じ組み合わせを1プロセスで順に実行した結果と一致するか
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+_src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(_src, "python_indicator"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from hma_backtest import run_backtest, summarize
+from param_sweep import STRATEGIES, expand_grid, run_sweep
+
+GRIDS = {
+    "hma": {"period": [9, 21]},
+    "bb_width": {"period": [20], "sigma": [2.0, 3.0]},
+}
+BACKTEST_KWARGS = {"activation_points": 10.0, "atr_multiplier": 1.5}
+
+
+def make_bars(seed, size=1500):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0005, size))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0002, size))
+    return pd.DataFrame({
+        "time": pd.date_range("2024-07-01", periods=size, freq="5min"),
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "spread": rng.integers(5, 20, size).astype(float),
+    })
+
+
+SERIES = {("EURUSD", "M5"): make_bars(1), ("USDJPY", "M5"): make_bars(2)}
+
+
+def serial_sweep():
+    rows = []
+    for task in expand_grid(GRIDS, ["EURUSD", "USDJPY"], ["M5"]):
+        df = SERIES[(task["symbol"], task["timeframe"])]
+        signals = STRATEGIES[task["strategy"]](df, **task["params"])
+        stats = summarize(*run_backtest(df, signals, **BACKTEST_KWARGS))
+        stats.pop("exit_reasons", None)
+        rows.append({"strategy": task["strategy"], "symbol": task["symbol"], "timeframe": task["timeframe"],
+                     **task["params"], **stats})
+    return pd.DataFrame(rows)
+
+
+def test_sweep_matches_serial_run():
+    results = run_sweep(lambda symbol, tf: SERIES.get((symbol, tf)), GRIDS, ["EURUSD", "USDJPY"], ["M5"],
+                        workers=2, backtest_kwargs=BACKTEST_KWARGS, log=lambda msg: None)
+    expected = serial_sweep()
+    assert len(results) == len(expected) == 8
+    assert list(results["rank"]) == list(range(1, 9))
+    assert results["net_pnl"].is_monotonic_decreasing
+
+    keys = ["strategy", "symbol", "timeframe", "period", "sigma"]
+    merged = results.merge(expected, on=keys, how="outer", suffixes=("", "_serial"), indicator=True)
+    assert (merged["_merge"] == "both").all()
+    for col in ["trades", "win_rate", "net_pnl", "profit_factor", "max_drawdown"]:
+        np.testing.assert_allclose(merged[col], merged[col + "_serial"], rtol=0, atol=1e-9, err_msg=col)
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        expand_grid({"nope": {"period": [1]}}, ["EURUSD"], ["M5"])
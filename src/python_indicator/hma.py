@@ -1,14 +1,44 @@
 import numpy as np
 import pandas as pd
 
-def weighted_moving_average(data: pd.Series, length: int) -> pd.Series:
-    weights = np.arange(length, 0, -1)
-    return data.rolling(length).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+def weighted_moving_average(data, length: int, dtype=None, newest_weight_highest: bool = False):
+    """
+    加重移動平均（畳み込みによるベクトル化版）
 
-def hull_moving_average(close: pd.Series, period: int = 21) -> pd.Series:
+    Parameters:
+    - data: pd.Series または 1次元配列
+    - length: 期間
+    - dtype: 計算精度（None: float64, np.float32 など）
+    - newest_weight_highest: False はウィンドウの古い側から length..1 の重み（従来実装と同じ）、
+      True は最新バーに length の重み（Indicators/Hull Moving Average.mq5 の WMA と同じ）
+
+    Returns:
+    - 入力と同じ長さ。ウィンドウが埋まるまで、またはウィンドウ内に NaN を含む位置は NaN
+    """
+    values = np.asarray(data, dtype=dtype if dtype is not None else np.float64)
+    out = np.full(len(values), np.nan, dtype=values.dtype)
+
+    if length > 0 and len(values) >= length:
+        weights = np.arange(length, 0, -1, dtype=values.dtype)
+        weights /= weights.sum()
+        # np.convolve はカーネルを反転して掛けるので、従来の並びにするには逆順で渡す
+        kernel = weights if newest_weight_highest else weights[::-1]
+        out[length - 1:] = np.convolve(values, kernel, mode='valid')
+
+    if isinstance(data, pd.Series):
+        return pd.Series(out, index=data.index, name=data.name)
+    return out
+
+def hull_moving_average(close, period: int = 21, dtype=None, newest_weight_highest: bool = False):
+    """
+    Hull Moving Average（各WMAは畳み込みによるベクトル化版）
+
+    newest_weight_highest=True で Indicators/Hull Moving Average.mq5 と同じ値になる
+    （MQL5版はウォームアップ区間を0埋めで計算するため、先頭 period + sqrt(period) - 2 本は一致しない）
+    """
     sqrt_period = int(np.sqrt(period))
-    wma_half = weighted_moving_average(close, period // 2)
-    wma_full = weighted_moving_average(close, period)
+    wma_half = weighted_moving_average(close, period // 2, dtype, newest_weight_highest)
+    wma_full = weighted_moving_average(close, period, dtype, newest_weight_highest)
     raw_wma = 2 * wma_half - wma_full
-    hma = weighted_moving_average(raw_wma, sqrt_period)
-    return hma
\ No newline at end of file
+    hma = weighted_moving_average(raw_wma, sqrt_period, dtype, newest_weight_highest)
+    return hma
@@ -0,0 +1,680 @@
+"""
+テクニカル指標ライブラリ（バッチ計算とストリーミング更新の両対応）
+
+各インジケータは
+- batch(...): 全履歴をベクトル化して計算（ウォームアップ区間は NaN）
+- update(bar): 1本ずつO(1)で状態を更新して最新値を返す
+を持ち、同じ入力なら両者は同じ値になる。
+SMA/EMA/RSI/ATR/ADX/MACD/STOCH/BBANDS は TA-Lib と同じ初期化・平滑化を行う。
+"""
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .hma import weighted_moving_average, hull_moving_average
+except ImportError:
+    from hma import weighted_moving_average, hull_moving_average
+
+NAN = float('nan')
+
+# TA-Lib の TA_IS_ZERO と同じ閾値
+_ZERO = 1e-8
+
+
+def _is_zero(value):
+    return -_ZERO < value < _ZERO
+
+
+def _value(bar, key='close'):
+    """数値、または辞書/Series形式のバーから値を取り出す"""
+    if isinstance(bar, (int, float, np.integer, np.floating)):
+        return float(bar)
+    return float(bar[key])
+
+
+def _as_array(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def _recursive_average(values, alpha, start, period):
+    """
+    values[start-period+1 .. start] の単純平均を初期値とし、
+    以降 out[i] = out[i-1] + alpha * (values[i] - out[i-1]) で平滑化（EMA/Wilder共通）
+    """
+    out = np.full(len(values), np.nan)
+    if start >= len(values) or start - period + 1 < 0:
+        return out
+    seed = values[start - period + 1:start + 1].mean()
+    series = np.concatenate(([seed], values[start + 1:]))
+    out[start:] = pd.Series(series).ewm(alpha=alpha, adjust=False).mean().values
+    return out
+
+
+class _RollingSum:
+    """
+    固定長ウィンドウの移動合計（O(1)更新）
+    丸め誤差の蓄積を防ぐため period 回ごとにウィンドウから合計を取り直す
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self._since_resum = 0
+
+    def push(self, x):
+        self.window.append(x)
+        self.total += x
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        self._since_resum += 1
+        if self._since_resum >= self.period:
+            self.total = math.fsum(self.window)
+            self._since_resum = 0
+
+    def replace_last(self, x):
+        """最後に追加した値を差し替える（形成中バーの更新）"""
+        self.total += x - self.window[-1]
+        self.window[-1] = x
+
+    @property
+    def full(self):
+        return len(self.window) == self.period
+
+
+class Indicator:
+    """インジケータ共通の基底クラス"""
+
+    # 出力名の接尾辞（複数出力のインジケータのみ）
+    output_names = ('',)
+    # batch() に渡す入力列
+    inputs = ('close',)
+
+    def reset(self):
+        raise NotImplementedError
+
+    def update(self, bar):
+        raise NotImplementedError
+
+    def batch(self, *arrays):
+        raise NotImplementedError
+
+
+class SMA(Indicator):
+    """単純移動平均"""
+
+    def __init__(self, period, source='close'):
+        self.period = period
+        self.inputs = (source,)
+        self.reset()
+
+    def reset(self):
+        self._sum = _RollingSum(self.period)
+        self.value = NAN
+
+    def update(self, bar):
+        self._sum.push(_value(bar, self.inputs[0]))
+        self.value = self._sum.total / self.period if self._sum.full else NAN
+        return self.value
+
+    def batch(self, values):
+        return pd.Series(_as_array(values)).rolling(self.period).mean().values
+
+
+class EMA(Indicator):
+    """指数移動平均（最初の period 本の単純平均で初期化）"""
+
+    def __init__(self, period, source='close'):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.inputs = (source,)
+        self.reset()
+
+    def reset(self):
+        self._count = 0
+        self._seed_sum = 0.0
+        self.value = NAN
+
+    def update(self, bar):
+        x = _value(bar, self.inputs[0])
+        self._count += 1
+        if self._count < self.period:
+            self._seed_sum += x
+        elif self._count == self.period:
+            self.value = (self._seed_sum + x) / self.period
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def batch(self, values):
+        return _recursive_average(_as_array(values), self.alpha, self.period - 1, self.period)
+
+
+class WMA(Indicator):
+    """
+    加重移動平均
+
+    newest_weight_highest は python_indicator/hma.py と同じ意味
+    （False: 従来実装の重み順, True: 最新バーが最大重み＝TA-Lib/MQL5と同じ）
+    """
+
+    def __init__(self, period, newest_weight_highest=False, source='close'):
+        self.period = period
+        self.newest_weight_highest = newest_weight_highest
+        self.inputs = (source,)
+        self._denominator = period * (period + 1) / 2.0
+        self.reset()
+
+    def reset(self):
+        self._window = deque()
+        self._sum = 0.0
+        self._weighted = 0.0
+        self._since_resum = 0
+        self.value = NAN
+
+    def _resum(self):
+        n = len(self._window)
+        weights = range(n, 0, -1) if not self.newest_weight_highest else range(1, n + 1)
+        self._sum = math.fsum(self._window)
+        self._weighted = math.fsum(w * x for w, x in zip(weights, self._window))
+
+    def update(self, bar):
+        x = _value(bar, self.inputs[0])
+        n = self.period
+        if math.isnan(x) or any(math.isnan(v) for v in (self._sum, self._weighted)):
+            # NaN を含むウィンドウは NaN（ウィンドウから抜けるまで再集計する）
+            self._window.append(x)
+            if len(self._window) > n:
+                self._window.popleft()
+            self._resum()
+        elif len(self._window) < n:
+            self._window.append(x)
+            self._resum()
+        else:
+            old = self._window.popleft()
+            self._window.append(x)
+            if self.newest_weight_highest:
+                # 既存要素の重みが1ずつ減り、新しい要素が重み n
+                self._weighted += n * x - self._sum
+            else:
+                # 既存要素の重みが1ずつ増え、抜ける要素(重み n)を除き、新しい要素が重み 1
+                self._weighted += (self._sum - old) - n * old + x
+            self._sum += x - old
+            self._since_resum += 1
+            if self._since_resum >= n:
+                self._resum()
+                self._since_resum = 0
+
+        self.value = self._weighted / self._denominator if len(self._window) == n else NAN
+        return self.value
+
+    def batch(self, values):
+        return weighted_moving_average(_as_array(values), self.period,
+                                       newest_weight_highest=self.newest_weight_highest)
+
+
+class HMA(Indicator):
+    """Hull Moving Average（python_indicator/hma.py と同じ定義）"""
+
+    def __init__(self, period=21, newest_weight_highest=False, source='close'):
+        self.period = period
+        self.newest_weight_highest = newest_weight_highest
+        self.inputs = (source,)
+        self.reset()
+
+    def reset(self):
+        self._half = WMA(self.period // 2, self.newest_weight_highest)
+        self._full = WMA(self.period, self.newest_weight_highest)
+        self._hull = WMA(int(np.sqrt(self.period)), self.newest_weight_highest)
+        self.value = NAN
+
+    def update(self, bar):
+        x = _value(bar, self.inputs[0])
+        raw = 2 * self._half.update(x) - self._full.update(x)
+        self.value = self._hull.update(raw)
+        return self.value
+
+    def batch(self, values):
+        return hull_moving_average(_as_array(values), self.period,
+                                   newest_weight_highest=self.newest_weight_highest)
+
+
+class BollingerBands(Indicator):
+    """
+    ボリンジャーバンド
+
+    Returns: (upper, middle, lower, width)  width = upper - lower
+    ddof=0 は母標準偏差（TA-Lib BBANDS, MQL5 の iStdDev）、ddof=1 は標本標準偏差（pandas の rolling.std）
+    update(bar, new_bar=False) は形成中バーの終値を差し替える（ティックごとの更新もO(1)）
+    """
+
+    output_names = ('_upper', '_middle', '_lower', '_width')
+
+    def __init__(self, period=20, nbdev=2.0, ddof=0, source='close'):
+        self.period = period
+        self.nbdev = nbdev
+        self.ddof = ddof
+        self.inputs = (source,)
+        self.reset()
+
+    def reset(self):
+        # 桁落ちを避けるため最初の値を基準にずらした値で合計を持つ
+        self._shift = None
+        self._sum = _RollingSum(self.period)
+        self._sumsq = _RollingSum(self.period)
+        self.value = (NAN, NAN, NAN, NAN)
+
+    def update(self, bar, new_bar=True):
+        x = _value(bar, self.inputs[0])
+        if self._shift is None:
+            self._shift = x
+        d = x - self._shift
+        if new_bar or not self._sum.window:
+            self._sum.push(d)
+            self._sumsq.push(d * d)
+        else:
+            self._sum.replace_last(d)
+            self._sumsq.replace_last(d * d)
+        if not self._sum.full:
+            self.value = (NAN, NAN, NAN, NAN)
+            return self.value
+
+        n = self.period
+        mean = self._sum.total / n
+        variance = max(0.0, (self._sumsq.total - n * mean * mean) / (n - self.ddof))
+        band = self.nbdev * math.sqrt(variance)
+        middle = mean + self._shift
+        self.value = (middle + band, middle, middle - band, 2 * band)
+        return self.value
+
+    def batch(self, values):
+        rolling = pd.Series(_as_array(values)).rolling(self.period)
+        middle = rolling.mean().values
+        band = self.nbdev * rolling.std(ddof=self.ddof).values
+        return middle + band, middle, middle - band, 2 * band
+
+
+def band_width_rate(width):
+    """
+    バンド幅の前のバーからの変化率(%)（Indicators/BollingerWidth.mq5 の WidthChangeRate）
+
+    直前の幅がほぼ0なら0、直前の幅が NaN（ウォームアップ中）なら NaN
+    """
+    width = _as_array(width)
+    prev = np.concatenate(([np.nan], width[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = (width - prev) / prev * 100.0
+    rate[prev <= _ZERO] = 0.0
+    return rate
+
+
+class Stochastic(Indicator):
+    """ストキャスティクス（TA-Lib STOCH, 移動平均はSMA）Returns: (slowk, slowd)"""
+
+    output_names = ('_k', '_d')
+    inputs = ('high', 'low', 'close')
+
+    def __init__(self, fastk_period=5, slowk_period=3, slowd_period=3):
+        self.fastk_period = fastk_period
+        self.slowk_period = slowk_period
+        self.slowd_period = slowd_period
+        self.reset()
+
+    def reset(self):
+        self._index = 0
+        self._highs = deque()  # (index, high) 単調減少
+        self._lows = deque()   # (index, low) 単調増加
+        self._slowk = SMA(self.slowk_period)
+        self._slowd = SMA(self.slowd_period)
+        self.value = (NAN, NAN)
+
+    def update(self, bar):
+        high, low, close = _value(bar, 'high'), _value(bar, 'low'), _value(bar, 'close')
+        i = self._index
+        self._index += 1
+
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((i, high))
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((i, low))
+        oldest = i - self.fastk_period + 1
+        while self._highs[0][0] < oldest:
+            self._highs.popleft()
+        while self._lows[0][0] < oldest:
+            self._lows.popleft()
+
+        if oldest < 0:
+            self.value = (NAN, NAN)
+            return self.value
+
+        highest, lowest = self._highs[0][1], self._lows[0][1]
+        diff = highest - lowest
+        fastk = (close - lowest) / diff * 100.0 if diff != 0 else 0.0
+        slowk = self._slowk.update(fastk)
+        slowd = self._slowd.update(slowk) if not math.isnan(slowk) else NAN
+        # TA-Lib と同様、%D が揃うまでは %K も NaN
+        self.value = (slowk, slowd) if not math.isnan(slowd) else (NAN, NAN)
+        return self.value
+
+    def batch(self, high, low, close):
+        high, low, close = _as_array(high), _as_array(low), _as_array(close)
+        highest = pd.Series(high).rolling(self.fastk_period).max().values
+        lowest = pd.Series(low).rolling(self.fastk_period).min().values
+        diff = highest - lowest
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fastk = np.where(diff != 0, (close - lowest) / diff * 100.0, 0.0)
+        fastk[np.isnan(diff)] = np.nan
+        slowk = pd.Series(fastk).rolling(self.slowk_period).mean().to_numpy(copy=True)
+        slowd = pd.Series(slowk).rolling(self.slowd_period).mean().values
+        slowk[np.isnan(slowd)] = np.nan
+        return slowk, slowd
+
+
+def _true_range(high, low, prev_close):
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+def _true_range_array(high, low, close):
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+class ATR(Indicator):
+    """Average True Range（TA-Lib ATR: TRの単純平均で初期化し、以降Wilder平滑化）"""
+
+    inputs = ('high', 'low', 'close')
+
+    def __init__(self, period=14):
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self._prev_close = None
+        self._count = 0
+        self._seed_sum = 0.0
+        self.value = NAN
+
+    def update(self, bar):
+        high, low, close = _value(bar, 'high'), _value(bar, 'low'), _value(bar, 'close')
+        if self._prev_close is None:
+            self._prev_close = close
+            return self.value
+
+        tr = _true_range(high, low, self._prev_close)
+        self._prev_close = close
+        self._count += 1
+        if self._count < self.period:
+            self._seed_sum += tr
+        elif self._count == self.period:
+            self.value = (self._seed_sum + tr) / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + tr) / self.period
+        return self.value
+
+    def batch(self, high, low, close):
+        tr = _true_range_array(_as_array(high), _as_array(low), _as_array(close))
+        return _recursive_average(tr, 1.0 / self.period, self.period, self.period)
+
+
+class RSI(Indicator):
+    """RSI（TA-Lib RSI: Wilder平滑化）"""
+
+    def __init__(self, period=14, source='close'):
+        self.period = period
+        self.inputs = (source,)
+        self.reset()
+
+    def reset(self):
+        self._prev = None
+        self._count = 0
+        self._gain = 0.0
+        self._loss = 0.0
+        self.value = NAN
+
+    def update(self, bar):
+        x = _value(bar, self.inputs[0])
+        if self._prev is None:
+            self._prev = x
+            return self.value
+
+        diff = x - self._prev
+        self._prev = x
+        gain, loss = (diff, 0.0) if diff >= 0 else (0.0, -diff)
+        self._count += 1
+        n = self.period
+        if self._count < n:
+            self._gain += gain
+            self._loss += loss
+            return self.value
+        if self._count == n:
+            self._gain = (self._gain + gain) / n
+            self._loss = (self._loss + loss) / n
+        else:
+            self._gain = (self._gain * (n - 1) + gain) / n
+            self._loss = (self._loss * (n - 1) + loss) / n
+
+        total = self._gain + self._loss
+        self.value = 100.0 * (self._gain / total) if not _is_zero(total) else 0.0
+        return self.value
+
+    def batch(self, values):
+        x = _as_array(values)
+        diff = np.concatenate(([np.nan], np.diff(x)))
+        gain = np.where(diff > 0, diff, 0.0)
+        loss = np.where(diff < 0, -diff, 0.0)
+        n = self.period
+        avg_gain = _recursive_average(gain, 1.0 / n, n, n)
+        avg_loss = _recursive_average(loss, 1.0 / n, n, n)
+        total = avg_gain + avg_loss
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(np.abs(total) < _ZERO, 0.0, 100.0 * avg_gain / total)
+        rsi[np.isnan(total)] = np.nan
+        return rsi
+
+
+class ADX(Indicator):
+    """ADX（TA-Lib ADX と同じ初期化・平滑化）"""
+
+    inputs = ('high', 'low', 'close')
+
+    def __init__(self, period=14):
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self._count = 0
+        self._prev_high = self._prev_low = self._prev_close = None
+        self._plus_dm = self._minus_dm = self._tr = 0.0
+        self._sum_dx = 0.0
+        self.value = NAN
+
+    def _dx(self):
+        if _is_zero(self._tr):
+            return None
+        minus_di = 100.0 * (self._minus_dm / self._tr)
+        plus_di = 100.0 * (self._plus_dm / self._tr)
+        total = minus_di + plus_di
+        if _is_zero(total):
+            return None
+        return 100.0 * (abs(minus_di - plus_di) / total)
+
+    def update(self, bar):
+        high, low, close = _value(bar, 'high'), _value(bar, 'low'), _value(bar, 'close')
+        n = self.period
+        index = self._count
+        self._count += 1
+        if index == 0:
+            self._prev_high, self._prev_low, self._prev_close = high, low, close
+            return self.value
+
+        diff_p = high - self._prev_high
+        diff_m = self._prev_low - low
+        plus_dm = diff_p if (diff_p > 0 and diff_p > diff_m and not (diff_m > 0 and diff_p < diff_m)) else 0.0
+        minus_dm = diff_m if (diff_m > 0 and diff_p < diff_m) else 0.0
+        tr = _true_range(high, low, self._prev_close)
+        self._prev_high, self._prev_low, self._prev_close = high, low, close
+
+        if index < n:
+            # 最初の n-1 本は単純合計
+            self._plus_dm += plus_dm
+            self._minus_dm += minus_dm
+            self._tr += tr
+            return self.value
+
+        self._plus_dm += plus_dm - self._plus_dm / n
+        self._minus_dm += minus_dm - self._minus_dm / n
+        self._tr += tr - self._tr / n
+        dx = self._dx()
+
+        if index < 2 * n - 1:
+            if dx is not None:
+                self._sum_dx += dx
+        elif index == 2 * n - 1:
+            if dx is not None:
+                self._sum_dx += dx
+            self.value = self._sum_dx / n
+        elif dx is not None:
+            self.value = (self.value * (n - 1) + dx) / n
+        return self.value
+
+    def batch(self, high, low, close):
+        high, low, close = _as_array(high), _as_array(low), _as_array(close)
+        n = self.period
+        size = len(close)
+        out = np.full(size, np.nan)
+        if size < 2 * n:
+            return out
+
+        diff_p = np.concatenate(([np.nan], np.diff(high)))
+        diff_m = np.concatenate(([np.nan], -np.diff(low)))
+        minus_dm = np.where((diff_m > 0) & (diff_p < diff_m), diff_m, 0.0)
+        plus_dm = np.where((minus_dm == 0) & (diff_p > 0) & (diff_p > diff_m), diff_p, 0.0)
+        tr = _true_range_array(high, low, close)
+
+        def wilder_sum(values):
+            # S[n-1] = sum(values[1..n-1]), 以降 S = S - S/n + x（= n × EMA(alpha=1/n)）
+            seed = values[1:n].sum() / n
+            series = np.concatenate(([seed], values[n:]))
+            smoothed = np.full(size, np.nan)
+            smoothed[n - 1:] = pd.Series(series).ewm(alpha=1.0 / n, adjust=False).mean().values * n
+            return smoothed
+
+        s_plus, s_minus, s_tr = wilder_sum(plus_dm), wilder_sum(minus_dm), wilder_sum(tr)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            minus_di = 100.0 * (s_minus / s_tr)
+            plus_di = 100.0 * (s_plus / s_tr)
+            total = minus_di + plus_di
+            dx = 100.0 * (np.abs(minus_di - plus_di) / total)
+        dx[(np.abs(s_tr) < _ZERO) | (np.abs(total) < _ZERO)] = np.nan
+
+        # ADX は DX の n 本平均（計算不能な DX は 0 扱い）で初期化し、以降は計算不能な DX を飛ばしてWilder平滑化
+        seed = np.nansum(dx[n:2 * n]) / n
+        series = pd.Series(np.concatenate(([seed], dx[2 * n:])))
+        out[2 * n - 1:] = series.ewm(alpha=1.0 / n, adjust=False, ignore_na=True).mean().values
+        return out
+
+
+class MACD(Indicator):
+    """
+    MACD（TA-Lib MACD と同じ初期化）Returns: (macd, signal, hist)
+
+    短期・長期EMAとも slow_period-1 本目で初期化し、シグナルが揃うまでは全出力が NaN
+    """
+
+    output_names = ('', '_signal', '_hist')
+
+    def __init__(self, fast_period=12, slow_period=26, signal_period=9, source='close'):
+        if slow_period < fast_period:
+            fast_period, slow_period = slow_period, fast_period
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.signal_period = signal_period
+        self.inputs = (source,)
+        self.reset()
+
+    def reset(self):
+        self._seed = deque(maxlen=self.slow_period)
+        self._fast = None
+        self._slow = None
+        self._signal = EMA(self.signal_period)
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, bar):
+        x = _value(bar, self.inputs[0])
+        k_fast = 2.0 / (self.fast_period + 1)
+        k_slow = 2.0 / (self.slow_period + 1)
+
+        if self._slow is None:
+            self._seed.append(x)
+            if len(self._seed) < self.slow_period:
+                return self.value
+            window = list(self._seed)
+            self._slow = sum(window) / self.slow_period
+            self._fast = sum(window[-self.fast_period:]) / self.fast_period
+        else:
+            self._fast += k_fast * (x - self._fast)
+            self._slow += k_slow * (x - self._slow)
+
+        macd = self._fast - self._slow
+        signal = self._signal.update(macd)
+        self.value = (macd, signal, macd - signal) if not math.isnan(signal) else (NAN, NAN, NAN)
+        return self.value
+
+    def batch(self, values):
+        x = _as_array(values)
+        start = self.slow_period - 1
+        slow = _recursive_average(x, 2.0 / (self.slow_period + 1), start, self.slow_period)
+        fast = _recursive_average(x, 2.0 / (self.fast_period + 1), start, self.fast_period)
+        macd = fast - slow
+        signal = _recursive_average(np.nan_to_num(macd), 2.0 / (self.signal_period + 1),
+                                    start + self.signal_period - 1, self.signal_period)
+        macd[np.isnan(signal)] = np.nan
+        return macd, signal, macd - signal
+
+
+class IndicatorSet:
+    """
+    名前付きインジケータの集合（1シンボル分の状態を保持）
+
+    例:
+        indicators = IndicatorSet({'sma_20': SMA(20), 'macd': MACD(), 'stoch': Stochastic()})
+        indicators.update(bar)   # {'sma_20': ..., 'macd': ..., 'macd_signal': ..., ...}
+        indicators.batch(df)     # 同じ列名の DataFrame
+    """
+
+    def __init__(self, indicators):
+        self.indicators = dict(indicators)
+
+    def columns(self):
+        return [name + suffix for name, ind in self.indicators.items() for suffix in ind.output_names]
+
+    def reset(self):
+        for ind in self.indicators.values():
+            ind.reset()
+
+    def update(self, bar):
+        result = {}
+        for name, ind in self.indicators.items():
+            value = ind.update(bar)
+            if len(ind.output_names) == 1:
+                result[name] = value
+            else:
+                for suffix, v in zip(ind.output_names, value):
+                    result[name + suffix] = v
+        return result
+
+    def batch(self, df):
+        result = {}
+        for name, ind in self.indicators.items():
+            value = ind.batch(*(df[col].values for col in ind.inputs))
+            if len(ind.output_names) == 1:
+                result[name] = value
+            else:
+                for suffix, v in zip(ind.output_names, value):
+                    result[name + suffix] = v
+        return pd.DataFrame(result, index=df.index)
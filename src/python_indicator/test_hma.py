@@ -0,0 +1,89 @@
+# ベクトル化版 WMA/HMA と従来実装（rolling.apply）・MQL5版との一致確認
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from hma import hull_moving_average, weighted_moving_average
+
+PERIOD = 21
+
+
+def wma_rolling(data, length):
+    """従来の weighted_moving_average（rolling.apply 版）"""
+    weights = np.arange(length, 0, -1)
+    return data.rolling(length).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+
+
+def hma_rolling(data, period):
+    raw = 2 * wma_rolling(data, period // 2) - wma_rolling(data, period)
+    return wma_rolling(raw, int(np.sqrt(period)))
+
+
+def hma_mql5(data, period):
+    """Indicators/Hull Moving Average.mq5 の OnCalculate をそのまま移植"""
+    def wma(pos, length, arr):
+        num = den = 0.0
+        for i in range(length):
+            if pos - i < 0:
+                break
+            num += arr[pos - i] * (length - i)
+            den += length - i
+        return num / den if den != 0.0 else 0.0
+
+    n = len(data)
+    sqrt_period = int(np.sqrt(period))
+    raw = np.zeros(n)
+    hma = np.full(n, np.nan)
+    for i in range(period - 1, n):
+        raw[i] = 2 * wma(i, period // 2, data) - wma(i, period, data)
+    for i in range(max(period - 1, sqrt_period - 1), n):
+        hma[i] = wma(i, sqrt_period, raw)
+    return hma
+
+
+@pytest.fixture(scope="module")
+def close():
+    rng = np.random.default_rng(42)
+    close = pd.Series(1.1 + np.cumsum(rng.normal(0, 0.0005, 5000)))
+    close.iloc[100] = np.nan
+    return close
+
+
+@pytest.mark.parametrize("length", [1, 2, 10, 21])
+def test_wma_matches_rolling(close, length):
+    expected = wma_rolling(close, length)
+    result = weighted_moving_average(close, length)
+    assert isinstance(result, pd.Series) and result.index.equals(close.index)
+    np.testing.assert_allclose(result.values, expected.values, rtol=0, atol=1e-12, equal_nan=True)
+
+
+def test_wma_shorter_than_length_is_nan():
+    assert np.isnan(weighted_moving_average(np.arange(5.0), 10)).all()
+
+
+def test_hma_matches_rolling(close):
+    expected = hma_rolling(close, PERIOD)
+    result = hull_moving_average(close, PERIOD)
+    # NaN の位置（ウォームアップと NaN を含むウィンドウ）も含めて一致
+    np.testing.assert_array_equal(result.isna().values, expected.isna().values)
+    np.testing.assert_allclose(result.values, expected.values, rtol=0, atol=1e-12, equal_nan=True)
+
+
+def test_hma_float32(close):
+    expected = hma_rolling(close, PERIOD)
+    result = hull_moving_average(close, PERIOD, dtype=np.float32)
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result.values, expected.values, rtol=0, atol=1e-5, equal_nan=True)
+
+
+def test_hma_matches_mql5(close):
+    clean = close.interpolate()
+    expected = hma_mql5(clean.values, PERIOD)
+    result = hull_moving_average(clean, PERIOD, newest_weight_highest=True).values
+    # MQL5版はウォームアップ区間を0埋めで計算するので、その後だけ比較
+    warmup = PERIOD + int(np.sqrt(PERIOD)) - 2
+    np.testing.assert_allclose(result[warmup:], expected[warmup:], rtol=0, atol=1e-12)
@@ -0,0 +1,103 @@
+# バッチとストリーミングの一致、および TA-Lib との一致確認（TA-Lib が無ければ TA-Lib との比較は省略）
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from indicators import (ADX, ATR, EMA, HMA, MACD, RSI, SMA, WMA, BollingerBands, IndicatorSet,
+                        Stochastic)
+
+# 価格は 1.1 前後なので、誤差は丸め誤差の範囲（二乗和を使う BBANDS でも 1e-11 程度）
+ATOL = 1e-10
+
+
+@pytest.fixture(scope="module")
+def bars():
+    rng = np.random.default_rng(42)
+    size = 3000
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0005, size))
+    high = close + np.abs(rng.normal(0, 0.0003, size))
+    low = close - np.abs(rng.normal(0, 0.0003, size))
+    volume = rng.integers(100, 1000, size).astype(float)
+    return pd.DataFrame({'high': high, 'low': low, 'close': close, 'volume': volume})
+
+
+@pytest.fixture(scope="module")
+def indicators():
+    return IndicatorSet({
+        'sma_20': SMA(20),
+        'ema_12': EMA(12),
+        'wma_14': WMA(14, newest_weight_highest=True),
+        'hma_21': HMA(21),
+        'bb': BollingerBands(5, 2.0),
+        'stoch': Stochastic(),
+        'atr': ATR(14),
+        'rsi': RSI(14),
+        'adx': ADX(14),
+        'macd': MACD(),
+        'volume_sma': SMA(20, source='volume'),
+    })
+
+
+@pytest.fixture(scope="module")
+def batch(indicators, bars):
+    return indicators.batch(bars)
+
+
+def assert_same(result, expected):
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(expected))
+    np.testing.assert_allclose(result, expected, rtol=0, atol=ATOL, equal_nan=True)
+
+
+def test_batch_matches_stream(indicators, bars, batch):
+    indicators.reset()
+    stream = pd.DataFrame([indicators.update(row) for row in bars.to_dict('records')])
+    assert list(batch.columns) == indicators.columns()
+    for col in indicators.columns():
+        assert_same(stream[col].values, batch[col].values)
+
+
+def test_matches_talib(bars, batch):
+    talib = pytest.importorskip("talib")
+    high, low, close = bars['high'].values, bars['low'].values, bars['close'].values
+    bb_upper, bb_middle, bb_lower = talib.BBANDS(close, 5, 2.0, 2.0)
+    slowk, slowd = talib.STOCH(high, low, close)
+    macd, macd_signal, macd_hist = talib.MACD(close)
+    reference = {
+        'sma_20': talib.SMA(close, 20),
+        'ema_12': talib.EMA(close, 12),
+        'wma_14': talib.WMA(close, 14),
+        'bb_upper': bb_upper,
+        'bb_middle': bb_middle,
+        'bb_lower': bb_lower,
+        'stoch_k': slowk,
+        'stoch_d': slowd,
+        'atr': talib.ATR(high, low, close, 14),
+        'rsi': talib.RSI(close, 14),
+        'adx': talib.ADX(high, low, close, 14),
+        'macd': macd,
+        'macd_signal': macd_signal,
+        'macd_hist': macd_hist,
+        'volume_sma': talib.SMA(bars['volume'].values, 20),
+    }
+    for col, expected in reference.items():
+        try:
+            assert_same(batch[col].values, expected)
+        except AssertionError as e:
+            raise AssertionError(f"{col} differs from TA-Lib: {e}") from None
+
+
+def test_bollinger_forming_bar_updates(bars):
+    # 形成中バーへのティック（最後のティックが確定終値）を反映しても、確定足だけのバッチと一致
+    close = bars['close'].values
+    bands = BollingerBands(20, 2.0)
+    rows = []
+    for price in close:
+        bands.update(price + 0.001, new_bar=True)
+        bands.update(price - 0.001, new_bar=False)
+        rows.append(bands.update(price, new_bar=False))
+    for result, expected in zip(np.array(rows).T, bands.batch(close)):
+        assert_same(result, expected)
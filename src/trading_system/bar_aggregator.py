@@ -0,0 +1,189 @@
+"""
+受信したティック（または M1 バー）から複数時間足の OHLCV をインクリメンタルに作る
+
+- 時間足ごとに確定バーを列ごとの numpy 配列に持ち、1ティックでは形成中のバー1本だけを更新する
+- バーの区切りはティックの時刻（MT5 のサーバー時間）を時間足の長さで切り捨てた時刻（MT5 のバーと同じ）
+- 確定バーは max_bars 本まで保持（容量の2倍まで追記し、溢れたら後半を先頭へ移すので追記は償却 O(1)）
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+TIMEFRAME_SECONDS = {
+    'M1': 60,
+    'M5': 300,
+    'M15': 900,
+    'M30': 1800,
+    'H1': 3600,
+    'H4': 14400,
+    'D1': 86400,
+}
+
+DEFAULT_TIMEFRAMES = ('M1', 'M5', 'M15', 'H1', 'D1')
+BAR_COLUMNS = ['datetime', 'open', 'high', 'low', 'close', 'volume']
+
+
+class _BarSeries:
+    """1時間足分の確定バーと形成中のバー"""
+
+    def __init__(self, seconds, max_bars):
+        self.step = seconds * 10**9
+        self.max_bars = max_bars
+        self.times = np.empty(max_bars * 2, dtype='i8')
+        self.values = np.empty((max_bars * 2, 5), dtype='f8')  # open, high, low, close, volume
+        self.size = 0
+        self.forming = None  # [開始時刻(ns), open, high, low, close, volume]
+        self.late_updates = 0
+
+    def update(self, t_ns, open_, high, low, close, volume):
+        """
+        t_ns を含むバーに OHLCV を反映。形成中のバーより新しい区間なら形成中のバーを確定する
+
+        Returns: 確定したバーの開始時刻（確定しなければ None）
+        """
+        start = t_ns - t_ns % self.step
+        forming = self.forming
+        if forming is not None and start == forming[0]:
+            if high > forming[2]:
+                forming[2] = high
+            if low < forming[3]:
+                forming[3] = low
+            forming[4] = close
+            forming[5] += volume
+            return None
+
+        if forming is None or start > forming[0]:
+            closed = None
+            if forming is not None:
+                self._append(forming)
+                closed = forming[0]
+            self.forming = [start, open_, high, low, close, volume]
+            return closed
+
+        # 形成中のバーより前の時刻（遅れて届いたデータ）: 確定バーがあれば高値・安値・出来高だけ反映
+        pos = int(np.searchsorted(self.times[:self.size], start))
+        if pos < self.size and self.times[pos] == start:
+            row = self.values[pos]
+            row[1] = max(row[1], high)
+            row[2] = min(row[2], low)
+            row[4] += volume
+        self.late_updates += 1
+        return None
+
+    def _append(self, bar):
+        if self.size == len(self.times):
+            keep = self.max_bars - 1
+            self.times[:keep] = self.times[self.size - keep:self.size]
+            self.values[:keep] = self.values[self.size - keep:self.size]
+            self.size = keep
+        self.times[self.size] = bar[0]
+        self.values[self.size] = bar[1:]
+        self.size += 1
+
+    def tail(self, count, include_forming):
+        """直近 count 本の (時刻, OHLCV) のコピー"""
+        n_closed = min(self.size, self.max_bars)
+        if include_forming and self.forming is not None:
+            n_closed = min(n_closed, max(count - 1, 0))
+            times = np.append(self.times[self.size - n_closed:self.size], self.forming[0])
+            values = np.vstack([self.values[self.size - n_closed:self.size], [self.forming[1:]]])
+        else:
+            n_closed = min(n_closed, count)
+            times = self.times[self.size - n_closed:self.size].copy()
+            values = self.values[self.size - n_closed:self.size].copy()
+        return times, values
+
+
+class BarAggregator:
+    """1シンボル分の複数時間足のバー"""
+
+    def __init__(self, timeframes=DEFAULT_TIMEFRAMES, max_bars=1000):
+        unknown = [tf for tf in timeframes if tf not in TIMEFRAME_SECONDS]
+        if unknown:
+            raise ValueError(f"Unsupported timeframe: {unknown}")
+        self.timeframes = tuple(timeframes)
+        self.series = {tf: _BarSeries(TIMEFRAME_SECONDS[tf], max_bars) for tf in self.timeframes}
+        self.last_volume = None
+        self._lock = threading.Lock()
+
+    def add_tick(self, timestamp, price, volume=1.0):
+        """
+        1ティックを全時間足に反映
+
+        Returns: {時間足: 確定したバーの開始時刻} （バーが確定した時間足のみ）
+        """
+        return self.add_bar(timestamp, price, price, price, price, volume)
+
+    def add_bar(self, timestamp, open_, high, low, close, volume):
+        """M1 以下のバー（またはティック）を全時間足に反映"""
+        t_ns = pd.Timestamp(timestamp).value
+        with self._lock:
+            return self._update(t_ns, open_, high, low, close, volume)
+
+    def _update(self, t_ns, open_, high, low, close, volume):
+        closed = {}
+        for tf, series in self.series.items():
+            start = series.update(t_ns, open_, high, low, close, volume)
+            if start is not None:
+                closed[tf] = pd.Timestamp(start)
+        return closed
+
+    def add_snapshot(self, timestamp, close, cumulative_volume, high=None, low=None, period=None):
+        """
+        EA が送る「形成中バーの終値と累積ティック出来高」を1ティックとして反映
+        （出来高は前回との差分。累積値が減ったら EA 側のバーが切り替わったとみなす）
+
+        high・low は EA のチャート時間足（period, 例: 'M1'）の形成中バーの高値・安値。
+        period の長さで割り切れる時間足では EA のバーが形成中のバーに収まるので、高値・安値もそのまま反映する
+        （period が不明、または period より短い時間足は終値だけ）
+        """
+        t_ns = pd.Timestamp(timestamp).value
+        ea_step = TIMEFRAME_SECONDS.get(period, 0) * 10**9 if high is not None and low is not None else 0
+        with self._lock:
+            last = self.last_volume
+            self.last_volume = cumulative_volume
+            if last is None:
+                volume = 0.0
+            elif cumulative_volume < last:
+                volume = cumulative_volume
+            else:
+                volume = cumulative_volume - last
+            volume = float(volume)
+
+            closed = {}
+            for tf, series in self.series.items():
+                if ea_step and series.step % ea_step == 0:
+                    start = series.update(t_ns, close, max(high, close), min(low, close), close, volume)
+                else:
+                    start = series.update(t_ns, close, close, close, close, volume)
+                if start is not None:
+                    closed[tf] = pd.Timestamp(start)
+            return closed
+
+    def bars(self, timeframe, count=200, include_forming=True):
+        """直近 count 本のバーの DataFrame（列は get_recent_dataframe と同じ datetime, open, ..., volume）"""
+        series = self.series.get(timeframe)
+        if series is None:
+            raise ValueError(f"Unsupported timeframe: {timeframe} (available: {', '.join(self.timeframes)})")
+        with self._lock:
+            times, values = series.tail(count, include_forming)
+
+        df = pd.DataFrame(values, columns=BAR_COLUMNS[1:])
+        df.insert(0, 'datetime', pd.to_datetime(times))
+        return df
+
+    def forming_bar_start(self, timeframe):
+        forming = self.series[timeframe].forming
+        return pd.Timestamp(forming[0]) if forming is not None else None
+
+    def stats(self):
+        return {
+            tf: {
+                'closed_bars': min(series.size, series.max_bars),
+                'forming_bar': pd.Timestamp(series.forming[0]).isoformat() if series.forming is not None else None,
+                'late_updates': series.late_updates,
+            }
+            for tf, series in self.series.items()
+        }
+
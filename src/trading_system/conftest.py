@@ -0,0 +1,91 @@
+# trading_system のテスト共通
+# LSTM は学習に時間が掛かるので、Keras と同じ fit/predict を持つ線形モデルで代用する
+# （TensorFlow・TA-Lib が無い環境では ml_trading_system を使うテストはスキップ）
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LinearSequenceModel:
+    """シーケンスの最後のステップに対する最小二乗（LSTMModel.build_model の代わり）"""
+
+    coef_ = None
+
+    def fit(self, X, y, validation_data=None, epochs=1, batch_size=32, callbacks=None, verbose=0):
+        design = self._design(X)
+        if self.coef_ is None:
+            self.coef_ = np.linalg.lstsq(design, y, rcond=None)[0]
+        else:
+            # 追加学習: 現在の係数から1歩だけ新しいデータへ寄せる
+            residual = design @ self.coef_ - y
+            self.coef_ = self.coef_ - 0.5 * np.linalg.pinv(design) @ residual
+
+    def predict(self, X, verbose=0):
+        return (self._design(X) @ self.coef_).reshape(-1, 1)
+
+    @staticmethod
+    def _design(X):
+        return np.column_stack([X[:, -1, :], np.ones(len(X))])
+
+
+def make_bars(n, seed=0, start="2024-07-01", freq="1min"):
+    """ランダムウォークのOHLCV（EURUSD 相当の値動き）"""
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0005, n))
+    spread = np.abs(rng.normal(0, 0.0003, n))
+    return pd.DataFrame({
+        "datetime": pd.date_range(start, periods=n, freq=freq),
+        "open": close + rng.normal(0, 0.0001, n),
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+        "volume": rng.integers(100, 1000, n).astype(float),
+    })
+
+
+@pytest.fixture
+def ml(monkeypatch):
+    """LSTM を LinearSequenceModel に差し替えた ml_trading_system モジュール"""
+    pytest.importorskip("tensorflow")
+    pytest.importorskip("talib")
+    import ml_trading_system
+
+    monkeypatch.setattr(ml_trading_system.LSTMModel, "build_model", lambda self: LinearSequenceModel())
+    monkeypatch.setattr(ml_trading_system, "EarlyStopping", lambda **kwargs: None)
+    return ml_trading_system
+
+
+def train_system(ml, bars, rf_trees=10, gb_trees=10):
+    system = ml.MLTradingSystem()
+    system.ensemble_model = ml.EnsembleModel({"n_estimators": rf_trees}, {"n_estimators": gb_trees})
+    system.train_from_features(system.prepare_data(bars), verbose=0)
+    return system
+
+
+@pytest.fixture
+def trained_system(ml):
+    return train_system(ml, make_bars(600))
+
+
+@pytest.fixture
+def api(ml, tmp_path_factory, monkeypatch):
+    """flask_trading_api モジュール（ログは一時ディレクトリへ）"""
+    monkeypatch.setenv("TRADING_LOG_FILE", str(tmp_path_factory.getbasetemp() / "trading_api.log"))
+    import flask_trading_api
+    yield flask_trading_api
+    # ティックの集計は終了時にも出力されるので、pytest が標準エラーを閉じる前に出しておく
+    flask_trading_api.TICK_SUMMARY.flush()
+
+
+@pytest.fixture
+def server(api, tmp_path, monkeypatch):
+    """一時ディレクトリを保存先にした TradingAPIServer（ML は同期で読み込み、定期再学習は止める）"""
+    monkeypatch.setattr(api, "current_dir", str(tmp_path))
+    monkeypatch.setattr(api, "FAST_START", False)
+    monkeypatch.setattr(api.TradingAPIServer, "start_background_tasks", lambda self: None)
+    return api.TradingAPIServer()
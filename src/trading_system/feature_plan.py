@@ -0,0 +1,302 @@
+"""
+prepare_data の特徴量を依存グラフ（DAG）として宣言し、共通の中間結果を1回だけ計算する
+
+- シフト・移動平均・移動分散・移動高値/安値・TA-Lib の指標をノードとして宣言し、
+  同じノードを参照する特徴量どうしで共有する（sma_5 と close_mean_5、price_change と close_pct_lag_1 など）
+- 出力は事前に確保した float32 の行列へ直接書き込む（pd.concat で DataFrame を何枚も作らない）
+- 中間結果は最後に参照された時点で解放する
+- LEGACY_COLUMNS は従来の prepare_data と同じ列（既存の学習済みモデル用）、
+  MODEL_COLUMNS は同じノードを指す重複列を除いたもの（新しく学習するモデルの入力）
+"""
+import numpy as np
+import pandas as pd
+import talib
+
+INPUT_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class FeatureGraph:
+    """中間結果・特徴量のノード（名前 -> (依存ノード, 関数)）と、出力列 -> ノードの対応"""
+
+    def __init__(self):
+        self.nodes = {name: ((), None) for name in INPUT_COLUMNS}
+        self.columns = {}
+
+    def add(self, name, deps, fn):
+        # 同じ名前のノードは最初の宣言だけを使う（= 同じ中間結果を共有する）
+        if name not in self.nodes:
+            self.nodes[name] = (tuple(deps), fn)
+        return name
+
+    def column(self, column, node):
+        self.columns[column] = node
+
+    # === 中間結果（プリミティブ） ===
+    def shift(self, src, k):
+        def fn(x):
+            out = np.full(len(x), np.nan)
+            if len(x) > k:
+                out[k:] = x[:len(x) - k]
+            return out
+        return self.add(f"shift({src},{k})", (src,), fn)
+
+    def pct(self, src, k):
+        """pandas の pct_change(k) と同じ"""
+        return self.add(f"pct({src},{k})", (src, self.shift(src, k)), lambda x, prev: x / prev - 1)
+
+    def mean(self, src, window):
+        return self.add(f"mean({src},{window})", (src,), lambda x: talib.SMA(x, timeperiod=window))
+
+    def var(self, src, window):
+        """標本分散（ddof=1）。桁落ちしにくい pandas の rolling で計算"""
+        return self.add(f"var({src},{window})", (src,),
+                        lambda x: pd.Series(x).rolling(window).var().to_numpy())
+
+    def std(self, src, window, ddof=1):
+        # 標本分散（ddof=1）から換算: var_ddof = var_1 * (n - 1) / (n - ddof)
+        factor = (window - 1) / (window - ddof)
+        return self.add(f"std({src},{window},{ddof})", (self.var(src, window),),
+                        lambda v: np.sqrt(v * factor) if ddof != 1 else np.sqrt(v))
+
+    def rolling_max(self, src, window):
+        return self.add(f"max({src},{window})", (src,), lambda x: talib.MAX(x, timeperiod=window))
+
+    def rolling_min(self, src, window):
+        return self.add(f"min({src},{window})", (src,), lambda x: talib.MIN(x, timeperiod=window))
+
+    def talib(self, func, inputs, output=None, **params):
+        """TA-Lib の関数（複数出力の関数は output で何番目かを選ぶ）"""
+        args = ",".join(inputs + tuple(f"{k}={v}" for k, v in sorted(params.items())))
+        name = self.add(f"{func}({args})", inputs, lambda *x: getattr(talib, func)(*x, **params))
+        if output is None:
+            return name
+        return self.add(f"{name}[{output}]", (name,), lambda values: values[output])
+
+
+class FeaturePlan:
+    """
+    指定した列の計算手順（必要なノードのトポロジカル順と、各ノードの解放タイミング）
+
+    execute(df) は (len(df), len(columns)) の行列を返す
+    """
+
+    def __init__(self, graph, columns):
+        self.columns = list(columns)
+        self.column_nodes = {col: graph.columns[col] for col in self.columns}
+        column_nodes = list(self.column_nodes.values())
+
+        order = []
+        visited = set()
+
+        def visit(name):
+            if name in visited:
+                return
+            visited.add(name)
+            for dep in graph.nodes[name][0]:
+                visit(dep)
+            order.append(name)
+
+        for name in column_nodes:
+            visit(name)
+
+        self.steps = [(name,) + graph.nodes[name] for name in order]
+        self.outputs = {}
+        for j, name in enumerate(column_nodes):
+            self.outputs.setdefault(name, []).append(j)
+
+        # 各ステップの後に不要になるノード
+        last_use = {}
+        for i, (name, deps, _) in enumerate(self.steps):
+            last_use[name] = i
+            for dep in deps:
+                last_use[dep] = i
+        self.release = [[] for _ in self.steps]
+        for name, i in last_use.items():
+            self.release[i].append(name)
+
+    @property
+    def node_count(self):
+        return len(self.steps)
+
+    def execute(self, df, overrides=None, dtype=np.float32):
+        """
+        Parameters:
+        - df: open/high/low/close/volume を持つ DataFrame
+        - overrides: {列名: 配列} 計算せずにこの値を使う列（replay_signals の再帰型指標など）
+        - dtype: 出力行列の型（中間結果は float64 で計算）
+        """
+        node_overrides = {
+            self.column_nodes[col]: np.asarray(value, dtype=np.float64)
+            for col, value in (overrides or {}).items() if col in self.column_nodes
+        }
+
+        out = np.empty((len(df), len(self.columns)), dtype=dtype)
+        values = {}
+        for i, (name, deps, fn) in enumerate(self.steps):
+            if name in node_overrides:
+                value = node_overrides[name]
+            elif fn is None:
+                value = df[name].to_numpy(dtype=np.float64)
+            else:
+                value = fn(*(values[dep] for dep in deps))
+            values[name] = value
+            for j in self.outputs.get(name, ()):
+                out[:, j] = value
+            for done in self.release[i]:
+                del values[done]
+        return out
+
+
+def _build_graph():
+    """従来の prepare_data と同じ列・同じ順で特徴量を宣言"""
+    g = FeatureGraph()
+    for col in INPUT_COLUMNS:
+        g.column(col, col)
+
+    # テクニカル指標（TechnicalIndicators.calculate_indicators）
+    for window in (5, 10, 20):
+        g.column(f'sma_{window}', g.mean('close', window))
+    g.column('ema_12', g.talib('EMA', ('close',), timeperiod=12))
+    g.column('ema_26', g.talib('EMA', ('close',), timeperiod=26))
+    for output, col in enumerate(['macd', 'macd_signal', 'macd_hist']):
+        g.column(col, g.talib('MACD', ('close',), output))
+    g.column('rsi', g.talib('RSI', ('close',), timeperiod=14))
+
+    # ボリンジャーバンド（talib.BBANDS の既定: 20期間・±2σ・母標準偏差）
+    middle = g.mean('close', 20)
+    band = g.std('close', 20, ddof=0)
+    upper = g.add('bb_upper', (middle, band), lambda m, s: m + 2.0 * s)
+    lower = g.add('bb_lower', (middle, band), lambda m, s: m - 2.0 * s)
+    g.column('bb_upper', upper)
+    g.column('bb_middle', middle)
+    g.column('bb_lower', lower)
+    g.column('bb_width', g.add('bb_width', (upper, lower, middle), lambda u, l, m: (u - l) / m))
+
+    # ストキャスティクス（talib.STOCH の既定: fastk 5, slowk 3, slowd 3, SMA）
+    highest = g.rolling_max('high', 5)
+    lowest = g.rolling_min('low', 5)
+
+    def fast_k(close, hh, ll):
+        diff = hh - ll
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # 幅0のバーは TA-Lib と同じく 0（NaN はそのまま NaN）
+            return np.where(diff != 0, (close - ll) / diff * 100.0, 0.0)
+
+    fastk = g.add('fastk(5)', ('close', highest, lowest), fast_k)
+    slowk_raw = g.mean(fastk, 3)
+    slowd = g.mean(slowk_raw, 3)
+    # TA-Lib は slowd が揃うまで slowk も出力しない
+    g.column('stoch_k', g.add('stoch_k', (slowk_raw, slowd), lambda k, d: np.where(np.isnan(d), np.nan, k)))
+    g.column('stoch_d', slowd)
+
+    g.column('atr', g.talib('ATR', ('high', 'low', 'close'), timeperiod=14))
+    g.column('adx', g.talib('ADX', ('high', 'low', 'close'), timeperiod=14))
+    g.column('volume_sma', g.mean('volume', 20))
+
+    # 価格特徴量（FeatureEngineering.create_price_features）
+    g.column('price_change', g.pct('close', 1))
+    g.column('price_change_5', g.pct('close', 5))
+    g.column('price_change_10', g.pct('close', 10))
+    g.column('hl_ratio', g.add('hl_ratio', ('high', 'low', 'close'), lambda h, l, c: (h - l) / c))
+    open_close = g.add('open-close', ('open', 'close'), lambda o, c: o - c)
+    g.column('oc_ratio', g.add('oc_ratio', (open_close, 'close'), lambda d, c: d / c))
+    g.column('body_size', g.add('body_size', (open_close, 'close'), lambda d, c: np.abs(d) / c))
+    g.column('upper_shadow', g.add('upper_shadow', ('high', 'open', 'close'),
+                                   lambda h, o, c: (h - np.maximum(o, c)) / c))
+    g.column('lower_shadow', g.add('lower_shadow', ('low', 'open', 'close'),
+                                   lambda l, o, c: (np.minimum(o, c) - l) / c))
+
+    # ラグ特徴量（FeatureEngineering.create_lag_features）
+    for lag in (1, 2, 3, 5, 10):
+        g.column(f'close_lag_{lag}', g.shift('close', lag))
+        g.column(f'close_pct_lag_{lag}', g.pct('close', lag))
+
+    # 移動統計（FeatureEngineering.create_rolling_features）
+    for window in (5, 10, 20):
+        g.column(f'close_mean_{window}', g.mean('close', window))
+        g.column(f'close_std_{window}', g.std('close', window))
+        g.column(f'volume_mean_{window}', g.mean('volume', window))
+
+    return g
+
+
+GRAPH = _build_graph()
+
+# 従来の prepare_data の列（この列で学習した既存モデル用）
+LEGACY_COLUMNS = list(GRAPH.columns)
+
+
+def _unique_columns(columns):
+    seen = set()
+    unique = []
+    for col in columns:
+        node = GRAPH.columns[col]
+        if node not in seen:
+            seen.add(node)
+            unique.append(col)
+    return unique
+
+
+# 同じ値の列を除いたモデル入力（sma_* = close_mean_*, bb_middle = sma_20, volume_sma = volume_mean_20,
+# price_change* = close_pct_lag_* は先に出てくる方だけ残す）
+MODEL_COLUMNS = _unique_columns(LEGACY_COLUMNS)
+
+_plans = {}
+
+
+def get_plan(columns):
+    """列の組み合わせごとの計算手順（1回だけ作って使い回す）"""
+    key = tuple(columns)
+    if key not in _plans:
+        _plans[key] = FeaturePlan(GRAPH, key)
+    return _plans[key]
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+    from ml_trading_system import TechnicalIndicators, FeatureEngineering
+
+    def legacy_features(df):
+        """従来の prepare_data（dropna 前）"""
+        return pd.concat([
+            df[['open', 'high', 'low', 'close', 'volume']],
+            TechnicalIndicators.calculate_indicators(df),
+            FeatureEngineering.create_price_features(df),
+            FeatureEngineering.create_lag_features(df),
+            FeatureEngineering.create_rolling_features(df),
+        ], axis=1)
+
+    np.random.seed(0)
+    n = 100000
+    close = 1.1 + np.cumsum(np.random.randn(n) * 0.0005)
+    df = pd.DataFrame({
+        'open': close + np.random.randn(n) * 0.0001,
+        'high': close + np.abs(np.random.randn(n)) * 0.0002,
+        'low': close - np.abs(np.random.randn(n)) * 0.0002,
+        'close': close,
+        'volume': np.random.randint(100, 1000, n),
+    })
+
+    legacy = legacy_features(df)
+    planned = get_plan(LEGACY_COLUMNS).execute(df, dtype=np.float64)
+    print("列の一致:", list(legacy.columns) == LEGACY_COLUMNS)
+    print("NaN位置の一致:", bool((legacy.isna().values == np.isnan(planned)).all()))
+    scale = np.nanmax(np.abs(legacy.values), axis=0)
+    error = np.nanmax(np.abs(planned - legacy.values), axis=0) / scale
+    print(f"最大相対誤差（float64）: {error.max():.2e} ({LEGACY_COLUMNS[int(error.argmax())]})")
+    print(f"ノード数: 従来列 {len(LEGACY_COLUMNS)} → 計算ノード {get_plan(LEGACY_COLUMNS).node_count}, "
+          f"モデル入力 {len(MODEL_COLUMNS)} 列")
+
+    for label, fn in [("従来（pd.concat）", lambda: legacy_features(df).dropna()),
+                      ("DAG（float32）", lambda: get_plan(MODEL_COLUMNS).execute(df))]:
+        fn()
+        started = time.perf_counter()
+        for _ in range(5):
+            fn()
+        seconds = (time.perf_counter() - started) / 5
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label}: {seconds * 1000:.1f} ms, ピークメモリ {peak / 1e6:.1f} MB")
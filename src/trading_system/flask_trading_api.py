@@ -1,47 +1,140 @@
+import time
+_process_started = time.perf_counter()  # 起動時間の基準
+
+import copy
 import sys
 import os
-import pytz
+import importlib
+import atexit
 
 # ???????????????
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
+sys.path.append(os.path.join(os.path.dirname(current_dir), "utils"))
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 import pandas as pd
 import numpy as np
 import json
 import logging
 from datetime import datetime
 import threading
-import time
+import queue
 from pathlib import Path
 
-# ??????????????(???????????)
-try:
-    from ml_trading_system import MLTradingSystem
-    ML_SYSTEM_AVAILABLE = True
-except ImportError as e:
-    print(f"??: ml_trading_system ?????????????: {e}")
-    print("????API????????????")
-    ML_SYSTEM_AVAILABLE = False
-    # ?????????
-    class MLTradingSystem:
-        def __init__(self):
-            pass
-        def load_model(self, path):
+from metrics import METRICS
+from profiling import RequestProfiler
+from log_pipeline import setup_logging, TickLogSummary
+from session_calendar import calendar_for
+from bar_aggregator import BarAggregator, DEFAULT_TIMEFRAMES, TIMEFRAME_SECONDS
+from shard_router import HashRing
+from shm_ring import TickRingWriter
+from signal_board import SignalBoard
+
+# 起動時に読み込むのは受信に必要なモジュールだけ（ここまでの読み込み時間）
+IMPORT_PROFILE = [{'module': 'flask+pandas (startup)', 'seconds': round(time.perf_counter() - _process_started, 3)}]
+
+# 高速起動: 先にリクエストの受付を始め、MLモジュールとモデルはバックグラウンドで読み込む
+# （TRADING_API_FAST_START=0 で従来どおり読み込み完了後に受付開始）
+FAST_START = os.environ.get('TRADING_API_FAST_START', '1') != '0'
+
+# ティックの時刻（EA が送る MT5 のサーバー時間、タイムゾーン無し）のタイムゾーン
+# （例: UTC+3 固定のブローカーは 'Etc/GMT-3'。Experts/MLTradingEA.mq5 の送信部分にも記載、
+#  サービスは maintenance/nssm_rebuild.ps1 -TickTimezone で設定）
+# 未設定ならティックの時刻は使わず、現在時刻で取引時間を判定する
+TICK_TIMEZONE = os.environ.get('TRADING_TICK_TIMEZONE') or None
+
+# ティックから作る時間足と、時間足ごとに保持する確定バーの本数
+BAR_TIMEFRAMES = tuple(os.environ.get('TRADING_BAR_TIMEFRAMES', ','.join(DEFAULT_TIMEFRAMES)).split(','))
+BAR_HISTORY = int(os.environ.get('TRADING_BAR_HISTORY', '1000'))
+# EA のチャート時間足（ティックの high/low がどの時間足のバーのものか）。ティックの period が無いときに使う
+# 未設定で period も無ければ、バーには終値だけを反映する
+EA_PERIOD = os.environ.get('TRADING_EA_PERIOD') or None
+
+# シャーディング: shard_router.py から起動されたワーカーは担当シンボルだけを扱う
+SHARD_INDEX = int(os.environ.get('TRADING_SHARD_INDEX', '0'))
+SHARD_COUNT = int(os.environ.get('TRADING_SHARD_COUNT', '1'))
+SHARD_RING = HashRing(range(SHARD_COUNT), int(os.environ.get('TRADING_SHARD_VNODES', '64')))
+
+
+def owns_symbol(symbol):
+    return SHARD_COUNT <= 1 or SHARD_RING.node_for(symbol) == SHARD_INDEX
+
+# 共有メモリのティックリング（TRADING_SHM_RING=1 で有効）
+# 別プロセスの推論・集計は shm_ring.TickRingReader でシンボルごとの直近ティックをコピーなしで読む
+SHM_RINGS = None
+if os.environ.get('TRADING_SHM_RING') == '1':
+    SHM_RINGS = TickRingWriter(os.environ.get('TRADING_SHM_PREFIX', 'trading_ticks'),
+                               int(os.environ.get('TRADING_SHM_CAPACITY', '8192')))
+    atexit.register(SHM_RINGS.close)
+
+# バー確定時にシグナルを計算しておく時間足（/signal?timeframe=）と、
+# 受信データそのもので予測する既定の /signal を計算し直すきっかけの時間足
+SIGNAL_TIMEFRAMES = tuple(tf for tf in os.environ.get('TRADING_SIGNAL_TIMEFRAMES', ','.join(BAR_TIMEFRAMES)).split(',')
+                          if tf in BAR_TIMEFRAMES)
+
+
+def _signal_trigger_timeframe(requested, timeframes):
+    """作っていない時間足ではバーが確定せず既定の /signal が更新されないので、そのときは最も短い時間足を使う"""
+    if requested in timeframes:
+        return requested
+    return min(timeframes, key=lambda tf: TIMEFRAME_SECONDS.get(tf, float('inf')))
+
+
+SIGNAL_TRIGGER_REQUESTED = os.environ.get('TRADING_SIGNAL_TRIGGER', 'M1')
+SIGNAL_TRIGGER_TIMEFRAME = _signal_trigger_timeframe(SIGNAL_TRIGGER_REQUESTED, BAR_TIMEFRAMES)
+SIGNAL_WAIT_MAX_SECONDS = 55  # ロングポーリングの上限（shard_router の転送タイムアウトより短く）
+
+# 予測遅延の上限（ウォームアップ後の p99, ミリ秒）。超えたモデルはシグナルに使わない
+SIGNAL_P99_BUDGET_MS = float(os.environ.get('SIGNAL_P99_BUDGET_MS', '250'))
+
+# MLモジュール（TensorFlow/Keras・sklearn・TA-Lib）は _load_ml_module で読み込む
+# None: 未読み込み, True: 読み込み済み, False: 読み込めない（受信のみで動作）
+ML_SYSTEM_AVAILABLE = None
+MLTradingSystem = None
+
+# 読み込み時間を個別に計測するモジュール（依存される側から順に読み込む）
+# 詳細なツリーは python -X importtime flask_trading_api.py で確認できる
+HEAVY_MODULES = ['numpy', 'sklearn.ensemble', 'talib', 'tensorflow', 'feature_plan', 'ml_trading_system']
+
+
+def _load_ml_module():
+    """MLモジュールを読み込み、モジュールごとの読み込み時間を IMPORT_PROFILE に追加"""
+    global ML_SYSTEM_AVAILABLE, MLTradingSystem
+    for name in HEAVY_MODULES:
+        cached = name in sys.modules
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            IMPORT_PROFILE.append({'module': name, 'seconds': round(time.perf_counter() - started, 3),
+                                   'error': str(e)})
+            logging.warning(f"ml_trading_system を読み込めません: {e} - データ受信のみで動作します")
+            ML_SYSTEM_AVAILABLE = False
             return False
-        def generate_signal(self, df, price):
-            return "HOLD", 0.0, None, "ML system not available"
-
-# ????
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('trading_api.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+        IMPORT_PROFILE.append({'module': name, 'seconds': round(time.perf_counter() - started, 3),
+                               'cached': cached})
+
+    MLTradingSystem = sys.modules['ml_trading_system'].MLTradingSystem
+    ML_SYSTEM_AVAILABLE = True
+    return True
+
+# ログはキュー経由で別スレッドが書き込む（trading_api.log はサイズでローテーション）
+# ティックごとのログは出さず、TICK_SUMMARY がシンボルごとの件数を一定間隔でまとめて出力する
+LOG_PIPELINE = setup_logging(
+    os.environ.get('TRADING_LOG_FILE', 'trading_api.log'),
+    level=os.environ.get('TRADING_LOG_LEVEL', 'DEBUG').upper(),
+    max_bytes=int(os.environ.get('TRADING_LOG_MAX_BYTES', 20 * 1024 * 1024)),
+    backup_count=int(os.environ.get('TRADING_LOG_BACKUPS', '10')),
+    rate_interval=float(os.environ.get('TRADING_LOG_RATE_SECONDS', '60')),
 )
+TICK_SUMMARY = TickLogSummary(interval=float(os.environ.get('TRADING_LOG_SUMMARY_SECONDS', '60')),
+                              pipeline=LOG_PIPELINE)
+# werkzeug のアクセスログは /tick ごとに1行出るので警告以上だけにする（件数は /metrics で確認）
+logging.getLogger('werkzeug').setLevel(os.environ.get('TRADING_ACCESS_LOG_LEVEL', 'WARNING').upper())
+if SIGNAL_TRIGGER_TIMEFRAME != SIGNAL_TRIGGER_REQUESTED:
+    logging.warning(f"TRADING_SIGNAL_TRIGGER={SIGNAL_TRIGGER_REQUESTED} は TRADING_BAR_TIMEFRAMES "
+                    f"({','.join(BAR_TIMEFRAMES)}) に無いため {SIGNAL_TRIGGER_TIMEFRAME} を使います")
 
 app = Flask(__name__)
 
@@ -70,40 +163,36 @@ class SymbolDataManager:
         # ??????
         self.last_unique_data = None
         self.duplicate_count = 0
-        self.market_timezone = pytz.timezone('America/New_York')  # NYSE??
+        self.calendar = calendar_for(symbol)  # 銘柄クラス（FX・貴金属・株価指数）の取引セッション
+        self.bars = BarAggregator(BAR_TIMEFRAMES, max_bars=BAR_HISTORY)  # 時間足ごとの OHLCV
+        self.on_bar_close = None  # バー確定時に (symbol, {時間足: バーの開始時刻}) で呼ばれる
+        self.ea_period = EA_PERIOD  # 直近のティックが送ってきた EA のチャート時間足
         
         # ???????????
         self.load_current_data()
+        for item in self.data_buffer:
+            self.bars.add_snapshot(item['datetime'], float(item['close']), float(item['volume']),
+                                   float(item['high']), float(item['low']), self.ea_period)
+        if SHM_RINGS is not None and SHM_RINGS.ring(symbol).count == 0:
+            for item in self.data_buffer:
+                SHM_RINGS.append(symbol, item)
     
     def is_market_open(self, timestamp=None):
-        """??????????(???????)"""
+        """
+        timestamp が銘柄クラスの取引セッション中か
+
+        None、または TICK_TIMEZONE 未設定でタイムゾーン無しの時刻は現在時刻で判定する
+        （サーバー時間のタイムゾーンが分からないまま UTC とみなすと、セッション終盤を休場と誤判定するため）
+        """
         try:
-            # ?????NY?????
-            current_ny_time = datetime.now(self.market_timezone)
-            weekday = current_ny_time.weekday()  # 0=??, 6=??
-            hour = current_ny_time.hour
-            
-            # ????????
-            #logging.debug(f"[{self.symbol}] ????DEBUG: current_ny_time={current_ny_time}, weekday={weekday}, hour={hour}")
-            
-            # ?????
-            if weekday >= 5:  # ??(5), ??(6)
-                logging.debug(f"[{self.symbol}] ???????")
-                return False
-            
-            # ????21:00?? (NY??)
-            if weekday == 4 and hour >= 21:
-                logging.debug(f"[{self.symbol}] ??21????????")
-                return False
-                
-            # ???17:00???? (NY??)
-            if weekday == 0 and hour < 17:
-                logging.debug(f"[{self.symbol}] ??17???????")
-                return False
-                
-            logging.debug(f"[{self.symbol}] ?????")
-            return True
-            
+            if timestamp is not None and TICK_TIMEZONE is None and pd.Timestamp(timestamp).tzinfo is None:
+                timestamp = None
+            market_open = self.calendar.is_open(timestamp, tz=TICK_TIMEZONE)
+            state = 'open' if market_open else 'closed'
+            logging.debug(f"[{self.symbol}] market {state} ({self.calendar.rule})",
+                          extra={'rate_key': (self.symbol, f'market_{state}')})
+            return market_open
+
         except Exception as e:
             logging.warning(f"[{self.symbol}] ?????????: {e}")
             return True  # ??????????????
@@ -140,7 +229,8 @@ class SymbolDataManager:
             # symbol??????
             df['symbol'] = self.symbol
             
-            df.to_csv(self.current_file, index=False, encoding='utf-8')
+            with METRICS.timer('trading_data_write_seconds', kind='save'):
+                df.to_csv(self.current_file, index=False, encoding='utf-8')
             logging.info(f"[{self.symbol}] ?????: {len(self.data_buffer)}? -> {self.current_file}")
             self.last_backup_time = datetime.now()
             
@@ -188,6 +278,9 @@ class SymbolDataManager:
                 if field not in tick_data:
                     raise ValueError(f"??????????: {field}")
             
+            # EA のチャート時間足は保存するデータの列に含めない
+            self.ea_period = tick_data.pop('period', None) or self.ea_period
+            
             # ???????????
             if isinstance(tick_data['datetime'], str):
                 tick_data['datetime'] = pd.to_datetime(tick_data['datetime'])
@@ -215,12 +308,12 @@ class SymbolDataManager:
                 # ??????????????
                 if not market_open:
                     if self.duplicate_count > 10:  # 10???????????
-                        logging.debug(f"[{self.symbol}] ???????????? (#{self.duplicate_count})")
+                        TICK_SUMMARY.record(self.symbol, 'duplicate')
                         return True
                 
                 # ???????????????
                 elif self.duplicate_count > 3:
-                    logging.debug(f"[{self.symbol}] ????????? (#{self.duplicate_count})")
+                    TICK_SUMMARY.record(self.symbol, 'duplicate')
                     return True
             else:
                 self.duplicate_count = 0  # ???????????????
@@ -229,10 +322,14 @@ class SymbolDataManager:
             self.data_buffer.append(tick_data)
             
             # ?????????
-            if market_open:
-                logging.info(f"[{self.symbol}] ?????????: {tick_data['datetime']}, Close: {tick_data['close']}")
-            else:
-                logging.debug(f"[{self.symbol}] ??????: {tick_data['datetime']}, Close: {tick_data['close']}")
+            TICK_SUMMARY.record(self.symbol, 'stored' if market_open else 'closed', tick_data['close'])
+            closed_bars = self.bars.add_snapshot(tick_data['datetime'], float(tick_data['close']),
+                                                 float(tick_data['volume']), float(tick_data['high']),
+                                                 float(tick_data['low']), self.ea_period)
+            if closed_bars and self.on_bar_close is not None:
+                self.on_bar_close(self.symbol, closed_bars)
+            if SHM_RINGS is not None:
+                SHM_RINGS.append(self.symbol, tick_data)
             
             # ?????????(??????????)
             if market_open:
@@ -273,38 +370,40 @@ class SymbolDataManager:
             if len(archive_data) == 0:
                 return
             
-            # ???????????????????
-            unique_dates = set()
-            for item in archive_data:
-                unique_dates.add(pd.to_datetime(item['datetime']).date())
-            
-            if len(unique_dates) == 1 and excess_count > 100:
-                # ???????????????(?????????)
-                sample_data = archive_data[::10]  # 10??????????
-                logging.info(f"[{self.symbol}] ????????????????????: {len(archive_data)}? -> {len(sample_data)}?")
-                archive_data = sample_data
-            
-            if len(archive_data) == 0:
-                self.data_buffer = self.data_buffer[excess_count:]
-                return
-            
             archive_df = pd.DataFrame(archive_data)
+            archive_df['datetime'] = pd.to_datetime(archive_df['datetime'])
+            if TICK_TIMEZONE is None:
+                # ティックの時刻では判定できないので、現在時刻で判定して全件を間引き対象にする（従来どおり）
+                open_mask = np.full(len(archive_df), self.is_market_open())
+                protected = np.zeros(len(archive_df), dtype=bool)
+            else:
+                open_mask = self.calendar.is_open_array(archive_df['datetime'], tz=TICK_TIMEZONE)
+                protected = open_mask
+            
+            if archive_df['datetime'].dt.normalize().nunique() == 1 and excess_count > 100 and not protected.all():
+                # 10件に1件に間引く（TICK_TIMEZONE 設定時はセッション外のティックだけ。セッション中は全て残す）
+                keep = protected.copy()
+                keep[np.flatnonzero(~protected)[::10]] = True
+                logging.info(f"[{self.symbol}] ????????????????????: {len(archive_df)}? -> {int(keep.sum())}?")
+                archive_df = archive_df[keep].reset_index(drop=True)
+                open_mask = open_mask[keep]
             
             # ???????
-            first_date = pd.to_datetime(archive_df['datetime'].iloc[0]).strftime('%Y%m%d_%H%M')
-            last_date = pd.to_datetime(archive_df['datetime'].iloc[-1]).strftime('%Y%m%d_%H%M')
+            first_date = archive_df['datetime'].iloc[0].strftime('%Y%m%d_%H%M')
+            last_date = archive_df['datetime'].iloc[-1].strftime('%Y%m%d_%H%M')
             timestamp = datetime.now().strftime('%H%M%S')
             
-            market_status = "closed" if not self.is_market_open(archive_df['datetime'].iloc[0]) else "open"
+            market_status = "open" if open_mask[0] else "closed"
             archive_filename = f"{self.symbol}_{first_date}_{last_date}_{market_status}_{timestamp}.csv"
             archive_path = self.archive_dir / archive_filename
             
             # ???????
-            archive_df['datetime'] = pd.to_datetime(archive_df['datetime']).dt.strftime('%Y-%m-%d %H:%M:%S')
+            archive_df['datetime'] = archive_df['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S')
             archive_df['symbol'] = self.symbol
-            archive_df.to_csv(archive_path, index=False, encoding='utf-8')
+            with METRICS.timer('trading_data_write_seconds', kind='archive'):
+                archive_df.to_csv(archive_path, index=False, encoding='utf-8')
             
-            logging.info(f"[{self.symbol}] ???????: {len(archive_data)}? -> {archive_filename}")
+            logging.info(f"[{self.symbol}] ???????: {len(archive_df)}? -> {archive_filename}")
             
             # ???????
             self.data_buffer = self.data_buffer[excess_count:]
@@ -368,10 +467,22 @@ class SymbolDataManager:
 
 class TradingAPIServer:
     def __init__(self):
-        if ML_SYSTEM_AVAILABLE:
-            self.ml_system = MLTradingSystem()
-        else:
-            self.ml_system = None
+        # MLシステムは initialize_ml で作成（高速起動ではバックグラウンド）
+        self.ml_system = None
+        self.ml_ready = threading.Event()  # 読み込み処理が終わったら（成功・失敗とも）セット
+        # model_lock: 予測・モデルの読み込み・複製・入れ替えの間 ml_system を他から触らせない
+        # retrain_lock: 再学習を1つずつ行う（同時に再学習すると後から入れ替えた方が先の結果を消す）
+        # 学習自体は複製したモデルで行うので、学習中も配信中のモデルで予測できる
+        self.model_lock = threading.RLock()
+        self.retrain_lock = threading.Lock()
+        self.startup = {
+            'mode': 'fast' if FAST_START else 'blocking',
+            'state': 'pending',
+            'import_seconds': None,
+            'model_load_seconds': None,
+            'ready_seconds': None,
+            'error': None
+        }
             
         # ??????????????
         self.symbol_managers = {}
@@ -383,6 +494,14 @@ class TradingAPIServer:
         self.last_confidence = {}  # ?????
         self.last_prediction = {}  # ?????
         self.model_loaded = {}  # ?????
+        self.training_reports = {}  # 直近の学習時間の報告（シンボル別）
+        self.warmup_reports = {}  # 直近のウォームアップの遅延（シンボル別）
+        self.incremental_periods = 300  # 追加学習に使う直近のバー数（指標・シーケンスの計算分を含む）
+        
+        # バー確定時に計算したシグナル（/signal はここから返す）
+        self.signal_board = SignalBoard()
+        self.signal_queue = queue.Queue()
+        threading.Thread(target=self._signal_worker, name='signal-precompute', daemon=True).start()
         
         # ?????
         self.error_count = 0
@@ -390,29 +509,67 @@ class TradingAPIServer:
         self.connection_errors = 0
         self.last_successful_request = datetime.now()
         
-        # ??????????
-        if ML_SYSTEM_AVAILABLE:
-            self.load_existing_models()
+        if FAST_START:
+            threading.Thread(target=self.initialize_ml, name='ml-loader', daemon=True).start()
+        else:
+            self.initialize_ml()
         
         # ????????????????
         self.start_background_tasks()
     
+    def initialize_ml(self):
+        """MLモジュールと既存モデルを読み込む（高速起動ではバックグラウンドスレッドで実行）"""
+        try:
+            self.startup['state'] = 'importing'
+            started = time.perf_counter()
+            available = _load_ml_module()
+            self.startup['import_seconds'] = round(time.perf_counter() - started, 3)
+            
+            if available:
+                sys.modules['ml_trading_system'].set_stage_observer(_observe_signal_stage)
+                self.ml_system = MLTradingSystem()
+                self.startup['state'] = 'loading_models'
+                started = time.perf_counter()
+                self.load_existing_models()
+                self.startup['model_load_seconds'] = round(time.perf_counter() - started, 3)
+                self.startup['state'] = 'ready'
+            else:
+                self.startup['state'] = 'ml_unavailable'
+        except Exception as e:
+            self.startup['state'] = 'error'
+            self.startup['error'] = str(e)
+            logging.error(f"MLシステムの初期化に失敗しました: {e}")
+        finally:
+            self.startup['ready_seconds'] = round(time.perf_counter() - _process_started, 3)
+            self.ml_ready.set()
+        
+        profile = ", ".join(f"{item['module']} {item['seconds']:.2f}s" for item in IMPORT_PROFILE)
+        logging.info(f"MLシステム初期化完了 ({self.startup['state']}): 起動から {self.startup['ready_seconds']:.2f}秒 "
+                     f"[インポート {profile}]")
+    
     def get_symbol_manager(self, symbol):
         """?????????????????"""
         if symbol not in self.symbol_managers:
             self.symbol_managers[symbol] = SymbolDataManager(
                 self.data_base_dir, symbol, self.max_buffer_size
             )
+            self.symbol_managers[symbol].on_bar_close = self.on_bar_close
             # ??????????????
-            self.last_signal[symbol] = "HOLD"
-            self.last_confidence[symbol] = 0.0
-            self.last_prediction[symbol] = None
-            self.model_loaded[symbol] = False
+            # 起動時に読み込んで配信中のモデルは、最初のティックで未読み込みに戻さない
+            self.last_signal.setdefault(symbol, "HOLD")
+            self.last_confidence.setdefault(symbol, 0.0)
+            self.last_prediction.setdefault(symbol, None)
+            self.model_loaded.setdefault(symbol, False)
             
         return self.symbol_managers[symbol]
     
     def load_existing_models(self):
         """???????????(trading_model.pkl??)"""
+        # 配信中のモデルへ上書きで読み込むので、読み込みとウォームアップの間は予測させない
+        with self.model_lock:
+            return self._load_existing_models()
+    
+    def _load_existing_models(self):
         if not ML_SYSTEM_AVAILABLE:
             logging.warning("ML System not available - ???????")
             return
@@ -423,14 +580,18 @@ class TradingAPIServer:
             if generic_model_file.exists():
                 logging.info(f"????????????: {generic_model_file}")
                 try:
-                    if self.ml_system.load_model(str(generic_model_file)):
+                    with METRICS.timer('trading_model_load_seconds', kind='load'):
+                        loaded = self.ml_system.load_model(str(generic_model_file))
+                    if loaded:
                         # ????????????????
-                        for symbol in ['EURUSD', 'USDJPY', 'GBPUSD', 'AUDUSD', 'USDCAD']:  # ??????
-                            self.model_loaded[symbol] = True
+                        symbols = ['EURUSD', 'USDJPY', 'GBPUSD', 'AUDUSD', 'USDCAD']  # ??????
+                        symbols = [symbol for symbol in symbols if owns_symbol(symbol)]
+                        published = self.publish_model(symbols)
+                        for symbol in symbols:
                             logging.info(f"[{symbol}] ???????????")
                         
                         logging.info("? ??ML??? (trading_model.pkl) ??????")
-                        return True
+                        return published
                     else:
                         logging.warning("? ?????????????")
                 except Exception as e:
@@ -438,7 +599,8 @@ class TradingAPIServer:
             
             # 2. ??????????????? (???????)
             model_pattern = "trading_model_*.pkl"
-            model_files = list(Path(current_dir).glob(model_pattern))
+            model_files = [f for f in Path(current_dir).glob(model_pattern)
+                           if owns_symbol(f.stem.replace('trading_model_', ''))]
             
             if len(model_files) == 0:
                 logging.info("?? ??????????????????")
@@ -449,8 +611,9 @@ class TradingAPIServer:
             for model_file in model_files:
                 symbol = model_file.stem.replace('trading_model_', '')
                 try:
-                    if self.ml_system.load_model(str(model_file)):
-                        self.model_loaded[symbol] = True
+                    with METRICS.timer('trading_model_load_seconds', kind='load'):
+                        loaded = self.ml_system.load_model(str(model_file))
+                    if loaded and self.publish_model([symbol]):
                         success_count += 1
                         logging.info(f"[{symbol}] ???????????: {model_file}")
                     else:
@@ -469,6 +632,102 @@ class TradingAPIServer:
             logging.error(f"? ???????????????: {e}")
             return False
     
+    def publish_model(self, symbols, candidate=None):
+        """
+        読み込み・再学習したモデルをウォームアップしてから配信対象にする
+
+        直近のバー（無ければ合成データ）で予測を繰り返し、初回（cold）と2回目以降（warm）の遅延を記録。
+        warm の p99 が SIGNAL_P99_BUDGET_MS 以下のときだけ model_loaded にする
+        candidate（再学習した別の MLTradingSystem）を渡すと、上限内のときだけ ml_system と入れ替え、
+        上限を超えたら配信中のモデルをそのまま使い続ける
+        """
+        system = candidate if candidate is not None else self.ml_system
+        manager = next((self.symbol_managers[s] for s in symbols if s in self.symbol_managers), None)
+        recent = manager.get_recent_dataframe(200) if manager else None
+        try:
+            with METRICS.timer('trading_model_load_seconds', kind='warmup'):
+                report = system.warm_up(recent)
+            report['within_budget'] = report['warm_p99_ms'] <= SIGNAL_P99_BUDGET_MS
+        except Exception as e:
+            report = {'error': str(e), 'within_budget': False}
+        report['budget_ms'] = SIGNAL_P99_BUDGET_MS
+        report['finished_at'] = datetime.now().isoformat()
+        
+        names = ",".join(symbols)
+        if candidate is not None and not report['within_budget']:
+            for symbol in symbols:
+                self.warmup_reports[symbol] = report
+            reason = report.get('error') or f"warm p99 {report['warm_p99_ms']}ms > {SIGNAL_P99_BUDGET_MS}ms"
+            logging.warning(f"[{names}] 再学習したモデルを配信しません（{reason}）。配信中のモデルを使い続けます")
+            return False
+        
+        with self.model_lock:
+            if candidate is not None:
+                self.ml_system = candidate
+            for symbol in symbols:
+                self.warmup_reports[symbol] = report
+                self.model_loaded[symbol] = report['within_budget']
+                self.signal_board.invalidate(symbol)  # 保存済みのシグナルは新しいモデルで計算し直す
+        
+        if 'error' in report:
+            logging.error(f"[{names}] ウォームアップに失敗したため配信しません: {report['error']}")
+        elif report['within_budget']:
+            logging.info(f"[{names}] ウォームアップ完了: cold {report['cold_ms']}ms, "
+                         f"warm p50 {report['warm_p50_ms']}ms / p99 {report['warm_p99_ms']}ms")
+        else:
+            logging.warning(f"[{names}] 予測遅延が上限を超えたため配信しません: warm p99 {report['warm_p99_ms']}ms "
+                            f"> {SIGNAL_P99_BUDGET_MS}ms (cold {report['cold_ms']}ms)")
+        return report['within_budget']
+    
+    # === バー確定時のシグナル計算 ===
+    def on_bar_close(self, symbol, closed_bars):
+        """受信スレッドから呼ばれる。計算はキューに積んで signal-precompute スレッドで行う"""
+        keys = [tf for tf in SIGNAL_TIMEFRAMES if tf in closed_bars]
+        if SIGNAL_TRIGGER_TIMEFRAME in closed_bars:
+            keys.insert(0, 'tick')
+        if keys:
+            self.signal_queue.put((symbol, keys, closed_bars, time.perf_counter()))
+    
+    def _signal_worker(self):
+        while True:
+            symbol, keys, closed_bars, queued = self.signal_queue.get()
+            if not self.ml_ready.is_set() or not self.model_loaded.get(symbol):
+                continue
+            for key in keys:
+                bar_tf = SIGNAL_TRIGGER_TIMEFRAME if key == 'tick' else key
+                try:
+                    self._compute_signal(symbol, key, bar_time=closed_bars[bar_tf])
+                except Exception as e:
+                    logging.error(f"[{symbol}/{key}] バー確定時のシグナル計算に失敗: {e}")
+            METRICS.observe('trading_signal_publish_delay_seconds', time.perf_counter() - queued)
+    
+    def _compute_signal(self, symbol, key, bar_time=None):
+        """シグナルを計算し、成功したら signal_board に保存（保存した結果、または失敗時の結果を返す）"""
+        signal, confidence, predicted_price, message = self.generate_trading_signal(
+            symbol, None if key == 'tick' else key)
+        result = {
+            'signal': signal,
+            'confidence': confidence,
+            'predicted_price': predicted_price,
+            'message': message,
+            'bar_time': bar_time.isoformat() if bar_time is not None else None,
+            'computed_at': datetime.now().isoformat(),
+        }
+        if message != "Success":
+            return dict(result, version=self.signal_board.version(symbol, key), cached=False)
+        self.signal_board.publish(symbol, key, result)
+        return dict(self.signal_board.get(symbol, key), cached=False)
+    
+    def signal_for(self, symbol, timeframe=None):
+        """保存済みのシグナル（無ければその場で計算して保存）"""
+        key = timeframe or 'tick'
+        entry = self.signal_board.get(symbol, key)
+        if entry is not None:
+            METRICS.inc('trading_signal_requests_total', source='cache')
+            return dict(entry, cached=True)
+        METRICS.inc('trading_signal_requests_total', source='computed')
+        return self._compute_signal(symbol, key)
+    
     def add_tick_data(self, tick_data, symbol):
         """??????????"""
         manager = self.get_symbol_manager(symbol)
@@ -476,10 +735,16 @@ class TradingAPIServer:
                 
         return success
     
-    def generate_trading_signal(self, symbol):
-        """?????????(???????????????)"""
+    def generate_trading_signal(self, symbol, timeframe=None):
+        """
+        ?????????(???????????????)
+
+        timeframe を指定すると受信データそのものではなく、その時間足の確定したバーで予測する
+        """
         try:
             # ML????????????
+            if not self.ml_ready.is_set():
+                return "HOLD", 0.0, None, "ML system loading"
             if not ML_SYSTEM_AVAILABLE:
                 return "HOLD", 0.0, None, f"ML system not available"
             
@@ -488,6 +753,11 @@ class TradingAPIServer:
             
             # ??????????????????
             if symbol not in self.model_loaded or not self.model_loaded[symbol]:
+                # ウォームアップで弾かれたモデルは読み込み直さない（再学習で作り直す）
+                warmup = self.warmup_reports.get(symbol)
+                if warmup and not warmup['within_budget']:
+                    return "HOLD", 0.0, None, f"Model for {symbol} not published (warm-up over budget or failed)"
+                
                 # ???????????????????
                 logging.info(f"[{symbol}] ???????? - ????????")
                 self.load_existing_models()
@@ -497,7 +767,11 @@ class TradingAPIServer:
             
             # ?????
             manager = self.get_symbol_manager(symbol)
-            df = manager.get_recent_dataframe(200)
+            with METRICS.timer('trading_signal_stage_seconds', stage='buffer_to_dataframe'):
+                if timeframe:
+                    df = manager.bars.bars(timeframe, 200, include_forming=False)  # 確定したバーのみ
+                else:
+                    df = manager.get_recent_dataframe(200)
             
             if df is None or len(df) < 100:
                 available_data = len(df) if df is not None else 0
@@ -507,12 +781,14 @@ class TradingAPIServer:
             current_price = df['close'].iloc[-1]
             
             # ML???????????
-            signal, confidence, predicted_price = self.ml_system.generate_signal(df, current_price)
+            with self.model_lock:
+                signal, confidence, predicted_price = self.ml_system.generate_signal(df, current_price)
             
             # ?????????
-            self.last_signal[symbol] = signal
-            self.last_confidence[symbol] = confidence
-            self.last_prediction[symbol] = predicted_price
+            if not timeframe:
+                self.last_signal[symbol] = signal
+                self.last_confidence[symbol] = confidence
+                self.last_prediction[symbol] = predicted_price
             
             # ???????
             price_change = ""
@@ -520,7 +796,7 @@ class TradingAPIServer:
                 change_pct = ((predicted_price - current_price) / current_price) * 100
                 price_change = f" ({change_pct:+.2f}%)"
             
-            logging.info(f"[{symbol}] ?? ??????: {signal}, ???: {confidence:.3f}{price_change}")
+            logging.info(f"[{symbol}{'/' + timeframe if timeframe else ''}] ?? ??????: {signal}, ???: {confidence:.3f}{price_change}")
             return signal, confidence, predicted_price, "Success"
             
         except Exception as e:
@@ -528,34 +804,77 @@ class TradingAPIServer:
             logging.error(error_msg)
             return "HOLD", 0.0, None, error_msg
     
-    def retrain_model(self, symbol):
-        """???????"""
+    def retrain_model(self, symbol, mode='full'):
+        """
+        モデルを再学習
+
+        - mode='full': バッファ全体でモデルを作り直す
+        - mode='incremental': 直近 incremental_periods 本だけで学習済みモデルを追加学習
+          （モデル未読み込みならフル再学習に切り替える）
+        学習は配信中のモデルの複製で行い、ウォームアップが上限内のときだけ入れ替えて保存する
+        （上限を超えたら配信中のモデルと保存済みのファイルはそのまま）。再学習は同時に1つだけ
+        Returns: (成功, メッセージ, 学習時間の報告)
+        """
+        with self.retrain_lock:
+            return self._retrain_model(symbol, mode)
+    
+    def _retrain_model(self, symbol, mode):
         try:
-            manager = self.get_symbol_manager(symbol)
-            df = manager.get_recent_dataframe()
-            
-            if df is None or len(df) < 500:
-                return False, f"Insufficient data for training {symbol} (minimum 500 required)"
-            
-            logging.info(f"[{symbol}] ????????...")
-            self.ml_system.train_model(df)
+            if not self.ml_ready.is_set():
+                return False, "ML system loading", None
+            if self.ml_system is None:
+                return False, "ML system not available", None
             
+            manager = self.get_symbol_manager(symbol)
+            if mode == 'incremental' and not self.model_loaded.get(symbol, False):
+                logging.info(f"[{symbol}] 学習済みモデルが無いためフル再学習に切り替えます")
+                mode = 'full'
+
+            if mode == 'incremental':
+                df = manager.get_recent_dataframe(self.incremental_periods)
+                if df is None or len(df) < 200:
+                    return False, f"Insufficient data for incremental update {symbol} (minimum 200 required)", None
+
+                logging.info(f"[{symbol}] 追加学習開始...")
+                with self.model_lock:
+                    candidate = copy.deepcopy(self.ml_system)
+                report = candidate.update_model(df)
+            else:
+                df = manager.get_recent_dataframe(len(manager.data_buffer))
+                if df is None or len(df) < 500:
+                    return False, f"Insufficient data for training {symbol} (minimum 500 required)", None
+
+                logging.info(f"[{symbol}] ????????...")
+                with self.model_lock:
+                    candidate = copy.deepcopy(self.ml_system)
+                candidate.train_model(df)
+                report = candidate.training_stats
+
+            self.training_reports[symbol] = report
+            if not self.publish_model([symbol], candidate):
+                return False, (f"Model retrained for {symbol} but not published "
+                               f"(warm-up over budget or failed, previous model kept)"), report
+
             # ?????????????
-            model_file = f"trading_model_{symbol}.pkl"
-            self.ml_system.save_model(model_file)
-            self.model_loaded[symbol] = True
-            
+            model_file = Path(current_dir) / f"trading_model_{symbol}.pkl"
+            candidate.save_model(str(model_file))
+
             # ?????????????
             manager.save_data()
-            
-            logging.info(f"[{symbol}] ????????")
-            return True, f"Model retrained successfully for {symbol}"
-            
+
+            if report and report.get('saved_seconds') is not None:
+                logging.info(f"[{symbol}] 追加学習完了: {report['seconds']}秒 "
+                             f"(フル再学習 {report['full_seconds']}秒 に対し {report['saved_seconds']}秒短縮, "
+                             f"{report['speedup']}倍)")
+            else:
+                logging.info(f"[{symbol}] ????????")
+            return True, f"Model retrained successfully for {symbol} ({mode})", report
+
         except Exception as e:
             error_msg = f"[{symbol}] ?????????: {e}"
             logging.error(error_msg)
-            return False, error_msg
-    
+            return False, error_msg, None
+
     def start_background_tasks(self):
         """??????????????"""
         def background_worker():
@@ -566,7 +885,10 @@ class TradingAPIServer:
                         buffer_size = len(manager.data_buffer)
                         if buffer_size >= 500 and buffer_size % 100 == 0:
                             logging.info(f"[{symbol}] ???????????????...")
-                            self.retrain_model(symbol)
+                            # 通常は追加学習。GB の段数が上限に達したらフル再学習
+                            report = self.training_reports.get(symbol) or {}
+                            mode = 'full' if report.get('needs_full_retrain') else 'incremental'
+                            self.retrain_model(symbol, mode)
                         
                         # ????????
                         manager.auto_backup_check()
@@ -591,9 +913,102 @@ class TradingAPIServer:
         
         return stats
 
+def _observe_signal_stage(stage, seconds):
+    METRICS.observe('trading_signal_stage_seconds', seconds, stage=stage)
+
 # ?????API??????????
 api_server = TradingAPIServer()
 
+# === メトリクス ===
+METRICS.describe('trading_http_request_duration_seconds', 'Request latency by route')
+METRICS.describe('trading_signal_stage_seconds', 'generate_trading_signal latency by stage')
+METRICS.describe('trading_ticks_total', 'Ticks received by symbol and result')
+METRICS.describe('trading_data_write_seconds', 'CSV save/archive write time')
+METRICS.describe('trading_model_load_seconds', 'Model load and warm-up time')
+METRICS.describe('trading_signal_requests_total', 'Signal requests served from the bar-close cache or computed')
+METRICS.describe('trading_signal_publish_delay_seconds', 'Bar close to precomputed signal publish delay')
+METRICS.register_gauge(
+    'trading_buffer_size',
+    lambda: {(('symbol', s),): len(m.data_buffer) for s, m in list(api_server.symbol_managers.items())},
+    'Ticks held in memory by symbol')
+METRICS.register_gauge(
+    'trading_model_loaded',
+    lambda: {(('symbol', s),): int(loaded) for s, loaded in list(api_server.model_loaded.items())},
+    'Whether a warmed-up model is serving the symbol')
+METRICS.register_gauge('trading_connection_errors', lambda: {(): api_server.connection_errors},
+                       'Consecutive failed /tick requests')
+METRICS.register_gauge('trading_log_queue_size', lambda: {(): LOG_PIPELINE.queue_size},
+                       'Log records waiting to be written')
+METRICS.register_gauge('trading_log_dropped', lambda: {(): LOG_PIPELINE.dropped},
+                       'Log records dropped because the queue was full')
+
+@app.before_request
+def _start_request_timer():
+    request.environ['trading.started'] = time.perf_counter()
+
+@app.after_request
+def _record_request_latency(response):
+    started = request.environ.get('trading.started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        METRICS.observe('trading_http_request_duration_seconds', time.perf_counter() - started,
+                        route=route, method=request.method, status=response.status_code)
+    return response
+
+# === プロファイリング（/admin は localhost か X-Admin-Token ヘッダーのみ） ===
+PROFILER = RequestProfiler(os.path.join(current_dir, "logs", "profiles"))
+ADMIN_TOKEN = os.environ.get('TRADING_ADMIN_TOKEN')
+
+def _admin_allowed():
+    if request.remote_addr in ('127.0.0.1', '::1'):
+        return True
+    return bool(ADMIN_TOKEN) and request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """
+    POST: 次の N リクエスト / T 秒間の /tick・/signal をプロファイリング
+          {"mode": "sampling"|"deterministic", "requests": 200, "seconds": 60,
+           "routes": ["tick", "signal"], "interval_ms": 5}
+    GET:  状態と直近の結果（?summary=1 で関数ごとの集計も返す）
+    """
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    if request.method == 'POST':
+        options = request.get_json(silent=True) or {}
+        try:
+            status = PROFILER.arm(
+                mode=options.get('mode', 'sampling'),
+                requests=options.get('requests'),
+                seconds=options.get('seconds'),
+                routes=tuple(options.get('routes', ('tick', 'signal'))),
+                interval_ms=float(options.get('interval_ms', 5.0))
+            )
+        except (ValueError, RuntimeError) as e:
+            return jsonify({'error': str(e)}), 409
+        logging.info(f"プロファイリング開始: {status}")
+        return jsonify(status)
+    
+    status = PROFILER.status()
+    result = status.get('last_result')
+    if request.args.get('summary') and result:
+        with open(result['summary'], encoding='utf-8') as f:
+            status['summary_text'] = f.read()
+    return jsonify(status)
+
+@app.route('/admin/profile/stop', methods=['POST'])
+def admin_profile_stop():
+    """実行中のプロファイリングを終了して結果を書き出す"""
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({'last_result': PROFILER.stop()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus 形式のメトリクス"""
+    return METRICS.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """???????"""
@@ -604,10 +1019,25 @@ def health_check():
         'timestamp': datetime.now().isoformat(),
         'active_symbols': list(api_server.symbol_managers.keys()),
         'total_data_points': total_data_points,
-        'symbols_with_models': len([s for s, loaded in api_server.model_loaded.items() if loaded])
+        'symbols_with_models': len([s for s, loaded in api_server.model_loaded.items() if loaded]),
+        'shard': {'index': SHARD_INDEX, 'count': SHARD_COUNT}
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """シグナルを返せる状態か（MLモジュールとモデルの読み込み完了）。/health は受信の生存確認"""
+    ready = api_server.startup['state'] == 'ready'
+    return jsonify({
+        'ready': ready,
+        'startup': api_server.startup,
+        'symbols_with_models': [s for s, loaded in api_server.model_loaded.items() if loaded],
+        'warmup': api_server.warmup_reports,
+        'import_profile': IMPORT_PROFILE,
+        'timestamp': datetime.now().isoformat()
+    }), 200 if ready else 503
+
 @app.route('/tick', methods=['POST'])
+@PROFILER.wrap('tick')
 def receive_tick():
     """?????????(??????)"""
     try:
@@ -621,12 +1051,15 @@ def receive_tick():
         symbol = data.get('symbol', 'UNKNOWN')
         if symbol == 'UNKNOWN':
             return jsonify({'error': 'Symbol not specified'}), 400
+        if not owns_symbol(symbol):
+            return jsonify({'error': f'{symbol} is not handled by worker {SHARD_INDEX}/{SHARD_COUNT}'}), 421
         
         # ?????????????????????
         tick_data = {k: v for k, v in data.items() if k != 'symbol'}
         
         # ?????
         success = api_server.add_tick_data(tick_data, symbol)
+        METRICS.inc('trading_ticks_total', symbol=symbol, result='stored' if success else 'rejected')
         
         if success:
             api_server.connection_errors = 0
@@ -656,36 +1089,95 @@ def receive_tick():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+def _signal_timeframe():
+    timeframe = request.args.get('timeframe')
+    if timeframe and timeframe not in BAR_TIMEFRAMES:
+        raise ValueError(f"Invalid timeframe: {timeframe} ({', '.join(BAR_TIMEFRAMES)})")
+    return timeframe
+
+def _signal_response(symbol, timeframe, entry):
+    current_price = None
+    manager = api_server.get_symbol_manager(symbol)
+    if len(manager.data_buffer) > 0:
+        current_price = manager.data_buffer[-1]['close']
+    
+    return {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'signal': entry['signal'],
+        'confidence': round(entry['confidence'], 3),
+        'predicted_price': round(entry['predicted_price'], 5) if entry['predicted_price'] else None,
+        'current_price': round(current_price, 5) if current_price else None,
+        'message': entry['message'],
+        'version': entry['version'],
+        'cached': entry.get('cached', False),
+        'bar_time': entry.get('bar_time'),
+        'computed_at': entry.get('computed_at'),
+        'timestamp': datetime.now().isoformat()
+    }
+
 @app.route('/signal/<symbol>', methods=['GET'])
+@PROFILER.wrap('signal')
 def get_signal(symbol):
-    """????????(??????)"""
+    """????????(??????)（バー確定時に計算済みの結果を返す。無ければその場で計算）"""
     try:
-        signal, confidence, predicted_price, message = api_server.generate_trading_signal(symbol)
-        
-        current_price = None
-        manager = api_server.get_symbol_manager(symbol)
-        if len(manager.data_buffer) > 0:
-            current_price = manager.data_buffer[-1]['close']
+        try:
+            timeframe = _signal_timeframe()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify({
-            'symbol': symbol,
-            'signal': signal,
-            'confidence': round(confidence, 3),
-            'predicted_price': round(predicted_price, 5) if predicted_price else None,
-            'current_price': round(current_price, 5) if current_price else None,
-            'message': message,
-            'timestamp': datetime.now().isoformat()
-        })
+        entry = api_server.signal_for(symbol, timeframe)
+        return jsonify(_signal_response(symbol, timeframe, entry))
         
     except Exception as e:
         logging.error(f"????????? [{symbol}]: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/signal/<symbol>/wait', methods=['GET'])
+def wait_signal(symbol):
+    """
+    ロングポーリング: version が since と異なるシグナルが出るまで最大 timeout 秒待つ
+    （?since=<前回の version>&timeout=30&timeframe=M5、時間切れは changed=false で現在の結果）
+    """
+    try:
+        timeframe = _signal_timeframe()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    since = request.args.get('since', 0, type=int)
+    timeout = min(max(request.args.get('timeout', 30.0, type=float), 0.0), SIGNAL_WAIT_MAX_SECONDS)
+    
+    entry = api_server.signal_board.wait(symbol, timeframe or 'tick', since, timeout)
+    if entry is None:
+        entry = api_server.signal_board.get(symbol, timeframe or 'tick')
+        if entry is None:
+            return jsonify({'symbol': symbol, 'timeframe': timeframe, 'changed': False, 'version': since,
+                            'message': 'No signal yet', 'timestamp': datetime.now().isoformat()})
+        return jsonify(dict(_signal_response(symbol, timeframe, dict(entry, cached=True)), changed=False))
+    return jsonify(dict(_signal_response(symbol, timeframe, dict(entry, cached=True)), changed=True))
+
+@app.route('/signal/<symbol>/stream', methods=['GET'])
+def stream_signal(symbol):
+    """Server-Sent Events: 新しいシグナルごとに event: signal を送る（Last-Event-ID / ?since= から再開）"""
+    try:
+        timeframe = _signal_timeframe()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
+    events = api_server.signal_board.stream(symbol, timeframe or 'tick', since)
+    return Response(events, content_type='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/retrain/<symbol>', methods=['POST'])
 def manual_retrain(symbol):
     """????????(??????)"""
     try:
-        success, message = api_server.retrain_model(symbol)
+        mode = request.args.get('mode', 'full')
+        if mode not in ('full', 'incremental'):
+            return jsonify({'error': f"Invalid mode: {mode} (full or incremental)"}), 400
+
+        success, message, report = api_server.retrain_model(symbol, mode)
         
         if success:
             manager = api_server.get_symbol_manager(symbol)
@@ -693,7 +1185,8 @@ def manual_retrain(symbol):
                 'status': 'success',
                 'symbol': symbol,
                 'message': message,
-                'data_points_used': len(manager.data_buffer)
+                'data_points_used': len(manager.data_buffer),
+                'training': report
             })
         else:
             return jsonify({
@@ -728,6 +1221,9 @@ def get_symbol_status(symbol):
         stats['model_loaded'] = api_server.model_loaded.get(symbol, False)
         stats['last_signal'] = api_server.last_signal.get(symbol, "HOLD")
         stats['last_confidence'] = round(api_server.last_confidence.get(symbol, 0.0), 3)
+        stats['training'] = api_server.training_reports.get(symbol)
+        stats['warmup'] = api_server.warmup_reports.get(symbol)
+        stats['bars'] = manager.bars.stats()
         stats['last_prediction'] = round(api_server.last_prediction.get(symbol, 0.0), 5) if api_server.last_prediction.get(symbol) else None
         
         return jsonify(stats)
@@ -768,6 +1264,45 @@ def get_latest_data(symbol):
         logging.error(f"?????????? [{symbol}]: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/bars/<symbol>', methods=['GET'])
+def get_bars(symbol):
+    """
+    時間足のバー（?timeframe=M5&count=200&include_forming=1）
+
+    features=1 で最新バーの特徴量（MLモジュール読み込み後のみ）も返す
+    """
+    try:
+        timeframe = request.args.get('timeframe', 'M1')
+        if timeframe not in BAR_TIMEFRAMES:
+            return jsonify({'error': f"Invalid timeframe: {timeframe} ({', '.join(BAR_TIMEFRAMES)})"}), 400
+        count = min(request.args.get('count', 200, type=int), BAR_HISTORY)
+        include_forming = request.args.get('include_forming', '1') != '0'
+        
+        manager = api_server.get_symbol_manager(symbol)
+        df = manager.bars.bars(timeframe, count, include_forming)
+        
+        result = {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'count': len(df),
+            'forming_bar': manager.bars.forming_bar_start(timeframe).isoformat() if include_forming and len(df) else None,
+        }
+        
+        if request.args.get('features') == '1':
+            if not api_server.ml_ready.is_set() or api_server.ml_system is None:
+                return jsonify({'error': 'ML system not ready'}), 503
+            with api_server.model_lock:
+                features = api_server.ml_system.prepare_data(df)
+            result['features'] = {k: float(v) for k, v in features.iloc[-1].items()} if len(features) else None
+        
+        df['datetime'] = df['datetime'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        result['bars'] = df.to_dict('records')
+        return jsonify(result)
+        
+    except Exception as e:
+        logging.error(f"バーの取得に失敗 [{symbol}]: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/backup/<symbol>', methods=['POST'])
 def manual_backup(symbol):
     """???????????(??????)"""
@@ -818,8 +1353,12 @@ if __name__ == '__main__':
     print("=" * 80)
     
     # ML????????
-    if ML_SYSTEM_AVAILABLE:
-        print("? ML Trading System: ????")
+    if ML_SYSTEM_AVAILABLE is None:
+        # 高速起動: 読み込みはバックグラウンドで継続中（完了は GET /ready で確認）
+        print("? ML Trading System: バックグラウンドで読み込み中 (GET /ready で完了を確認)")
+    if ML_SYSTEM_AVAILABLE is not False:
+        if ML_SYSTEM_AVAILABLE:
+            print("? ML Trading System: ????")
         
         # ??????????
         generic_model = Path(current_dir) / "trading_model.pkl"
@@ -846,12 +1385,19 @@ if __name__ == '__main__':
     print("")
     print("?? ?????API???????:")
     print("  GET  /health                    - ???????")
+    print("  GET  /ready                     - MLモジュール・モデルの読み込み状態")
+    print("  GET  /metrics                   - Prometheus 形式のメトリクス")
+    print("  POST /admin/profile             - /tick・/signal のプロファイリング開始 (localhost)")
     print("  POST /tick                      - ????????? (symbol??)")
     print("  GET  /signal/<symbol>           - ????????")
+    print("  GET  /signal/<symbol>?timeframe=H1 - 時間足のバーで予測")
+    print("  GET  /signal/<symbol>/wait?since=N - 新しいシグナルまで待つ (ロングポーリング)")
+    print("  GET  /signal/<symbol>/stream    - シグナルの配信 (Server-Sent Events)")
     print("  POST /retrain/<symbol>          - ??????")
     print("  GET  /status                    - ???????")
     print("  GET  /status/<symbol>           - ???????")
     print("  GET  /data/<symbol>/latest      - ???????")
+    print("  GET  /bars/<symbol>?timeframe=M5 - 時間足のバー (M1/M5/M15/H1/D1)")
     print("  POST /backup/<symbol>           - ????????")
     print("  POST /backup/all                - ???????????")
     print("")
@@ -865,13 +1411,16 @@ if __name__ == '__main__':
     print('    "volume": 100')
     print('  }')
     print("")
-    print("?? ??????: http://localhost:5000")
+    print(f"?? ??????: http://localhost:{os.environ.get('TRADING_API_PORT', '5000')}")
     print("=" * 80)
     
     # ??????
     logging.info("Flask Trading API Server ???????")
     if ML_SYSTEM_AVAILABLE:
         logging.info("ML Trading System ready for predictions")
+    logging.info(f"起動から {time.perf_counter() - _process_started:.2f}秒 でリクエスト受付開始 "
+                 f"(mode: {api_server.startup['mode']})")
     
     # Flask ??????
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
\ No newline at end of file
+    app.run(host=os.environ.get('TRADING_API_HOST', '0.0.0.0'), port=int(os.environ.get('TRADING_API_PORT', '5000')),
+            debug=False, threaded=True)
\ No newline at end of file
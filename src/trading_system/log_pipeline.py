@@ -0,0 +1,178 @@
+"""
+ティック受信の処理を止めないログ出力
+
+- ルートロガーには QueueHandler だけを付け、ファイル（サイズでローテーション）とコンソールへの
+  書き込みは QueueListener のスレッドで行う。キューが満杯なら待たずに捨てて件数を数える
+- extra={'rate_key': キー} 付きのログはキーごとに interval 秒あたり burst 件までに間引き、
+  省略した件数は次に出力する行に付ける
+- ティックごとのログの代わりに TickLogSummary がシンボルごとの件数を一定間隔で1行にまとめる
+"""
+import atexit
+import logging
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class RateLimitFilter(logging.Filter):
+    """rate_key 付きのレコードをキーごとに interval 秒あたり burst 件までに間引く"""
+
+    def __init__(self, interval=60.0, burst=1):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._windows = {}  # キー -> [窓の開始時刻, 出力件数, 省略件数]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, 'rate_key', None)
+        if key is None:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+
+        if suppressed:
+            record.msg = f"{record.msg} (+{suppressed} similar messages suppressed)"
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """キューが満杯なら呼び出し側を待たせずに捨てる"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    def __init__(self, handler, listener, rate_filter):
+        self.handler = handler
+        self.listener = listener
+        self.rate_filter = rate_filter
+
+    @property
+    def dropped(self):
+        return self.handler.dropped
+
+    @property
+    def queue_size(self):
+        return self.handler.queue.qsize()
+
+    def stop(self):
+        """キューに残ったログを書き出してから停止"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+def setup_logging(log_file, level=logging.DEBUG, max_bytes=20 * 1024 * 1024, backup_count=10,
+                  console=True, queue_size=10000, rate_interval=60.0, rate_burst=1):
+    """
+    ルートロガーを非同期の出力に切り替えて LogPipeline を返す（終了時に自動で stop）
+
+    Parameters:
+    - log_file: 出力ファイル（max_bytes を超えたら .1, .2, ... にローテーション）
+    - queue_size: 書き込み待ちの上限件数（超えた分は捨てる）
+    - rate_interval / rate_burst: rate_key 付きログの間引き
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    targets = [RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')]
+    if console:
+        targets.append(logging.StreamHandler(sys.stderr))
+    for target in targets:
+        target.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    rate_filter = RateLimitFilter(rate_interval, rate_burst)
+    handler.addFilter(rate_filter)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *targets, respect_handler_level=True)
+    listener.start()
+    pipeline = LogPipeline(handler, listener, rate_filter)
+    atexit.register(pipeline.stop)
+    return pipeline
+
+
+class TickLogSummary:
+    """
+    ティックごとのログの代わりに、シンボルごとの件数を interval 秒ごとに1行で出力
+
+    例: "EURUSD: 1,240 ticks in last 60s (duplicates skipped 12, market closed 0), last close 1.10523"
+    """
+
+    def __init__(self, interval=60.0, pipeline=None, logger=None):
+        self.interval = interval
+        self.pipeline = pipeline
+        self.logger = logger or logging.getLogger(__name__)
+        self._counts = {}
+        self._last_close = {}
+        self._lock = threading.Lock()
+        self._reported_drops = 0
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, name='tick-log-summary', daemon=True).start()
+        atexit.register(self.stop)  # setup_logging より後に登録するので、ログの停止前に最後の集計を出す
+
+    def record(self, symbol, kind, close=None):
+        """kind: 'stored'（市場時間内に保存）/ 'closed'（市場時間外に保存）/ 'duplicate'（重複で破棄）"""
+        with self._lock:
+            counts = self._counts.get(symbol)
+            if counts is None:
+                counts = self._counts[symbol] = Counter()
+            counts[kind] += 1
+            if close is not None:
+                self._last_close[symbol] = close
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            last_close = dict(self._last_close)
+
+        for symbol, c in sorted(counts.items()):
+            received = c['stored'] + c['closed']
+            line = (f"{symbol}: {received:,} ticks in last {self.interval:g}s "
+                    f"(duplicates skipped {c['duplicate']:,}, market closed {c['closed']:,})")
+            if symbol in last_close:
+                line += f", last close {last_close[symbol]}"
+            self.logger.info(line)
+
+        if self.pipeline is not None and self.pipeline.dropped > self._reported_drops:
+            dropped = self.pipeline.dropped - self._reported_drops
+            self._reported_drops = self.pipeline.dropped
+            self.logger.warning(f"Log queue full: {dropped:,} log records dropped in last {self.interval:g}s")
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
@@ -1,7 +1,10 @@
 # NSSM Direct Conda Environment Setup (No Batch Files)
 
 param(
-    [string]$Environment = "production"
+    [string]$Environment = "production",
+    # Time zone of the MT5 server time the EA sends as tick datetime (e.g. "Etc/GMT-3" for a fixed UTC+3 broker).
+    # Sets TRADING_TICK_TIMEZONE so market hours are judged from tick times; leave empty to use the current time
+    [string]$TickTimezone = ""
 )
 
 $NSSM_PATH = "C:\Program Files\nssm\win64\nssm.exe"
@@ -130,8 +133,12 @@ $envVariables = @(
     "CONDA_PYTHON_EXE=$CONDA_BASE\python.exe",
     "CONDA_EXE=$CONDA_BASE\Scripts\conda.exe",
     "PYTHONUNBUFFERED=1",
+    "TRADING_API_FAST_START=1",
     "FLASK_ENV=production"
 )
+if ($TickTimezone) {
+    $envVariables += "TRADING_TICK_TIMEZONE=$TickTimezone"
+}
 
 $envString = $envVariables -join "`r`n"
 & $NSSM_PATH set $SERVICE_NAME AppEnvironmentExtra $envString
@@ -185,6 +192,15 @@ if ($finalStatus -eq "SERVICE_RUNNING") {
                 Write-Host "   Status: $($healthData.status)" -ForegroundColor Gray
                 Write-Host "   Symbols: $($healthData.active_symbols -join ', ')" -ForegroundColor Gray
                 Write-Host "   Models: $($healthData.symbols_with_models)" -ForegroundColor Gray
+                # ML modules and models load in the background; /ready returns 503 until done
+                try {
+                    $readyCheck = Invoke-WebRequest -Uri "http://localhost:5000/ready" -TimeoutSec 10
+                    $readyData = $readyCheck.Content | ConvertFrom-Json
+                    Write-Host "   Ready: $($readyData.ready) ($($readyData.startup.ready_seconds)s)" -ForegroundColor Gray
+                }
+                catch {
+                    Write-Host "   Ready: still loading ML modules/models (check /ready later)" -ForegroundColor Gray
+                }
                 break
             }
         }
@@ -222,11 +238,13 @@ Write-Host "Script: $SCRIPT_PATH" -ForegroundColor Gray
 Write-Host "Environment: mt5env (direct)" -ForegroundColor Gray
 Write-Host "Method: Direct Python execution with full environment" -ForegroundColor Gray
 Write-Host "Logs: $logDir" -ForegroundColor Gray
+Write-Host "Tick timezone: $(if($TickTimezone){$TickTimezone}else{'(unset: market hours by current time)'})" -ForegroundColor Gray
 
 # Manual verification commands
 Write-Host "`nManual verification commands:" -ForegroundColor Yellow
 Write-Host "Service status: & '$NSSM_PATH' status $SERVICE_NAME" -ForegroundColor White
 Write-Host "API health: curl http://localhost:5000/health" -ForegroundColor White
+Write-Host "Model readiness: curl http://localhost:5000/ready" -ForegroundColor White
 Write-Host "View logs: Get-Content '$logDir\flask_stderr.log' -Tail 20" -ForegroundColor White
 
 Write-Host "`n=== Direct Conda Setup Complete ===" -ForegroundColor Green
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Prometheus 形式のメトリクス（ヒストグラム・カウンター・ゲージ）
+
+- 記録はスレッドごとの領域に書くだけ（ロックなし）。各領域に書き込むのはそのスレッドだけで、
+  /metrics の出力時に全スレッド分を合計する
+- Flask の threaded=True はリクエストごとにスレッドを作るので、終了したスレッドの領域は
+  合計済みの領域へ移して捨てる
+- ゲージは出力時に呼ばれる関数で値を返す（記録側のコストなし）
+"""
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# 秒単位のバケット境界（Prometheus クライアントの既定より細かい 0.5ms から）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Shard:
+    """1スレッド分の記録領域"""
+
+    def __init__(self):
+        self.histograms = {}  # (name, labels) -> [バケットごとの件数..., +Inf の件数]
+        self.sums = {}        # (name, labels) -> 合計秒
+        self.counters = {}    # (name, labels) -> 値
+
+    def merge_into(self, histograms, sums, counters):
+        # 他スレッドが書き込み中でも壊れないよう、dict はコピーしてから読む
+        for key, counts in list(self.histograms.items()):
+            merged = histograms.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(list(counts)):
+                merged[i] += count
+            sums[key] = sums.get(key, 0.0) + self.sums.get(key, 0.0)
+        for key, value in list(self.counters.items()):
+            counters[key] = counters.get(key, 0) + value
+
+
+class _ThreadToken:
+    """スレッド終了時にスレッドローカルと一緒に解放される目印"""
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard()  # 終了したスレッドの記録の合計
+        self._shards_lock = threading.Lock()  # スレッドの初回記録時・終了時と出力時だけ使う
+        self._gauges = {}
+        self._help = {}
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            token = self._local.token = _ThreadToken()
+            weakref.finalize(token, self._retire, shard)
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            self._shards.remove(shard)
+            retired = self._retired
+            shard.merge_into(retired.histograms, retired.sums, retired.counters)
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    # === 記録 ===
+    def observe(self, name, seconds, **labels):
+        """ヒストグラムに1件記録"""
+        shard = self._shard()
+        key = (name, tuple(labels.items()))
+        counts = shard.histograms.get(key)
+        if counts is None:
+            counts = shard.histograms[key] = [0] * (len(self.buckets) + 1)
+            shard.sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        shard.sums[key] += seconds
+
+    def inc(self, name, value=1, **labels):
+        """カウンターを加算"""
+        counters = self._shard().counters
+        key = (name, tuple(labels.items()))
+        counters[key] = counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_gauge(self, name, collect, help_text=None):
+        """
+        ゲージを登録（collect() は {ラベルのタプル: 値} を返す。ラベルが無ければ {(): 値}）
+        """
+        self._gauges[name] = collect
+        if help_text:
+            self._help[name] = help_text
+
+    # === 出力 ===
+    def _merged(self):
+        histograms, sums, counters = {}, {}, {}
+        with self._shards_lock:
+            self._retired.merge_into(histograms, sums, counters)
+            for shard in self._shards:
+                shard.merge_into(histograms, sums, counters)
+        return histograms, sums, counters
+
+    def render(self):
+        """Prometheus のテキスト形式"""
+        histograms, sums, counters = self._merged()
+        lines = []
+
+        def header(name, kind):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name in sorted({key[0] for key in counters}):
+            header(name, 'counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name in sorted({key[0] for key in histograms}):
+            header(name, 'histogram')
+            for (metric, labels), counts in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {sums[(metric, labels)]:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        for name, collect in sorted(self._gauges.items()):
+            try:
+                values = collect()
+            except Exception:
+                continue
+            header(name, 'gauge')
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(labels)} {float(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# プロセス全体で共有するメトリクス
+METRICS = Metrics()
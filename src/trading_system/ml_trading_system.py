@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 import joblib
+import time
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
@@ -28,12 +29,39 @@ EarlyStopping = keras.callbacks.EarlyStopping
 # Technical Analysis
 import talib
 
+from feature_plan import get_plan, LEGACY_COLUMNS, MODEL_COLUMNS
+
+# 予測の各段階の所要時間を受け取る関数 observer(stage, seconds)。None なら通知しない
+STAGE_OBSERVER = None
+
+
+def set_stage_observer(observer):
+    global STAGE_OBSERVER
+    STAGE_OBSERVER = observer
+
+
+def _stage_done(stage, started):
+    """段階の所要時間を STAGE_OBSERVER に通知し、次の段階の開始時刻を返す"""
+    now = time.perf_counter()
+    if STAGE_OBSERVER is not None:
+        STAGE_OBSERVER(stage, now - started)
+    return now
+
 class TechnicalIndicators:
-    """テクニカル指標計算クラス"""
+    """
+    テクニカル指標計算クラス
+
+    calculate_indicators は feature_plan の一致確認（feature_plan.py の __main__）用の参照実装。
+    prepare_data・推論は feature_plan を使うので、予測の経路では使わないこと
+    （calculate_window_indicators は replay_signals が使う）
+    """
+    
+    # 計算開始位置によって値が変わる（再帰的に平滑化する）指標
+    RECURSIVE_COLUMNS = ['ema_12', 'ema_26', 'macd', 'macd_signal', 'macd_hist', 'rsi', 'atr', 'adx']
     
     @staticmethod
     def calculate_indicators(df):
-        """各種テクニカル指標を計算"""
+        """各種テクニカル指標を計算（参照実装。feature_plan と同じ値になることの確認用）"""
         high = df['high'].values
         low = df['low'].values
         close = df['close'].values
@@ -79,9 +107,42 @@ class TechnicalIndicators:
         indicators['volume_sma'] = talib.SMA(volume.astype(float), timeperiod=20)
         
         return indicators
+    
+    @staticmethod
+    def calculate_window_indicators(df, window, rows):
+        """
+        再帰型の指標（RECURSIVE_COLUMNS）を、各バー t の直近 window 本だけで計算した値
+        （オンラインで直近 window 本を calculate_indicators に渡したときの最終行と同じ値）
+        
+        Returns:
+        - (len(df), len(RECURSIVE_COLUMNS)) の配列。rows 以外のバーは NaN
+        """
+        high = df['high'].values
+        low = df['low'].values
+        close = df['close'].values
+        
+        values = np.full((len(df), len(TechnicalIndicators.RECURSIVE_COLUMNS)), np.nan)
+        for t in rows:
+            start = max(0, t - window + 1)
+            h, l, c = high[start:t + 1], low[start:t + 1], close[start:t + 1]
+            macd, macd_signal, macd_hist = talib.MACD(c)
+            values[t] = (
+                talib.EMA(c, timeperiod=12)[-1],
+                talib.EMA(c, timeperiod=26)[-1],
+                macd[-1], macd_signal[-1], macd_hist[-1],
+                talib.RSI(c, timeperiod=14)[-1],
+                talib.ATR(h, l, c, timeperiod=14)[-1],
+                talib.ADX(h, l, c, timeperiod=14)[-1],
+            )
+        return values
 
 class FeatureEngineering:
-    """特徴量エンジニアリングクラス"""
+    """
+    特徴量エンジニアリングクラス
+
+    feature_plan の一致確認（feature_plan.py の __main__）用の参照実装。
+    prepare_data・推論は feature_plan を使うので、予測の経路では使わないこと
+    """
     
     @staticmethod
     def create_price_features(df):
@@ -163,7 +224,7 @@ class LSTMModel:
         
         return np.array(sequences), np.array(targets)
     
-    def train(self, X_train, y_train, X_val=None, y_val=None, epochs=100, batch_size=32):
+    def train(self, X_train, y_train, X_val=None, y_val=None, epochs=100, batch_size=32, verbose=1):
         """モデルを訓練"""
         self.model = self.build_model()
         
@@ -179,40 +240,101 @@ class LSTMModel:
             epochs=epochs,
             batch_size=batch_size,
             callbacks=callbacks,
-            verbose=1
+            verbose=verbose
         )
         
         return history
-    
+
+    def update(self, X_train, y_train, X_val=None, y_val=None, epochs=5, batch_size=32, verbose=0):
+        """現在の重みから学習を続ける（モデルは作り直さない）"""
+        if self.model is None:
+            raise ValueError("Model not trained yet")
+
+        callbacks = []
+        validation_data = None
+        if X_val is not None and len(X_val) > 0:
+            validation_data = (X_val, y_val)
+            callbacks.append(EarlyStopping(monitor='val_loss', patience=2, restore_best_weights=True))
+
+        return self.model.fit(
+            X_train, y_train,
+            validation_data=validation_data,
+            epochs=epochs,
+            batch_size=batch_size,
+            callbacks=callbacks,
+            verbose=verbose
+        )
+
     def predict(self, X):
         """予測を実行"""
         if self.model is None:
             raise ValueError("Model not trained yet")
         return self.model.predict(X)
 
+class SlidingForest:
+    """
+    追加学習用のランダムフォレスト（直近のデータで育てた木を足し、上限を超えたら古い木から捨てる）
+
+    scikit-learn の estimators_ は書き換えず、各回に学習した RandomForestRegressor の木を自前のリストで持つ。
+    予測は全ての木の平均（RandomForestRegressor.predict と同じ）
+    """
+
+    def __init__(self, forest):
+        self.params = forest.get_params()
+        self.trees = list(forest.estimators_)
+        self.additions = 0
+
+    def add(self, X, y, n_trees, max_trees):
+        """新しいデータで n_trees 本を学習して追加し、max_trees を超えた分は古い木から捨てる"""
+        self.additions += 1
+        seed = self.params.get('random_state')
+        params = dict(self.params, n_estimators=n_trees, warm_start=False,
+                      random_state=seed + self.additions if isinstance(seed, int) else seed)
+        forest = RandomForestRegressor(**params).fit(X, y)
+        self.trees.extend(forest.estimators_)
+        del self.trees[:max(0, len(self.trees) - max_trees)]
+        return self
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        return np.mean([tree.predict(X, check_input=False) for tree in self.trees], axis=0)
+
+
 class EnsembleModel:
     """アンサンブル予測モデルクラス"""
     
-    def __init__(self):
+    def __init__(self, rf_params=None, gb_params=None):
         self.lstm_model = None
-        self.rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.gb_model = GradientBoostingRegressor(n_estimators=100, random_state=42)
+        # フル学習のたびにこの設定で作り直す（追加学習で増やした木・段は引き継がない）
+        self.rf_params = {'n_estimators': 100, 'random_state': 42, **(rf_params or {})}
+        self.gb_params = {'n_estimators': 100, 'random_state': 42, **(gb_params or {})}
+        self.rf_model = RandomForestRegressor(**self.rf_params)
+        self.gb_model = GradientBoostingRegressor(**self.gb_params)
         self.meta_model = None
         self.feature_scaler = StandardScaler()
         
-    def train(self, X_lstm, y_lstm, X_traditional, y_traditional):
-        """アンサンブルモデルを訓練"""
+    def train(self, X_lstm, y_lstm, X_traditional, y_traditional, shuffle=True,
+              epochs=100, batch_size=32, verbose=1):
+        """
+        アンサンブルモデルを訓練
+        
+        shuffle=False では検証用データをランダムではなく末尾20%（時系列順）から取る
+        """
         # LSTMモデルの訓練
         self.lstm_model = LSTMModel(sequence_length=60, n_features=X_lstm.shape[2])
         X_train_lstm, X_val_lstm, y_train_lstm, y_val_lstm = train_test_split(
-            X_lstm, y_lstm, test_size=0.2, random_state=42
+            X_lstm, y_lstm, test_size=0.2, random_state=42, shuffle=shuffle
         )
-        self.lstm_model.train(X_train_lstm, y_train_lstm, X_val_lstm, y_val_lstm)
+        self.lstm_model.train(X_train_lstm, y_train_lstm, X_val_lstm, y_val_lstm,
+                              epochs=epochs, batch_size=batch_size, verbose=verbose)
         
-        # 従来のMLモデルの訓練
+        # 従来のMLモデルの訓練（追加学習で束ねた森・warm_start で足した段は捨てて元の設定で作り直す）
+        rf_params, gb_params = self._base_params()
+        self.rf_model = RandomForestRegressor(**rf_params)
+        self.gb_model = GradientBoostingRegressor(**gb_params)
         X_scaled = self.feature_scaler.fit_transform(X_traditional)
         X_train_trad, X_val_trad, y_train_trad, y_val_trad = train_test_split(
-            X_scaled, y_traditional, test_size=0.2, random_state=42
+            X_scaled, y_traditional, test_size=0.2, random_state=42, shuffle=shuffle
         )
         
         self.rf_model.fit(X_train_trad, y_train_trad)
@@ -226,13 +348,73 @@ class EnsembleModel:
         meta_features = np.column_stack([lstm_pred.flatten(), rf_pred, gb_pred])
         self.meta_model = RandomForestRegressor(n_estimators=50, random_state=42)
         self.meta_model.fit(meta_features, y_val_trad)
-        
+
+    def _base_params(self):
+        """フル学習の RF/GB の設定（設定を持たない古い保存モデルは現在のモデルから取り、warm_start は外す）"""
+        if hasattr(self, 'rf_params'):
+            return self.rf_params, self.gb_params
+        rf = self.rf_model.params if isinstance(self.rf_model, SlidingForest) else self.rf_model.get_params()
+        return dict(rf, warm_start=False), dict(self.gb_model.get_params(), warm_start=False)
+
+    def update(self, X_lstm, y_lstm, X_traditional, y_traditional, epochs=5, batch_size=32,
+               rf_trees=20, gb_trees=20, max_rf_trees=300, max_gb_trees=300, verbose=0):
+        """
+        学習済みのアンサンブルを新しいデータだけで追加学習
+
+        - LSTM: 現在の重みから epochs 回だけ学習を続ける
+        - RF: 新しいデータで rf_trees 本を追加し、max_rf_trees を超えた分は古い木から捨てる
+        - GB: 新しいデータの残差に gb_trees 段を追加（warm_start）。max_gb_trees に達したら追加しない
+        - 特徴量のスケーラーは前回のフル学習のものを使い続ける（既存の木と入力の尺度を揃えるため）
+        - メタモデルは新しいデータの末尾20%で作り直す（入力は3列なので軽い）
+
+        Returns: GB が上限に達して追加できなかったら True（フル再学習の目安）
+        """
+        if self.lstm_model is None or self.meta_model is None:
+            raise ValueError("Model not trained yet")
+
+        # 検証用は時系列順の末尾20%
+        split = int(len(X_lstm) * 0.8)
+        self.lstm_model.update(X_lstm[:split], y_lstm[:split], X_lstm[split:], y_lstm[split:],
+                               epochs=epochs, batch_size=batch_size, verbose=verbose)
+
+        X_scaled = self.feature_scaler.transform(X_traditional)
+        X_train_trad, X_val_trad = X_scaled[:split], X_scaled[split:]
+        y_train_trad, y_val_trad = y_traditional[:split], y_traditional[split:]
+
+        # RF: 木を追加して古い木を捨てる（直近のデータに寄せたスライディングな森）
+        if not isinstance(self.rf_model, SlidingForest):
+            self.rf_model = SlidingForest(self.rf_model)
+        self.rf_model.add(X_train_trad, y_train_trad, rf_trees, max_rf_trees)
+
+        # GB: 段は順に足し合わせるので古い段は捨てられない。上限に達したら追加しない
+        stages = self.gb_model.n_estimators_
+        gb_full = stages + gb_trees > max_gb_trees
+        if not gb_full:
+            self.gb_model.set_params(warm_start=True, n_estimators=stages + gb_trees)
+            self.gb_model.fit(X_train_trad, y_train_trad)
+
+        lstm_pred = self.lstm_model.predict(X_lstm[split:])
+        meta_features = np.column_stack([
+            lstm_pred.flatten(),
+            self.rf_model.predict(X_val_trad),
+            self.gb_model.predict(X_val_trad)
+        ])
+        self.meta_model = RandomForestRegressor(n_estimators=50, random_state=42)
+        self.meta_model.fit(meta_features, y_val_trad)
+
+        return gb_full
+
     def predict(self, X_lstm, X_traditional):
         """アンサンブル予測を実行"""
+        started = time.perf_counter()
         lstm_pred = self.lstm_model.predict(X_lstm)
+        started = _stage_done('lstm', started)
         X_scaled = self.feature_scaler.transform(X_traditional)
+        started = _stage_done('scale', started)
         rf_pred = self.rf_model.predict(X_scaled)
+        started = _stage_done('rf', started)
         gb_pred = self.gb_model.predict(X_scaled)
+        started = _stage_done('gb', started)
         
         meta_features = np.column_stack([
             lstm_pred.flatten()[:len(rf_pred)], 
@@ -241,6 +423,7 @@ class EnsembleModel:
         ])
         
         ensemble_pred = self.meta_model.predict(meta_features)
+        _stage_done('meta', started)
         return ensemble_pred
 
 class MLTradingSystem:
@@ -248,58 +431,74 @@ class MLTradingSystem:
     
     def __init__(self):
         self.ensemble_model = EnsembleModel()
-        self.tech_indicators = TechnicalIndicators()
-        self.feature_engineering = FeatureEngineering()
+        self.tech_indicators = TechnicalIndicators()  # replay_signals の区間ごとの再帰型指標
         self.last_prediction = None
         self.last_confidence = 0.0
+        # モデル入力の列（学習時に記録。重複列を含む従来の列で学習したモデルは LEGACY_COLUMNS）
+        self.feature_columns = MODEL_COLUMNS
+        self.last_full_train_seconds = None
+        self.last_full_train_rows = None
+        self.training_stats = None
         
     def prepare_data(self, df):
-        """データ前処理とFeatue Engineering"""
-        # テクニカル指標計算
-        tech_features = self.tech_indicators.calculate_indicators(df)
-        
-        # 価格特徴量
-        price_features = self.feature_engineering.create_price_features(df)
-        
-        # ラグ特徴量
-        lag_features = self.feature_engineering.create_lag_features(df)
-        
-        # 移動平均特徴量
-        rolling_features = self.feature_engineering.create_rolling_features(df)
-        
-        # 全特徴量を結合
-        all_features = pd.concat([
-            df[['open', 'high', 'low', 'close', 'volume']],
-            tech_features,
-            price_features,
-            lag_features,
-            rolling_features
-        ], axis=1)
+        """データ前処理とFeatue Engineering（feature_columns の列、NaN を含む行は除去）"""
+        matrix = self._feature_plan().execute(df)
         
         # NaN値を除去
-        all_features = all_features.dropna()
-        
-        return all_features
+        valid = ~np.isnan(matrix).any(axis=1)
+        return pd.DataFrame(matrix[valid], columns=self.feature_columns, index=df.index[valid])
+    
+    def _feature_plan(self):
+        return get_plan(self.feature_columns)
     
     def train_model(self, df):
         """モデル全体を訓練"""
         print("データ前処理中...")
         features = self.prepare_data(df)
-        
+        self.train_from_features(features)
+    
+    def train_from_features(self, features, shuffle=True, epochs=100, batch_size=32, verbose=1):
+        """prepare_data 済みの特徴量でモデル全体を訓練"""
         if len(features) < 100:
             raise ValueError("十分なデータがありません（最低100行必要）")
         
+        started = time.perf_counter()
+        print("LSTM用データ準備中...")
+        X_lstm, y_lstm, traditional_features, traditional_target, lstm_scaler = \
+            self._training_arrays(features)
+        
+        print("モデル訓練中...")
+        self.ensemble_model.train(X_lstm, y_lstm, traditional_features, traditional_target,
+                                  shuffle=shuffle, epochs=epochs, batch_size=batch_size, verbose=verbose)
+        
+        # スケーラーと入力の列を保存
+        self.lstm_scaler = lstm_scaler
+        self.feature_columns = list(features.columns)
+        
+        elapsed = time.perf_counter() - started
+        self.last_full_train_seconds = elapsed
+        self.last_full_train_rows = len(features)
+        self.training_stats = self._training_report('full', elapsed, len(features))
+        print("モデル訓練完了！")
+    
+    def _training_arrays(self, features, lstm_scaler=None, sequence_length=60):
+        """
+        学習用の配列を作成（LSTM用シーケンスと従来ML用の行列、ターゲットは次の終値）
+        
+        lstm_scaler を渡すとそれで変換だけ行う（追加学習で前回の尺度を保つため）
+        """
         # ターゲット変数（次の終値）
         target = features['close'].shift(-1).dropna()
         features = features[:-1]  # 最後の行を削除
         
-        print("LSTM用データ準備中...")
         # LSTM用データ準備
         lstm_features = features[['close', 'volume']].values
-        lstm_scaler = MinMaxScaler()
-        lstm_scaled = lstm_scaler.fit_transform(lstm_features)
+        if lstm_scaler is None:
+            lstm_scaler = MinMaxScaler()
+            lstm_scaled = lstm_scaler.fit_transform(lstm_features)
+        else:
+            lstm_scaled = lstm_scaler.transform(lstm_features)
         
-        sequence_length = 60
         X_lstm, y_lstm = [], []
         for i in range(sequence_length, len(lstm_scaled)):
             X_lstm.append(lstm_scaled[i-sequence_length:i])
@@ -312,18 +511,56 @@ class MLTradingSystem:
         traditional_features = features.iloc[sequence_length:].values
         traditional_target = target.iloc[sequence_length:].values
         
-        print("モデル訓練中...")
-        self.ensemble_model.train(X_lstm, y_lstm, traditional_features, traditional_target)
+        return X_lstm, y_lstm, traditional_features, traditional_target, lstm_scaler
+    
+    def update_model(self, df, epochs=5, batch_size=32, rf_trees=20, gb_trees=20,
+                     max_rf_trees=300, max_gb_trees=300, verbose=0):
+        """
+        最新のバーだけで学習済みモデルを追加学習（フル再学習の代わり）
+        
+        df には前回の学習以降のバーと、指標・シーケンスの計算に必要な直前のバーを含める
+        Returns: 学習時間の報告（_training_report）
+        """
+        started = time.perf_counter()
+        features = self.prepare_data(df)
+        if len(features) < 100:
+            raise ValueError("十分なデータがありません（最低100行必要）")
         
-        # スケーラーを保存
-        self.lstm_scaler = lstm_scaler
+        X_lstm, y_lstm, traditional_features, traditional_target, _ = \
+            self._training_arrays(features, self.lstm_scaler)
+        needs_full_retrain = self.ensemble_model.update(
+            X_lstm, y_lstm, traditional_features, traditional_target,
+            epochs=epochs, batch_size=batch_size, rf_trees=rf_trees, gb_trees=gb_trees,
+            max_rf_trees=max_rf_trees, max_gb_trees=max_gb_trees, verbose=verbose
+        )
         
-        print("モデル訓練完了！")
+        self.training_stats = self._training_report('incremental', time.perf_counter() - started, len(features))
+        self.training_stats['needs_full_retrain'] = needs_full_retrain
+        return self.training_stats
+    
+    def _training_report(self, mode, seconds, rows):
+        """学習時間と、直近のフル再学習に対する短縮時間"""
+        full_seconds = getattr(self, 'last_full_train_seconds', None)
+        report = {
+            'mode': mode,
+            'seconds': round(seconds, 2),
+            'rows': rows,
+            'full_seconds': round(full_seconds, 2) if full_seconds else None,
+            'saved_seconds': None,
+            'speedup': None,
+            'finished_at': datetime.now().isoformat(),
+        }
+        if mode == 'incremental' and full_seconds:
+            report['saved_seconds'] = round(full_seconds - seconds, 2)
+            report['speedup'] = round(full_seconds / seconds, 1) if seconds > 0 else None
+        return report
     
     def predict_next_price(self, recent_data):
         """次の価格を予測"""
         try:
+            started = time.perf_counter()
             features = self.prepare_data(recent_data)
+            _stage_done('prepare_data', started)
             
             if len(features) < 60:
                 return None, 0.0
@@ -353,6 +590,55 @@ class MLTradingSystem:
             print(f"予測エラー: {e}")
             return None, 0.0
     
+    def warm_up(self, recent_data=None, runs=50):
+        """
+        予測を繰り返し実行して初回のグラフトレース・初期化のコストを先に払い、遅延を計測
+
+        recent_data（100行以上）が無ければ lstm_scaler の学習範囲から合成したバーを使う
+        Returns: {'cold_ms', 'warm_p50_ms', 'warm_p99_ms', 'runs', 'data'}
+        """
+        if recent_data is not None and len(recent_data) >= 100:
+            data, source = recent_data, 'recent'
+        else:
+            data, source = self._synthetic_bars(), 'synthetic'
+
+        # ウォームアップの予測は直近の予測値・信頼度として残さない
+        saved = (self.last_prediction, self.last_confidence)
+        latencies = []
+        try:
+            for _ in range(runs + 1):
+                started = time.perf_counter()
+                predicted, _ = self.predict_next_price(data)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if predicted is None:
+                    raise ValueError("ウォームアップの予測に失敗しました")
+        finally:
+            self.last_prediction, self.last_confidence = saved
+
+        warm = np.array(latencies[1:])
+        return {
+            'cold_ms': round(latencies[0], 2),
+            'warm_p50_ms': round(float(np.percentile(warm, 50)), 2),
+            'warm_p99_ms': round(float(np.percentile(warm, 99)), 2),
+            'runs': runs,
+            'data': source
+        }
+
+    def _synthetic_bars(self, n=200, seed=0):
+        """lstm_scaler の学習範囲内のランダムウォーク（ウォームアップ用）"""
+        rng = np.random.default_rng(seed)
+        (close_min, volume_min), (close_max, volume_max) = self.lstm_scaler.data_min_, self.lstm_scaler.data_max_
+        step = (close_max - close_min) / 1000 or 1e-5
+        close = np.clip((close_min + close_max) / 2 + np.cumsum(rng.normal(0, step, n)), close_min, close_max)
+        spread = np.abs(rng.normal(0, step, n))
+        return pd.DataFrame({
+            'open': close + rng.normal(0, step / 2, n),
+            'high': close + spread,
+            'low': close - spread,
+            'close': close,
+            'volume': rng.uniform(volume_min, volume_max, n)
+        })
+
     def generate_signal(self, recent_data, current_price):
         """売買シグナルを生成"""
         predicted_price, confidence = self.predict_next_price(recent_data)
@@ -370,13 +656,110 @@ class MLTradingSystem:
         else:
             return "HOLD", confidence, predicted_price
     
+    def replay_signals(self, df, window=200, sequence_length=60, batch_size=4096):
+        """
+        過去の全バーについて generate_signal をまとめて再現（MLバックテスト用）
+        
+        バー t の結果は、オンラインと同じく t 本目までの直近 window 本を
+        generate_signal(window_df, close[t]) に渡した場合と同じになる（浮動小数点の丸め誤差を除く）
+        - 計算開始位置に依存しない特徴量（SMA・ボリンジャー・ラグ・移動統計など）は全履歴で1回だけ計算
+        - 再帰型の指標（EMA・MACD・RSI・ATR・ADX）だけバーごとの直近 window 本で計算
+        - LSTM の入力ウィンドウは一括で作り、予測は batch_size 行ずつまとめて実行
+        
+        Returns:
+        - DataFrame（df と同じインデックス）: signal, confidence, predicted_price（予測しないバーは NaN）
+        """
+        data = df.reset_index(drop=True)
+        n = len(data)
+        signals = np.full(n, "HOLD", dtype=object)
+        confidence = np.zeros(n)
+        predicted = np.full(n, np.nan)
+        
+        def result():
+            return pd.DataFrame({
+                'signal': signals,
+                'confidence': confidence,
+                'predicted_price': predicted
+            }, index=df.index)
+        
+        # ウィンドウ先頭で特徴量が揃わない行数（オンラインでは dropna で落ちる）
+        head_features = self.prepare_data(data.iloc[:window])
+        if head_features.empty:
+            return result()
+        warmup = head_features.index[0]
+        
+        # オンラインは dropna 後の行数が sequence_length 未満だと予測しない
+        window_len = np.minimum(np.arange(n) + 1, window)
+        rows = np.flatnonzero(window_len - warmup >= sequence_length)
+        if len(rows) == 0:
+            return result()
+        
+        window_indicators = self.tech_indicators.calculate_window_indicators(data, window, rows)
+        features = pd.DataFrame(
+            self._feature_plan().execute(data, overrides=dict(zip(TechnicalIndicators.RECURSIVE_COLUMNS,
+                                                                  window_indicators.T))),
+            columns=self.feature_columns
+        )
+        
+        predicted[rows] = self.predict_rows(features, rows, sequence_length, batch_size)
+        signals[:], confidence[:] = self.apply_signal_rules(predicted, data['close'].values)
+        
+        return result()
+    
+    def predict_rows(self, features, rows, sequence_length=60, batch_size=4096):
+        """
+        特徴量の指定行（位置）それぞれについて predict_next_price と同じ入力で一括予測
+        （LSTM 入力はその行までの直近 sequence_length 行の close/volume。rows は sequence_length-1 以上）
+        """
+        rows = np.asarray(rows)
+        X_traditional = features.values
+        # MinMaxScaler は要素ごとの変換なので全体に1回かければよい
+        lstm_scaled = self.lstm_scaler.transform(features[['close', 'volume']].values)
+        lstm_windows = np.lib.stride_tricks.sliding_window_view(
+            lstm_scaled, sequence_length, axis=0
+        ).transpose(0, 2, 1)
+        
+        predicted = np.empty(len(rows))
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            X_lstm = lstm_windows[batch - (sequence_length - 1)]
+            predicted[start:start + len(batch)] = self.ensemble_model.predict(X_lstm, X_traditional[batch])
+        return predicted
+    
+    @staticmethod
+    def apply_signal_rules(predicted, current_price):
+        """
+        predict_next_price / generate_signal と同じ信頼度としきい値を配列に適用
+        
+        Returns:
+        - (signals, confidence)。予測が NaN のバーは HOLD / 0.0
+        """
+        predicted = np.asarray(predicted, dtype=float)
+        current_price = np.asarray(current_price, dtype=float)
+        signals = np.full(len(predicted), "HOLD", dtype=object)
+        confidence = np.zeros(len(predicted))
+        
+        valid = ~np.isnan(predicted)
+        conf = np.clip(1.0 - np.abs(predicted - current_price) / current_price * 10, 0.5, 0.95)
+        change_pct = (predicted - current_price) / current_price * 100
+        
+        confident = valid & (conf >= 0.6)
+        confidence[confident] = conf[confident]
+        signals[confident & (change_pct > 0.1) & (conf > 0.7)] = "BUY"
+        signals[confident & (change_pct < -0.1) & (conf > 0.7)] = "SELL"
+        return signals, confidence
+    
     def save_model(self, filepath):
         """モデルを保存"""
         model_data = {
             'ensemble_model': self.ensemble_model,
             'lstm_scaler': self.lstm_scaler,
+            'feature_columns': list(self.feature_columns),
             'last_prediction': self.last_prediction,
-            'last_confidence': self.last_confidence
+            'last_confidence': self.last_confidence,
+            'last_full_train_seconds': getattr(self, 'last_full_train_seconds', None),
+            'last_full_train_rows': getattr(self, 'last_full_train_rows', None),
+            'training_stats': getattr(self, 'training_stats', None)
         }
         joblib.dump(model_data, filepath)
         print(f"モデルを保存しました: {filepath}")
@@ -387,8 +770,12 @@ class MLTradingSystem:
             model_data = joblib.load(filepath)
             self.ensemble_model = model_data['ensemble_model']
             self.lstm_scaler = model_data['lstm_scaler']
+            self.feature_columns = model_data.get('feature_columns', LEGACY_COLUMNS)
             self.last_prediction = model_data.get('last_prediction')
             self.last_confidence = model_data.get('last_confidence', 0.0)
+            self.last_full_train_seconds = model_data.get('last_full_train_seconds')
+            self.last_full_train_rows = model_data.get('last_full_train_rows')
+            self.training_stats = model_data.get('training_stats')
             print(f"モデルを読み込みました: {filepath}")
             return True
         except Exception as e:
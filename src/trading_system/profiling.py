@@ -0,0 +1,228 @@
+"""
+稼働中のリクエストハンドラ（/tick・/signal）のオンデマンド・プロファイリング
+
+- arm() で次の N リクエスト、または T 秒間だけ有効にする（無効時のコストは属性1つの判定だけ）
+- mode='sampling': 別スレッドが一定間隔で、計測対象のハンドラを実行中のスレッドのスタックだけを採取
+- mode='deterministic': ハンドラのスレッドだけに sys.setprofile をかけ、全関数呼び出しの時間を計測
+- 結果は flamegraph.pl / speedscope で読める collapsed stack 形式（*.folded）と、
+  関数ごとの self / total の集計（*_summary.txt）で出力
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+
+def _frame_key(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _builtin_key(func):
+    module = getattr(func, '__module__', None) or type(getattr(func, '__self__', None)).__name__
+    return f"{module}.{getattr(func, '__qualname__', repr(func))} (builtin)"
+
+
+def summarize_stacks(stacks, top=40):
+    """collapsed stack から関数ごとの self（末端）と total（スタック中に出現）を集計"""
+    total = sum(stacks.values()) or 1
+    self_values, total_values = Counter(), Counter()
+    for stack, value in stacks.items():
+        frames = stack.split(';')
+        self_values[frames[-1]] += value
+        for frame in set(frames):
+            total_values[frame] += value
+
+    lines = [f"{'self%':>7} {'total%':>7}  function"]
+    for name, value in self_values.most_common(top):
+        lines.append(f"{value / total:7.1%} {total_values[name] / total:7.1%}  {name}")
+    lines.append("")
+    lines.append(f"{'total%':>7}  function (by total)")
+    for name, value in total_values.most_common(top):
+        lines.append(f"{value / total:7.1%}  {name}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestProfiler:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.active = False  # 無効時はハンドラのラッパーがこれだけを見る
+        self._lock = threading.Lock()
+        self._session = None
+        self.last_result = None
+
+    # === 制御 ===
+    def arm(self, mode='sampling', requests=None, seconds=None, routes=('tick', 'signal'), interval_ms=5.0):
+        """
+        次の requests 件、または seconds 秒間（両方指定なら先に達した方まで）プロファイリングする
+        """
+        if mode not in ('sampling', 'deterministic'):
+            raise ValueError(f"Unknown mode: {mode}")
+        if not requests and not seconds:
+            requests = 100
+
+        with self._lock:
+            if self._session is not None:
+                raise RuntimeError("Profiling already running")
+            self._session = {
+                'mode': mode,
+                'routes': set(routes),
+                'requests': requests,
+                'deadline': time.monotonic() + seconds if seconds else None,
+                'interval': interval_ms / 1000.0,
+                'started_at': datetime.now(),
+                'count': 0,
+                'stacks': Counter(),
+                'threads': {},  # スレッドID -> ハンドラの code（sampling 用）
+            }
+            self.active = True
+
+        session = self._session
+        if seconds:
+            timer = threading.Timer(seconds, self._finish, args=(session,))
+            timer.daemon = True
+            timer.start()
+        if mode == 'sampling':
+            threading.Thread(target=self._sample_loop, args=(session,),
+                             name='request-profiler', daemon=True).start()
+        return self.status()
+
+    def status(self):
+        session = self._session
+        if session is None:
+            return {'active': False, 'last_result': self.last_result}
+        return {
+            'active': True,
+            'mode': session['mode'],
+            'routes': sorted(session['routes']),
+            'profiled_requests': session['count'],
+            'target_requests': session['requests'],
+            'seconds_left': round(session['deadline'] - time.monotonic(), 1) if session['deadline'] else None,
+            'last_result': self.last_result,
+        }
+
+    def stop(self):
+        """今までの結果を書き出して終了"""
+        return self._finish()
+
+    # === ハンドラ ===
+    def wrap(self, route):
+        """Flask のビュー関数をプロファイリング対象にするデコレータ（@app.route の下に付ける）"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.active:
+                    return view(*args, **kwargs)
+                return self._profiled_call(route, view, args, kwargs)
+            return wrapper
+        return decorator
+
+    def _profiled_call(self, route, view, args, kwargs):
+        session = self._session
+        if session is None or route not in session['routes']:
+            return view(*args, **kwargs)
+
+        thread_id = threading.get_ident()
+        stacks = None
+        if session['mode'] == 'deterministic':
+            stacks = Counter()
+            sys.setprofile(self._tracer(route, stacks))
+        else:
+            session['threads'][thread_id] = (route, view.__code__)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            if stacks is not None:
+                sys.setprofile(None)
+            else:
+                session['threads'].pop(thread_id, None)
+            self._request_done(session, stacks)
+
+    def _request_done(self, session, stacks):
+        with self._lock:
+            if self._session is not session:
+                return
+            session['count'] += 1
+            if stacks:
+                session['stacks'].update(stacks)
+            done = (session['requests'] and session['count'] >= session['requests']) or \
+                (session['deadline'] and time.monotonic() >= session['deadline'])
+        if done:
+            self._finish(session)
+
+    # === 計測 ===
+    @staticmethod
+    def _tracer(route, stacks):
+        """決定的プロファイラ（値はマイクロ秒の self 時間）"""
+        stack = []  # [キー, 開始時刻, 子の合計時間]
+        perf_counter = time.perf_counter
+
+        def profile(frame, event, arg):
+            now = perf_counter()
+            if event == 'call':
+                stack.append([_frame_key(frame.f_code), now, 0.0])
+            elif event == 'c_call':
+                stack.append([_builtin_key(arg), now, 0.0])
+            elif stack:  # return / c_return / c_exception
+                key, started, child = stack.pop()
+                elapsed = now - started
+                path = ";".join([route] + [entry[0] for entry in stack] + [key])
+                stacks[path] += int(round((elapsed - child) * 1e6))
+                if stack:
+                    stack[-1][2] += elapsed
+
+        return profile
+
+    def _sample_loop(self, session):
+        """サンプリング（値はサンプル数）。計測対象のハンドラ内のフレームだけを採る"""
+        while self._session is session:
+            frames = sys._current_frames()
+            for thread_id, (route, root_code) in list(session['threads'].items()):
+                frame = frames.get(thread_id)
+                path = []
+                while frame is not None:
+                    path.append(_frame_key(frame.f_code))
+                    if frame.f_code is root_code:
+                        break
+                    frame = frame.f_back
+                else:
+                    continue  # ハンドラの外（開始直後・終了直後）
+                with self._lock:
+                    session['stacks'][";".join([route] + path[::-1])] += 1
+            del frames
+            time.sleep(session['interval'])
+
+    # === 出力 ===
+    def _finish(self, expected=None):
+        with self._lock:
+            session = self._session
+            if session is None or (expected is not None and session is not expected):
+                return self.last_result
+            self._session = None
+            self.active = False
+            stacks = dict(session['stacks'])
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"profile_{session['started_at'].strftime('%Y%m%d_%H%M%S')}_{session['mode']}"
+        folded_path = os.path.join(self.output_dir, name + ".folded")
+        summary_path = os.path.join(self.output_dir, name + "_summary.txt")
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            for stack, value in sorted(stacks.items()):
+                if value > 0:
+                    f.write(f"{stack} {value}\n")
+        unit = 'samples' if session['mode'] == 'sampling' else 'microseconds (self time)'
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(f"mode: {session['mode']}, requests: {session['count']}, unit: {unit}\n\n")
+            f.write(summarize_stacks(stacks))
+
+        self.last_result = {
+            'mode': session['mode'],
+            'requests': session['count'],
+            'started_at': session['started_at'].isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'folded': folded_path,
+            'summary': summary_path,
+        }
+        return self.last_result
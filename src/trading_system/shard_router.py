@@ -0,0 +1,355 @@
+"""
+シンボル単位のマルチプロセス・シャーディング
+
+flask_trading_api.py を N 個のワーカープロセスとして起動し、このプロセス（ルーター）が
+シンボルのコンシステント・ハッシュで担当ワーカーへ転送する。各ワーカーは担当シンボルのバッファと
+モデルだけを持つので、GIL に縛られずシンボル数に応じてコア数まで処理を分散できる。
+
+- エンドポイントは単一プロセスと同じ（/tick・/signal/<symbol>・/status ...）。シンボル付きの
+  リクエストは担当ワーカーへそのまま転送し、/status・/health・/ready・/metrics・/backup/all は
+  全ワーカーの結果をまとめて返す
+- ワーカー数を変えても移動するシンボルは約 1/N（データは共有ディレクトリのCSVから読み直される）
+- 異常終了したワーカーは再起動する
+
+使い方:
+    python shard_router.py --workers 4 --port 5000 --base-port 5101
+"""
+import argparse
+import bisect
+import hashlib
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Flask, Response, jsonify, request
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+# シンボルを URL の2番目に持つルート（/signal/EURUSD など）
+SYMBOL_ROUTES = {'signal', 'retrain', 'status', 'data', 'bars', 'backup'}
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """仮想ノード付きのコンシステント・ハッシュ"""
+
+    def __init__(self, nodes, vnodes=64):
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+        self._cache = {}
+
+    def node_for(self, symbol):
+        node = self._cache.get(symbol)
+        if node is None:
+            pos = bisect.bisect(self._keys, _hash(symbol)) % len(self._keys)
+            node = self._cache[symbol] = self._nodes[pos]
+        return node
+
+
+class WorkerPool:
+    """flask_trading_api.py のワーカープロセス群（127.0.0.1 の base_port から連番で待ち受け）"""
+
+    def __init__(self, count, base_port, vnodes=64, script=None, restart_delay=2.0):
+        self.count = count
+        self.base_port = base_port
+        self.vnodes = vnodes
+        self.script = script or os.path.join(current_dir, 'flask_trading_api.py')
+        self.restart_delay = restart_delay
+        self.urls = [f"http://127.0.0.1:{base_port + i}" for i in range(count)]
+        self.processes = [None] * count
+        self.restarts = [0] * count
+        self._stopping = threading.Event()
+
+    def _spawn(self, index):
+        env = dict(os.environ)
+        env.update({
+            'TRADING_API_HOST': '127.0.0.1',
+            'TRADING_API_PORT': str(self.base_port + index),
+            'TRADING_SHARD_INDEX': str(index),
+            'TRADING_SHARD_COUNT': str(self.count),
+            'TRADING_SHARD_VNODES': str(self.vnodes),
+            'TRADING_LOG_FILE': f"trading_api_worker{index}.log",
+        })
+        self.processes[index] = subprocess.Popen([sys.executable, self.script], env=env)
+        logging.info(f"ワーカー {index} を起動: pid {self.processes[index].pid}, {self.urls[index]}")
+
+    def start(self):
+        for index in range(self.count):
+            self._spawn(index)
+        threading.Thread(target=self._supervise, name='worker-supervisor', daemon=True).start()
+
+    def _supervise(self):
+        while not self._stopping.wait(1.0):
+            for index, process in enumerate(self.processes):
+                if process.poll() is not None and not self._stopping.is_set():
+                    logging.error(f"ワーカー {index} が終了しました (code {process.returncode}) - 再起動します")
+                    if self._stopping.wait(self.restart_delay):
+                        return
+                    self.restarts[index] += 1
+                    self._spawn(index)
+
+    def stop(self, timeout=10.0):
+        self._stopping.set()
+        for process in self.processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                try:
+                    process.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    def alive(self):
+        return [process is not None and process.poll() is None for process in self.processes]
+
+
+class ShardRouter:
+    def __init__(self, urls, vnodes=64, timeout=60.0):
+        self.urls = list(urls)
+        self.ring = HashRing(range(len(self.urls)), vnodes)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._fan_out_pool = ThreadPoolExecutor(max_workers=max(len(self.urls), 1), thread_name_prefix='fan-out')
+
+    def _session(self):
+        # スレッドごとに接続を使い回す（ワーカーへの keep-alive）
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def worker_for(self, symbol):
+        return self.ring.node_for(symbol)
+
+    def forward(self, index, method, path, params=None, data=None, headers=None, timeout=None, stream=False):
+        return self._session().request(method, self.urls[index] + path, params=params, data=data,
+                                       headers=headers, timeout=timeout or self.timeout, stream=stream)
+
+    def fan_out(self, method, path, params=None, headers=None):
+        """全ワーカーへ並列に送る（[(index, response or 例外)]）"""
+        def call(index):
+            try:
+                return index, self.forward(index, method, path, params=params, headers=headers)
+            except requests.RequestException as e:
+                return index, e
+
+        return list(self._fan_out_pool.map(call, range(len(self.urls))))
+
+
+def _json_results(results):
+    """fan_out の結果から JSON を返したワーカーの分だけ取り出す（失敗分は errors へ）"""
+    payloads, errors = {}, {}
+    for index, response in results:
+        if isinstance(response, Exception):
+            errors[index] = str(response)
+            continue
+        try:
+            payloads[index] = (response.status_code, response.json())
+        except ValueError:
+            errors[index] = f"HTTP {response.status_code}"
+    return payloads, errors
+
+
+def _label_metrics(text, index, seen_headers):
+    """ワーカーの Prometheus 出力に worker ラベルを付ける（HELP/TYPE は最初の1回だけ）"""
+    lines = []
+    for line in text.splitlines():
+        if not line:
+            continue
+        if line.startswith('#'):
+            if line not in seen_headers:
+                seen_headers.add(line)
+                lines.append(line)
+            continue
+        name, _, rest = line.rpartition(' ')
+        if '{' in name:
+            metric, _, labels = name.partition('{')
+            name = f'{metric}{{worker="{index}",{labels}'
+        else:
+            name = f'{name}{{worker="{index}"}}'
+        lines.append(f"{name} {rest}")
+    return lines
+
+
+def create_app(router, pool=None):
+    app = Flask(__name__)
+    admin_token = os.environ.get('TRADING_ADMIN_TOKEN')
+    forward_headers = ('Content-Type', 'X-Admin-Token')
+
+    def _headers():
+        return {k: request.headers[k] for k in forward_headers if k in request.headers}
+
+    def _relay(index, timeout=None):
+        try:
+            response = router.forward(index, request.method, request.full_path.rstrip('?'),
+                                      data=request.get_data(), headers=_headers(), timeout=timeout)
+        except requests.RequestException as e:
+            return jsonify({'error': f"Worker {index} unavailable: {e}", 'worker': index}), 503
+        return Response(response.content, response.status_code,
+                        content_type=response.headers.get('Content-Type'))
+
+    def _relay_stream(index):
+        """SSE はワーカーからの応答を読みながらそのまま流す（接続はクライアントが切るまで続く）"""
+        headers = _headers()
+        if 'Last-Event-ID' in request.headers:
+            headers['Last-Event-ID'] = request.headers['Last-Event-ID']
+        try:
+            response = router.forward(index, 'GET', request.full_path.rstrip('?'), headers=headers,
+                                      timeout=(10, None), stream=True)
+        except requests.RequestException as e:
+            return jsonify({'error': f"Worker {index} unavailable: {e}", 'worker': index}), 503
+
+        def body():
+            try:
+                for chunk in response.iter_content(chunk_size=None):
+                    yield chunk
+            finally:
+                response.close()
+
+        return Response(body(), response.status_code, content_type=response.headers.get('Content-Type'),
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/tick', methods=['POST'])
+    def tick():
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        symbol = data.get('symbol', 'UNKNOWN')
+        if symbol == 'UNKNOWN':
+            return jsonify({'error': 'Symbol not specified'}), 400
+        return _relay(router.worker_for(symbol))
+
+    @app.route('/status', methods=['GET'])
+    def status():
+        payloads, errors = _json_results(router.fan_out('GET', '/status'))
+        symbols, workers = {}, {}
+        for index, (_, payload) in sorted(payloads.items()):
+            for symbol, stats in payload.get('symbols', {}).items():
+                stats['worker'] = index
+                symbols[symbol] = stats
+            workers[index] = sorted(payload.get('symbols', {}))
+        return jsonify({'symbols': symbols, 'workers': workers, 'worker_errors': errors,
+                        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')})
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        payloads, errors = _json_results(router.fan_out('GET', '/health'))
+        bodies = [payload for _, payload in payloads.values()]
+        return jsonify({
+            'status': 'healthy' if not errors else 'degraded',
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'active_symbols': sorted(s for body in bodies for s in body.get('active_symbols', [])),
+            'total_data_points': sum(body.get('total_data_points', 0) for body in bodies),
+            'symbols_with_models': sum(body.get('symbols_with_models', 0) for body in bodies),
+            'workers': len(router.urls),
+            'worker_errors': errors,
+        })
+
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        payloads, errors = _json_results(router.fan_out('GET', '/ready'))
+        ready_all = not errors and all(code == 200 for code, _ in payloads.values())
+        return jsonify({
+            'ready': ready_all,
+            'workers': {index: payload for index, (_, payload) in sorted(payloads.items())},
+            'worker_errors': errors,
+        }), 200 if ready_all else 503
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        lines, seen_headers = [], set()
+        for index, response in router.fan_out('GET', '/metrics'):
+            if not isinstance(response, Exception) and response.status_code == 200:
+                lines.extend(_label_metrics(response.text, index, seen_headers))
+        lines.append('# TYPE trading_router_worker_up gauge')
+        alive = pool.alive() if pool is not None else [True] * len(router.urls)
+        lines.extend(f'trading_router_worker_up{{worker="{i}"}} {float(up)}' for i, up in enumerate(alive))
+        return Response("\n".join(lines) + "\n", content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.route('/backup/all', methods=['POST'])
+    def backup_all():
+        payloads, errors = _json_results(router.fan_out('POST', '/backup/all'))
+        results = {}
+        for _, payload in payloads.values():
+            results.update(payload.get('results', {}))
+        return jsonify({'status': 'success' if not errors else 'partial', 'message': 'All symbols backed up',
+                        'results': results, 'worker_errors': errors,
+                        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}), 200 if not errors else 502
+
+    @app.route('/shards', methods=['GET'])
+    def shards():
+        """担当ワーカーの確認（?symbols=EURUSD,USDJPY）"""
+        symbols = [s for s in request.args.get('symbols', '').split(',') if s]
+        return jsonify({
+            'workers': router.urls,
+            'alive': pool.alive() if pool is not None else None,
+            'restarts': pool.restarts if pool is not None else None,
+            'assignments': {s: router.worker_for(s) for s in symbols},
+        })
+
+    @app.route('/admin/<path:path>', methods=['GET', 'POST'])
+    def admin(path):
+        """?worker=N または ?symbol=XXX のワーカーへ転送（ルーターでも localhost / X-Admin-Token を確認）"""
+        if request.remote_addr not in ('127.0.0.1', '::1') and \
+                not (admin_token and request.headers.get('X-Admin-Token') == admin_token):
+            return jsonify({'error': 'Forbidden'}), 403
+        if 'symbol' in request.args:
+            index = router.worker_for(request.args['symbol'])
+        else:
+            index = request.args.get('worker', 0, type=int)
+        if not 0 <= index < len(router.urls):
+            return jsonify({'error': f"Invalid worker: {index}"}), 400
+        return _relay(index)
+
+    @app.route('/<route>/<symbol>', methods=['GET', 'POST'])
+    @app.route('/<route>/<symbol>/<path:rest>', methods=['GET', 'POST'])
+    def symbol_route(route, symbol, rest=None):
+        if route not in SYMBOL_ROUTES:
+            return jsonify({'error': f"Unknown route: /{route}"}), 404
+        if route == 'signal' and rest == 'stream':
+            return _relay_stream(router.worker_for(symbol))
+        # 再学習はワーカー側で数分かかることがあるのでタイムアウトしない
+        return _relay(router.worker_for(symbol), timeout=(10, None) if route == 'retrain' else None)
+
+    return app
+
+
+if __name__ == '__main__':
+    from log_pipeline import setup_logging
+
+    parser = argparse.ArgumentParser(description='Trading API shard router')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('TRADING_API_PORT', '5000')))
+    parser.add_argument('--base-port', type=int, default=5101)
+    parser.add_argument('--vnodes', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    setup_logging('trading_router.log', level=logging.INFO)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    pool = WorkerPool(args.workers, args.base_port, vnodes=args.vnodes)
+    pool.start()
+    router = ShardRouter(pool.urls, vnodes=args.vnodes, timeout=args.timeout)
+    logging.info(f"ルーター起動: {args.host}:{args.port} -> ワーカー {args.workers} 個 "
+                 f"({pool.urls[0]} ～ {pool.urls[-1]})")
+    # サービス停止（SIGTERM）でもワーカーを止めてから終了する
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        create_app(router, pool).run(host=args.host, port=args.port, debug=False, threaded=True)
+    finally:
+        pool.stop()
@@ -0,0 +1,291 @@
+"""
+シンボルごとのティックを共有メモリのリングバッファに置き、別プロセスからコピーせずに読む
+
+- 書き込みは受信プロセス1つだけ。読み込み（推論・集計）プロセスはいくつでも接続できる
+- seqlock: 書き込み中はシーケンス番号が奇数。読み込み側は偶数で前後一致したときの件数を採用する
+- 各行はリング上の i と i + capacity の2か所に書く（ミラー）ので、capacity - 1 本までの直近の窓は
+  常に連続した numpy のビューとして取れる
+- 読んだ窓は書き込みが1周するまで有効。計算後に TickWindow.valid() で上書きされていないか確認できる
+
+共有メモリのレイアウト:
+    header int64[8]: [MAGIC, capacity, seq, count, closed, 0, 0, 0]
+    times  int64[2 * capacity]          ティックの時刻（ns）
+    values float64[2 * capacity, 5]     open, high, low, close, volume
+"""
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+MAGIC = 0x5449434B52494E47  # "TICKRING"
+HEADER_WORDS = 8
+HEADER_BYTES = HEADER_WORDS * 8
+VALUE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+_SEQ, _COUNT, _CLOSED = 2, 3, 4
+
+
+def segment_name(prefix, symbol):
+    return f"{prefix}_{symbol}"
+
+
+def _segment_size(capacity):
+    return HEADER_BYTES + 2 * capacity * 8 + 2 * capacity * len(VALUE_COLUMNS) * 8
+
+
+def _attach(name, untrack=True):
+    """
+    既存の共有メモリに接続（読み込み側）
+
+    Python 3.12 以前の POSIX では接続しただけで resource_tracker に登録され、読み込みプロセスの
+    終了時に削除されてしまうので登録を外す（削除は書き込み側が行う）。
+    書き込みプロセスの子プロセスは親と同じ resource_tracker を使うので untrack=False で接続する
+    （外すと親の unlink 時に未登録エラーになる）
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if untrack and sys.platform != 'win32':
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class TickRing:
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        if int(self.header[0]) != MAGIC:
+            raise ValueError(f"Not a tick ring: {shm.name}")
+        capacity = int(self.header[1])
+        self.capacity = capacity
+        self.times = np.ndarray((2 * capacity,), dtype=np.int64, buffer=shm.buf, offset=HEADER_BYTES)
+        self.values = np.ndarray((2 * capacity, len(VALUE_COLUMNS)), dtype=np.float64, buffer=shm.buf,
+                                 offset=HEADER_BYTES + 2 * capacity * 8)
+
+    @classmethod
+    def create(cls, name, capacity=8192):
+        """
+        書き込み側のリングを作る
+
+        前回の書き込みプロセスが残した同名のリングがあれば、同じ容量ならデータと通し番号ごと引き継ぐ
+        （接続したままの読み込み側もそのまま続きを読める）
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=_segment_size(capacity))
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=name)
+            header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+            if int(header[0]) != MAGIC or int(header[1]) != capacity:
+                del header
+                shm.close()
+                shm.unlink()
+                return cls.create(name, capacity)
+            header[_CLOSED] = 0
+            del header
+            return cls(shm, owner=True)
+
+        header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[1] = capacity
+        header[0] = MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, untrack=True):
+        return cls(_attach(name, untrack), owner=False)
+
+    # === 書き込み（1プロセスのみ） ===
+    def append(self, t_ns, open_, high, low, close, volume):
+        header = self.header
+        count = int(header[_COUNT])
+        i = count % self.capacity
+        row = (open_, high, low, close, volume)
+
+        header[_SEQ] += 1  # 奇数: 書き込み中
+        self.times[i] = t_ns
+        self.times[i + self.capacity] = t_ns
+        self.values[i] = row
+        self.values[i + self.capacity] = row
+        header[_COUNT] = count + 1
+        header[_SEQ] += 1
+
+    # === 読み込み ===
+    @property
+    def count(self):
+        """これまでに書かれたティック数"""
+        return int(self.header[_COUNT])
+
+    @property
+    def closed(self):
+        return bool(self.header[_CLOSED])
+
+    def window(self, n, copy=False, timeout=1.0):
+        """
+        直近 n 本（最大 capacity - 1）の TickWindow
+
+        copy=False はコピーなしのビュー（書き込みが1周するまで有効）
+        """
+        header = self.header
+        n = min(n, self.capacity - 1)
+        deadline = None
+        while True:
+            seq = int(header[_SEQ])
+            if not seq & 1:
+                count = int(header[_COUNT])
+                if int(header[_SEQ]) == seq:
+                    break
+            # 書き込みは数マイクロ秒で終わるので譲って再試行
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise TimeoutError(f"Tick ring writer stalled: {self.shm.name}")
+            time.sleep(0)
+
+        n = min(n, count)
+        first = count - n
+        start = first % self.capacity
+        window = TickWindow(self, first, self.times[start:start + n], self.values[start:start + n])
+        return window.copy() if copy else window
+
+    def close(self, unlink=None):
+        """接続を閉じる（書き込み側は closed を立ててから削除）"""
+        if unlink is None:
+            unlink = self.owner
+        if self.owner:
+            self.header[_CLOSED] = 1
+        self.header = self.times = self.values = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class TickWindow:
+    """リング上の連続した直近ティック（times: int64 ns, values: [open, high, low, close, volume]）"""
+
+    def __init__(self, ring, first, times, values):
+        self.ring = ring
+        self.first = first  # 先頭ティックの通し番号
+        self.times = times
+        self.values = values
+
+    def __len__(self):
+        return len(self.times)
+
+    def valid(self):
+        """読んだ範囲がまだ上書きされていないか（書き込み中の1行も上書きとみなす）"""
+        if self.ring is None:
+            return True
+        return self.ring.count + 1 <= self.first + self.ring.capacity
+
+    def copy(self):
+        """リングから切り離したコピー（コピー後に上書きされていれば読み直す）"""
+        while True:
+            copied = TickWindow(None, self.first, self.times.copy(), self.values.copy())
+            if self.valid():
+                return copied
+            fresh = self.ring.window(len(self))
+            self.first, self.times, self.values = fresh.first, fresh.times, fresh.values
+
+    def dataframe(self):
+        """get_recent_dataframe と同じ列（datetime, open, high, low, close, volume）の DataFrame"""
+        df = pd.DataFrame(self.values, columns=VALUE_COLUMNS, copy=False)
+        df.insert(0, 'datetime', pd.to_datetime(self.times))
+        return df
+
+
+class TickRingWriter:
+    """受信プロセス側: シンボルごとのリングを初回のティックで作る"""
+
+    def __init__(self, prefix='trading_ticks', capacity=8192):
+        self.prefix = prefix
+        self.capacity = capacity
+        self.rings = {}
+
+    def ring(self, symbol):
+        ring = self.rings.get(symbol)
+        if ring is None:
+            ring = self.rings[symbol] = TickRing.create(segment_name(self.prefix, symbol), self.capacity)
+        return ring
+
+    def append(self, symbol, tick_data):
+        self.ring(symbol).append(pd.Timestamp(tick_data['datetime']).value,
+                                 float(tick_data['open']), float(tick_data['high']), float(tick_data['low']),
+                                 float(tick_data['close']), float(tick_data['volume']))
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+
+class TickRingReader:
+    """推論・集計プロセス側: シンボル名でリングに接続（書き込み側が作り直したら接続し直す）"""
+
+    def __init__(self, prefix='trading_ticks'):
+        self.prefix = prefix
+        self.rings = {}
+
+    def ring(self, symbol):
+        ring = self.rings.get(symbol)
+        if ring is not None and ring.closed:
+            ring.close()
+            ring = None
+        if ring is None:
+            ring = self.rings[symbol] = TickRing.attach(segment_name(self.prefix, symbol))
+        return ring
+
+    def window(self, symbol, n, copy=False):
+        return self.ring(symbol).window(n, copy=copy)
+
+    def dataframe(self, symbol, n=200):
+        """直近 n 本の DataFrame（MLTradingSystem.generate_signal にそのまま渡せる）"""
+        return self.window(symbol, n, copy=True).dataframe()
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+
+def _watch(symbols, prefix, n, interval):
+    """受信プロセスのリングを読んで直近 n 本の要約を表示（集計プロセスの例）"""
+    reader = TickRingReader(prefix)
+    try:
+        while True:
+            for symbol in symbols:
+                try:
+                    window = reader.window(symbol, n)
+                except FileNotFoundError:
+                    print(f"{symbol}: no ring (is TRADING_SHM_RING=1 set on the API?)")
+                    continue
+                if len(window) == 0:
+                    continue
+                closes = window.values[:, 3]
+                summary = (f"{symbol}: {len(window)} ticks up to {pd.Timestamp(window.times[-1])}, "
+                           f"close {closes[-1]:.5f}, range {closes.min():.5f}-{closes.max():.5f}")
+                print(summary if window.valid() else f"{symbol}: window overwritten while reading, retrying")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Watch the shared-memory tick rings of a running API')
+    parser.add_argument('--watch', nargs='+', metavar='SYMBOL', required=True, help='受信中のリングを読んで表示')
+    parser.add_argument('--prefix', default='trading_ticks')
+    parser.add_argument('--window', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    _watch(args.watch, args.prefix, args.window, args.interval)
@@ -0,0 +1,73 @@
+"""
+バー確定時に計算したシグナルの保存と配信
+
+- シグナルはシンボル×キー（'tick' または時間足）ごとに最新の1件とバージョン番号を持つ
+- ポーリングは保存済みの結果を返すだけ（モデルの評価はバー確定時の1回）
+- 待ち受け（ロングポーリング・SSE）はバージョンが進むまで Condition で待つ
+"""
+import json
+import threading
+import time
+
+
+class SignalBoard:
+    def __init__(self):
+        self._entries = {}   # (symbol, key) -> {'version', 'stale', 'signal', ...}
+        self._versions = {}  # (symbol, key) -> 最新バージョン（無効化しても戻さない）
+        self._cond = threading.Condition()
+
+    def publish(self, symbol, key, result):
+        """新しい結果を保存して待ち受け中のクライアントを起こす。付けたバージョンを返す"""
+        with self._cond:
+            version = self._versions.get((symbol, key), 0) + 1
+            self._versions[(symbol, key)] = version
+            entry = dict(result, version=version, stale=False, published_at=time.time())
+            self._entries[(symbol, key)] = entry
+            self._cond.notify_all()
+        return version
+
+    def get(self, symbol, key):
+        """保存済みの最新の結果（無効化されていれば None）"""
+        entry = self._entries.get((symbol, key))
+        if entry is None or entry['stale']:
+            return None
+        return entry
+
+    def version(self, symbol, key):
+        return self._versions.get((symbol, key), 0)
+
+    def invalidate(self, symbol):
+        """モデルの差し替え時など、保存済みの結果を次の要求で計算し直させる"""
+        with self._cond:
+            for (entry_symbol, _), entry in self._entries.items():
+                if entry_symbol == symbol:
+                    entry['stale'] = True
+
+    def wait(self, symbol, key, since, timeout):
+        """
+        バージョンが since より新しい結果を最大 timeout 秒待つ（時間切れは None）
+
+        since がサーバーのバージョンより大きい（サーバー再起動後など）ときは現在の結果をすぐ返す
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                entry = self._entries.get((symbol, key))
+                if entry is not None and not entry['stale'] and entry['version'] != since:
+                    return entry
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def stream(self, symbol, key, since=0, heartbeat=15.0, retry_ms=5000):
+        """Server-Sent Events の本文（新しい結果ごとに1イベント、無通信時はコメント行）"""
+        # 最初に再接続間隔を送る（レスポンスヘッダーもここで送られるので、接続がすぐ確立する）
+        yield f"retry: {retry_ms}\n\n"
+        while True:
+            entry = self.wait(symbol, key, since, heartbeat)
+            if entry is None:
+                yield ": keep-alive\n\n"
+                continue
+            since = entry['version']
+            yield f"id: {since}\nevent: signal\ndata: {json.dumps(entry, default=str)}\n\n"
@@ -0,0 +1,49 @@
+# 1日分を超えたティックのアーカイブ: TRADING_TICK_TIMEZONE 未設定は従来どおり全件を10件に1件、
+# 設定時はティックの時刻でセッション外と判定した分だけを間引く
+import pandas as pd
+
+
+def ticks(start, n):
+    times = pd.date_range(start, periods=n, freq="1min")
+    return [{"datetime": t.strftime("%Y-%m-%d %H:%M:%S"), "open": 1.1, "high": 1.1, "low": 1.1,
+             "close": 1.1 + i * 1e-5, "volume": 1} for i, t in enumerate(times)]
+
+
+def read_archive(manager):
+    files = list(manager.archive_dir.glob("*.csv"))
+    assert len(files) == 1
+    return files[0].name, pd.read_csv(files[0])
+
+
+def test_without_tick_timezone_thins_all_rows(api, tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "TICK_TIMEZONE", None)
+    manager = api.SymbolDataManager(tmp_path, "EURUSD", max_buffer_size=100)
+    # 現在時刻はセッション中（ティックの時刻は判定に使わない）
+    monkeypatch.setattr(manager, "is_market_open", lambda timestamp=None: True)
+    manager.data_buffer = ticks("2024-07-05 19:00", 300)
+
+    manager.archive_old_data()
+
+    name, archived = read_archive(manager)
+    assert len(manager.data_buffer) == 100
+    assert len(archived) == 20
+    assert list(archived["datetime"][:2]) == ["2024-07-05 19:00:00", "2024-07-05 19:10:00"]
+    assert "_open_" in name
+
+
+def test_with_tick_timezone_thins_only_closed_rows(api, tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "TICK_TIMEZONE", "UTC")
+    manager = api.SymbolDataManager(tmp_path, "EURUSD", max_buffer_size=100)
+    # 金曜 21:00 UTC（NY 17:00、夏時間）にクローズ。最後のティックが休場中なので残すのは 100 // 10 件
+    manager.data_buffer = ticks("2024-07-05 19:00", 300)
+
+    manager.archive_old_data()
+
+    name, archived = read_archive(manager)
+    assert len(manager.data_buffer) == 10
+    times = pd.to_datetime(archived["datetime"])
+    in_session = times < pd.Timestamp("2024-07-05 21:00")
+    assert in_session.sum() == 120  # セッション中は全て残す
+    assert (~in_session).sum() == 17  # セッション外 170 件を10件に1件
+    assert times[~in_session].iloc[1] - times[~in_session].iloc[0] == pd.Timedelta(minutes=10)
+    assert "_open_" in name
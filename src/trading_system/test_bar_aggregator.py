@@ -0,0 +1,121 @@
+# ティックから作る複数時間足のバー: resample との一致、確定の検出、確定バーの保持領域の折り返し、
+# EA の累積出来高のリセットと、EA のチャート時間足の高値・安値の反映
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_aggregator import TIMEFRAME_SECONDS, BarAggregator, _BarSeries
+
+T0 = pd.Timestamp("2024-03-04")
+MINUTE = 60 * 10**9
+
+
+def test_bars_match_resample():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    times = T0 + pd.to_timedelta(np.cumsum(rng.integers(1, 4, n)), unit="s")
+    prices = 1.1 + np.cumsum(rng.normal(0, 1e-5, n))
+
+    aggregator = BarAggregator(max_bars=5000)
+    for t, p in zip(times, prices):
+        aggregator.add_tick(t, p)
+
+    ticks = pd.Series(prices, index=times)
+    for tf in aggregator.timeframes:
+        rule = f"{TIMEFRAME_SECONDS[tf]}s"
+        expected = ticks.resample(rule).ohlc()
+        expected["volume"] = ticks.resample(rule).count()
+        expected = expected[expected["volume"] > 0].tail(300)
+        got = aggregator.bars(tf, count=len(expected)).set_index("datetime")
+        assert got.index.equals(expected.index), tf
+        np.testing.assert_allclose(got.values, expected[["open", "high", "low", "close", "volume"]].values)
+
+
+def test_bar_close_detection():
+    aggregator = BarAggregator(("M1", "M5"), max_bars=10)
+    assert aggregator.add_tick(T0 + pd.Timedelta(seconds=10), 1.0) == {}
+    assert aggregator.add_tick(T0 + pd.Timedelta(seconds=59), 1.2) == {}
+    # 次の分の最初のティックで M1 が確定（確定したバーの開始時刻を返す）
+    assert aggregator.add_tick(T0 + pd.Timedelta(minutes=1), 1.1) == {"M1": T0}
+    # 空白の区間を飛ばしても直前の形成中のバーだけが確定する
+    closed = aggregator.add_tick(T0 + pd.Timedelta(minutes=7, seconds=30), 1.3)
+    assert closed == {"M1": T0 + pd.Timedelta(minutes=1), "M5": T0}
+
+    bars = aggregator.bars("M1", include_forming=False)
+    assert list(bars["datetime"]) == [T0, T0 + pd.Timedelta(minutes=1)]
+    assert list(bars.iloc[0, 1:]) == [1.0, 1.2, 1.0, 1.2, 2.0]
+    assert aggregator.forming_bar_start("M5") == T0 + pd.Timedelta(minutes=5)
+    assert len(aggregator.bars("M5", count=5)) == 2  # 形成中のバーを含む
+
+    with pytest.raises(ValueError):
+        aggregator.bars("H1")
+    with pytest.raises(ValueError):
+        BarAggregator(("M2",))
+
+
+def test_late_tick_updates_closed_bar():
+    series = _BarSeries(60, max_bars=10)
+    series.update(0, 1.0, 1.0, 1.0, 1.0, 1.0)
+    series.update(MINUTE, 1.1, 1.1, 1.1, 1.1, 1.0)
+    assert series.update(30 * 10**9, 1.5, 1.5, 0.5, 1.2, 2.0) is None
+    assert list(series.values[0]) == [1.0, 1.5, 0.5, 1.0, 3.0]  # 始値・終値はそのまま
+    assert series.late_updates == 1
+
+
+def test_series_roll_over_keeps_latest_bars():
+    series = _BarSeries(60, max_bars=4)
+    # 容量（max_bars の2倍）を超えて何度も折り返す
+    for i in range(30):
+        series.update(i * MINUTE, i, i + 0.5, i - 0.5, i, 1.0)
+        assert series.size <= 8
+    times, values = series.tail(10, include_forming=False)
+    assert list(times // MINUTE) == [25, 26, 27, 28]
+    assert list(values[:, 3]) == [25, 26, 27, 28]
+
+    times, values = series.tail(3, include_forming=True)
+    assert list(times // MINUTE) == [27, 28, 29]
+    assert list(values[:, 0]) == [27, 28, 29]
+
+
+def test_snapshot_volume_is_delta_of_cumulative():
+    aggregator = BarAggregator(("M1", "M5"), max_bars=10)
+    aggregator.add_snapshot(T0, 1.0, 100)  # 最初の累積値は基準にするだけ
+    aggregator.add_snapshot(T0 + pd.Timedelta(seconds=20), 1.0, 130)
+    aggregator.add_snapshot(T0 + pd.Timedelta(seconds=40), 1.0, 150)
+    # EA のバーが切り替わると累積値は小さくなる（新しいバーの累積値がそのまま差分）
+    aggregator.add_snapshot(T0 + pd.Timedelta(minutes=1, seconds=5), 1.0, 12)
+    aggregator.add_snapshot(T0 + pd.Timedelta(minutes=1, seconds=30), 1.0, 20)
+
+    m1 = aggregator.bars("M1")
+    assert list(m1["volume"]) == [50.0, 20.0]
+    assert aggregator.bars("M5")["volume"].iloc[-1] == 70.0
+
+
+def test_snapshot_folds_ea_high_low_into_longer_timeframes():
+    aggregator = BarAggregator(("M1", "M5", "H1"), max_bars=10)
+    # EA は M5 チャート。高値・安値は EA の形成中の M5 バーのもの
+    aggregator.add_snapshot(T0 + pd.Timedelta(minutes=2), 1.10, 5, high=1.13, low=1.08, period="M5")
+    aggregator.add_snapshot(T0 + pd.Timedelta(minutes=3), 1.11, 9, high=1.14, low=1.08, period="M5")
+
+    m5 = aggregator.bars("M5").iloc[-1]
+    h1 = aggregator.bars("H1").iloc[-1]
+    m1 = aggregator.bars("M1").iloc[-1]
+    assert (m5["open"], m5["high"], m5["low"], m5["close"]) == (1.10, 1.14, 1.08, 1.11)
+    assert (h1["high"], h1["low"]) == (1.14, 1.08)
+    # M1 には EA の M5 バーの範囲が収まらないので終値だけ
+    assert (m1["high"], m1["low"]) == (1.11, 1.11)
+
+    # period が無い（分からない）ときは終値だけ
+    plain = BarAggregator(("M5",), max_bars=10)
+    plain.add_snapshot(T0, 1.10, 5, high=1.13, low=1.08)
+    assert plain.bars("M5")["high"].iloc[-1] == 1.10
+
+
+def test_manager_takes_period_from_tick(api, tmp_path):
+    manager = api.SymbolDataManager(tmp_path, "EURUSD")
+    tick = {"datetime": "2024-07-02 10:00:30", "period": "M1", "open": 1.1, "high": 1.12, "low": 1.09,
+            "close": 1.11, "volume": 3}
+    assert manager.add_data(tick)
+    assert manager.ea_period == "M1" and "period" not in manager.data_buffer[-1]
+    bar = manager.bars.bars("M5").iloc[-1]
+    assert (bar["high"], bar["low"], bar["close"]) == (1.12, 1.09, 1.11)
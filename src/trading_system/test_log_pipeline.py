@@ -0,0 +1,63 @@
+# rate_key 付きログの間引きと省略件数、満杯のキューで捨てた件数、ティックの集計行
+import logging
+import queue
+
+import log_pipeline
+from log_pipeline import DroppingQueueHandler, RateLimitFilter, TickLogSummary
+
+
+def make_record(msg, rate_key=None):
+    record = logging.LogRecord('test', logging.DEBUG, __file__, 1, msg, None, None)
+    if rate_key is not None:
+        record.rate_key = rate_key
+    return record
+
+
+def test_rate_limit_counts_suppressed(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(log_pipeline.time, 'monotonic', lambda: clock[0])
+    rate_filter = RateLimitFilter(interval=60.0, burst=2)
+
+    passed = [rate_filter.filter(make_record('state', ('EURUSD', 'open'))) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    # 別のキー・rate_key の無いログは間引かない
+    assert rate_filter.filter(make_record('state', ('USDJPY', 'open')))
+    assert all(rate_filter.filter(make_record('plain')) for _ in range(5))
+
+    # 窓の途中はまだ省略
+    clock[0] += 59.9
+    assert not rate_filter.filter(make_record('state', ('EURUSD', 'open')))
+
+    # 次の窓の最初の行に省略件数を付ける
+    clock[0] += 0.1
+    record = make_record('state', ('EURUSD', 'open'))
+    assert rate_filter.filter(record)
+    assert record.getMessage() == 'state (+4 similar messages suppressed)'
+    record = make_record('state', ('EURUSD', 'open'))
+    assert rate_filter.filter(record) and record.getMessage() == 'state'
+    assert not rate_filter.filter(make_record('state', ('EURUSD', 'open')))
+
+
+def test_full_queue_drops_without_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.emit(make_record(f'line {i}'))
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_tick_summary_line(caplog):
+    summary = TickLogSummary(interval=3600, logger=logging.getLogger('tick-summary-test'))
+    try:
+        for i in range(3):
+            summary.record('EURUSD', 'stored', close=1.1 + i * 1e-4)
+        summary.record('EURUSD', 'closed')
+        summary.record('EURUSD', 'duplicate')
+        with caplog.at_level(logging.INFO, logger='tick-summary-test'):
+            summary.flush()
+            summary.flush()  # 集計は出力ごとにリセット
+    finally:
+        summary.stop()
+    assert [r.getMessage() for r in caplog.records] == [
+        'EURUSD: 4 ticks in last 3600s (duplicates skipped 1, market closed 1), last close 1.1002'
+    ]
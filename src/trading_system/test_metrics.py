@@ -0,0 +1,61 @@
+# Prometheus 形式の出力と、終了したスレッドの記録の合算
+import gc
+import threading
+
+from metrics import Metrics
+
+
+def test_render_histogram_counter_and_gauge():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.describe('request_seconds', 'Request latency')
+    for seconds in (0.05, 0.1, 0.5, 2.0):
+        metrics.observe('request_seconds', seconds, route='/tick')
+    metrics.inc('requests_total', route='/tick')
+    metrics.inc('requests_total', 2, route='/sig"nal')
+    metrics.register_gauge('buffer_rows', lambda: {(('symbol', 'EURUSD'),): 12})
+    metrics.register_gauge('broken', lambda: 1 / 0)
+
+    lines = metrics.render().splitlines()
+    assert lines == [
+        '# TYPE requests_total counter',
+        'requests_total{route="/sig\\"nal"} 2',
+        'requests_total{route="/tick"} 1',
+        '# HELP request_seconds Request latency',
+        '# TYPE request_seconds histogram',
+        # 境界と同じ値はその境界のバケット（le）に入る
+        'request_seconds_bucket{route="/tick",le="0.1"} 2',
+        'request_seconds_bucket{route="/tick",le="1.0"} 3',
+        'request_seconds_bucket{route="/tick",le="+Inf"} 4',
+        'request_seconds_sum{route="/tick"} 2.650000',
+        'request_seconds_count{route="/tick"} 4',
+        # 例外を出したゲージは出力しない
+        '# TYPE buffer_rows gauge',
+        'buffer_rows{symbol="EURUSD"} 12.0',
+    ]
+
+
+def test_finished_threads_are_merged():
+    metrics = Metrics(buckets=(1.0,))
+    metrics.inc('ticks_total', symbol='EURUSD')
+
+    def worker():
+        for _ in range(10):
+            metrics.inc('ticks_total', symbol='EURUSD')
+            metrics.observe('tick_seconds', 0.5)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+
+    # 終了したスレッドの領域は捨てられ、記録は合計済みの領域に残る
+    assert len(metrics._shards) == 1
+    text = metrics.render()
+    assert 'ticks_total{symbol="EURUSD"} 81' in text
+    assert 'tick_seconds_count 80' in text
+    assert 'tick_seconds_sum 40.000000' in text
+
+    # 出力しても合計は変わらない
+    assert metrics.render() == text
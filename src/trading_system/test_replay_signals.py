@@ -0,0 +1,34 @@
+# replay_signals が、各バーまでの直近 window 本で generate_signal を呼んだ結果と一致するか
+import numpy as np
+
+from conftest import make_bars
+
+WINDOW = 200
+
+
+def test_replay_matches_generate_signal_loop(trained_system):
+    bars = make_bars(330, seed=1)
+    replayed = trained_system.replay_signals(bars, window=WINDOW)
+    assert replayed.index.equals(bars.index)
+
+    close = bars["close"].values
+    online = []
+    for t in range(len(bars)):
+        window_df = bars.iloc[max(0, t - WINDOW + 1):t + 1]
+        online.append(trained_system.generate_signal(window_df, close[t]))
+    signals, confidence, predicted = zip(*online)
+    predicted = np.array([np.nan if p is None else p for p in predicted])
+
+    # 特徴量が揃わない先頭のバーは予測しない
+    np.testing.assert_array_equal(np.isnan(replayed["predicted_price"].values), np.isnan(predicted))
+    assert (~np.isnan(predicted)).sum() > 200
+    np.testing.assert_allclose(replayed["predicted_price"].values, predicted, rtol=0, atol=1e-9, equal_nan=True)
+    # オンラインの信頼度は特徴量（float32）の終値で計算するので、その丸め誤差の分だけ許容
+    np.testing.assert_allclose(replayed["confidence"].values, confidence, rtol=0, atol=1e-6)
+    assert list(replayed["signal"]) == list(signals)
+
+
+def test_replay_short_history_is_hold(trained_system):
+    replayed = trained_system.replay_signals(make_bars(50), window=WINDOW)
+    assert (replayed["signal"] == "HOLD").all()
+    assert replayed["predicted_price"].isna().all()
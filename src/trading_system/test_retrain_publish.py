@@ -0,0 +1,50 @@
+# 再学習したモデルは複製で学習・ウォームアップし、遅延の上限内のときだけ入れ替えて保存する
+import os
+
+import pytest
+
+from conftest import make_bars
+
+SYMBOL = "EURUSD"
+
+
+@pytest.fixture
+def serving(server, trained_system, tmp_path):
+    """学習済みモデルを配信中（保存済み）のサーバー"""
+    server.ml_system = trained_system
+    assert server.publish_model([SYMBOL])
+    model_file = tmp_path / f"trading_model_{SYMBOL}.pkl"
+    trained_system.save_model(str(model_file))
+    server.get_symbol_manager(SYMBOL).data_buffer = make_bars(600, seed=3).to_dict("records")
+    return server, trained_system, model_file
+
+
+@pytest.mark.parametrize("mode", ["full", "incremental"])
+def test_over_budget_retrain_keeps_previous_model(api, serving, monkeypatch, mode):
+    server, previous, model_file = serving
+    saved = model_file.read_bytes()
+    forest = previous.ensemble_model.rf_model
+    monkeypatch.setattr(api, "SIGNAL_P99_BUDGET_MS", -1.0)
+
+    ok, message, report = server.retrain_model(SYMBOL, mode)
+
+    assert not ok and "previous model kept" in message
+    assert report["mode"] == mode
+    assert server.ml_system is previous and previous.ensemble_model.rf_model is forest
+    assert server.model_loaded[SYMBOL]
+    assert not server.warmup_reports[SYMBOL]["within_budget"]
+    assert model_file.read_bytes() == saved
+
+
+@pytest.mark.parametrize("mode", ["full", "incremental"])
+def test_within_budget_retrain_swaps_and_saves(api, serving, monkeypatch, mode):
+    server, previous, model_file = serving
+    mtime = os.stat(model_file).st_mtime_ns
+    monkeypatch.setattr(api, "SIGNAL_P99_BUDGET_MS", 1e9)
+
+    ok, message, report = server.retrain_model(SYMBOL, mode)
+
+    assert ok, message
+    assert server.ml_system is not previous
+    assert server.model_loaded[SYMBOL] and server.warmup_reports[SYMBOL]["within_budget"]
+    assert os.stat(model_file).st_mtime_ns != mtime
@@ -0,0 +1,58 @@
+# コンシステント・ハッシュの安定性（ノードを増減しても移動するのは約 1/N）とメトリクスの worker ラベル
+import pytest
+
+from shard_router import HashRing, _label_metrics
+
+SYMBOLS = [f"SYM{i:04d}" for i in range(2000)]
+
+
+def assignment(ring):
+    return {symbol: ring.node_for(symbol) for symbol in SYMBOLS}
+
+
+def test_ring_is_deterministic():
+    assert assignment(HashRing(range(4))) == assignment(HashRing(range(4)))
+
+
+def test_adding_node_moves_only_to_new_node():
+    before = assignment(HashRing(range(4)))
+    after = assignment(HashRing(range(5)))
+    moved = [symbol for symbol in SYMBOLS if before[symbol] != after[symbol]]
+    # 移動するのは新しいノードへの分だけで、約 1/5
+    assert all(after[symbol] == 4 for symbol in moved)
+    assert len(moved) / len(SYMBOLS) == pytest.approx(1 / 5, abs=0.08)
+
+
+def test_removing_node_moves_only_its_symbols():
+    before = assignment(HashRing(range(5)))
+    after = assignment(HashRing([0, 1, 2, 4]))
+    for symbol in SYMBOLS:
+        if before[symbol] != 3:
+            assert after[symbol] == before[symbol]
+
+
+def test_load_is_balanced():
+    counts = {}
+    for node in assignment(HashRing(range(4))).values():
+        counts[node] = counts.get(node, 0) + 1
+    assert set(counts) == {0, 1, 2, 3}
+    assert max(counts.values()) < 2 * min(counts.values())
+
+
+def test_label_metrics_adds_worker_label():
+    seen = set()
+    worker0 = _label_metrics(
+        '# TYPE requests_total counter\n'
+        'requests_total{route="/tick"} 3\n'
+        '\n'
+        '# TYPE buffer_rows gauge\n'
+        'buffer_rows 12.0\n', 0, seen)
+    worker1 = _label_metrics('# TYPE requests_total counter\nrequests_total{route="/tick"} 5\n', 1, seen)
+    assert worker0 == [
+        '# TYPE requests_total counter',
+        'requests_total{worker="0",route="/tick"} 3',
+        '# TYPE buffer_rows gauge',
+        'buffer_rows{worker="0"} 12.0',
+    ]
+    # HELP/TYPE は最初のワーカーの分だけ
+    assert worker1 == ['requests_total{worker="1",route="/tick"} 5']
@@ -0,0 +1,132 @@
+# 共有メモリのティックリング: ミラーによる連続した窓、上書きの検出、書き込み中の別プロセスからの読み込み
+import multiprocessing as mp
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from shm_ring import TickRing, TickRingReader, TickRingWriter
+
+
+@pytest.fixture
+def ring_name():
+    return f"tick_ring_test_{uuid.uuid4().hex[:12]}"
+
+
+def append_closes(ring, start, stop):
+    for i in range(start, stop):
+        ring.append(i, i, i, i, float(i), 1.0)
+
+
+def test_window_is_contiguous_across_wrap(ring_name):
+    ring = TickRing.create(ring_name, capacity=8)
+    try:
+        assert len(ring.window(5)) == 0
+        append_closes(ring, 0, 20)
+        window = ring.window(100)
+        # 最大 capacity - 1 本。リングの折り返しをまたいでもミラーで連続したビュー
+        assert len(window) == 7 and window.first == 13
+        np.testing.assert_array_equal(window.values[:, 3], np.arange(13, 20))
+        np.testing.assert_array_equal(window.times, np.arange(13, 20))
+        assert window.values.base is not None  # コピーではない
+    finally:
+        ring.close()
+
+
+def test_overwritten_window_is_detected_and_copy_rereads(ring_name):
+    ring = TickRing.create(ring_name, capacity=8)
+    try:
+        append_closes(ring, 0, 10)
+        window = ring.window(4)
+        assert window.valid()
+        append_closes(ring, 10, 11)
+        assert window.valid()  # まだ1周していない
+        append_closes(ring, 11, 16)
+        assert not window.valid()
+
+        # copy は上書きされていれば直近の同じ本数を読み直す
+        copied = window.copy()
+        assert copied.valid() and copied.ring is None
+        np.testing.assert_array_equal(copied.values[:, 3], np.arange(12, 16))
+    finally:
+        ring.close()
+
+
+def test_create_resumes_existing_ring(ring_name):
+    ring = TickRing.create(ring_name, capacity=16)
+    append_closes(ring, 0, 5)
+    ring.close(unlink=False)
+
+    resumed = TickRing.create(ring_name, capacity=16)
+    try:
+        assert resumed.count == 5 and not resumed.closed
+        np.testing.assert_array_equal(resumed.window(5).values[:, 3], np.arange(5))
+    finally:
+        resumed.close()
+
+    # 容量が違えば作り直す
+    fresh = TickRing.create(ring_name, capacity=32)
+    try:
+        assert fresh.count == 0 and fresh.capacity == 32
+    finally:
+        fresh.close()
+
+
+def test_writer_and_reader_by_symbol(ring_name):
+    writer = TickRingWriter(prefix=ring_name, capacity=64)
+    reader = TickRingReader(prefix=ring_name)
+    try:
+        t0 = pd.Timestamp("2024-07-01 12:00")
+        for i in range(3):
+            writer.append("EURUSD", {"datetime": t0 + pd.Timedelta(seconds=i), "open": 1.1, "high": 1.2,
+                                     "low": 1.0, "close": 1.1 + i, "volume": 5})
+        df = reader.dataframe("EURUSD")
+        assert list(df.columns) == ["datetime", "open", "high", "low", "close", "volume"]
+        assert list(df["close"]) == [1.1, 2.1, 3.1]
+        assert df["datetime"].iloc[-1] == t0 + pd.Timedelta(seconds=2)
+
+        # 書き込み側が作り直したら接続し直す
+        writer.close()
+        writer.append("EURUSD", {"datetime": t0, "open": 1, "high": 1, "low": 1, "close": 7, "volume": 1})
+        assert list(reader.dataframe("EURUSD")["close"]) == [7.0]
+        with pytest.raises(FileNotFoundError):
+            reader.window("USDJPY", 10)
+    finally:
+        reader.close()
+        writer.close()
+
+
+def _reader_process(name, windows, n, result):
+    ring = TickRing.attach(name, untrack=False)
+    torn = 0
+    for _ in range(windows):
+        window = ring.window(n)
+        closes = window.values[:, 3].copy()
+        if window.valid() and len(closes) > 1 and not np.all(np.diff(closes) == 1.0):
+            torn += 1
+    result.put(torn)
+    ring.close()
+
+
+def test_concurrent_readers_never_see_torn_windows(ring_name):
+    # 書き込みを続けながら別プロセスで読み、有効と判定した窓の中身が常に連続しているか
+    ring = TickRing.create(ring_name, capacity=1024)
+    try:
+        result = mp.Queue()
+        readers = [mp.Process(target=_reader_process, args=(ring_name, 3000, 500, result)) for _ in range(2)]
+        for reader in readers:
+            reader.start()
+        written = 0
+        while any(reader.is_alive() for reader in readers) and written < 2_000_000:
+            ring.append(written, written, written, written, float(written), 1.0)
+            written += 1
+        torn = sum(result.get(timeout=60) for _ in readers)
+        for reader in readers:
+            reader.join()
+
+        assert torn == 0
+        window = ring.window(100, copy=True)
+        assert len(window) == 100 and window.values[-1, 3] == written - 1
+    finally:
+        ring.close()
@@ -0,0 +1,127 @@
+# バー確定時に計算したシグナルの保存と待ち受け（ロングポーリング・SSE）、
+# バーの確定から signal_board への保存まで、予測とモデルの入れ替えの排他
+import json
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from conftest import make_bars
+from signal_board import SignalBoard
+
+SYMBOL = "EURUSD"
+
+
+def test_publish_get_and_invalidate():
+    board = SignalBoard()
+    assert board.get(SYMBOL, "tick") is None and board.version(SYMBOL, "tick") == 0
+
+    assert board.publish(SYMBOL, "tick", {"signal": "BUY"}) == 1
+    assert board.publish(SYMBOL, "tick", {"signal": "SELL"}) == 2
+    board.publish(SYMBOL, "M5", {"signal": "HOLD"})
+    board.publish("USDJPY", "tick", {"signal": "HOLD"})
+    entry = board.get(SYMBOL, "tick")
+    assert entry["signal"] == "SELL" and entry["version"] == 2 and not entry["stale"]
+
+    board.invalidate(SYMBOL)
+    assert board.get(SYMBOL, "tick") is None and board.get(SYMBOL, "M5") is None
+    assert board.get("USDJPY", "tick") is not None
+    # 無効化してもバージョンは戻さない
+    assert board.version(SYMBOL, "tick") == 2
+    assert board.publish(SYMBOL, "tick", {"signal": "BUY"}) == 3
+
+
+def test_wait_returns_new_version():
+    board = SignalBoard()
+    assert board.wait(SYMBOL, "tick", since=0, timeout=0.05) is None
+
+    board.publish(SYMBOL, "tick", {"signal": "BUY"})
+    # 手元のバージョンと違えばすぐ返す（サーバー再起動で手元の方が大きい場合も）
+    assert board.wait(SYMBOL, "tick", since=0, timeout=0)["version"] == 1
+    assert board.wait(SYMBOL, "tick", since=7, timeout=0)["version"] == 1
+    assert board.wait(SYMBOL, "tick", since=1, timeout=0.05) is None
+
+    timer = threading.Timer(0.1, board.publish, args=(SYMBOL, "tick", {"signal": "SELL"}))
+    timer.start()
+    started = time.monotonic()
+    entry = board.wait(SYMBOL, "tick", since=1, timeout=10)
+    timer.join()
+    assert entry["signal"] == "SELL" and entry["version"] == 2
+    assert time.monotonic() - started < 5
+
+
+def test_wait_skips_invalidated_entry():
+    board = SignalBoard()
+    board.publish(SYMBOL, "tick", {"signal": "BUY"})
+    board.invalidate(SYMBOL)
+    assert board.wait(SYMBOL, "tick", since=0, timeout=0.05) is None
+
+
+def test_stream_events():
+    board = SignalBoard()
+    stream = board.stream(SYMBOL, "tick", since=0, heartbeat=0.05, retry_ms=1000)
+    assert next(stream) == "retry: 1000\n\n"
+    assert next(stream) == ": keep-alive\n\n"
+
+    board.publish(SYMBOL, "tick", {"signal": "BUY", "bar_time": pd.Timestamp("2024-07-01 12:00")})
+    event = next(stream)
+    header, data = event.rstrip("\n").split("\ndata: ")
+    assert header == "id: 1\nevent: signal"
+    assert json.loads(data)["signal"] == "BUY"
+    # 同じバージョンは2回送らない
+    assert next(stream) == ": keep-alive\n\n"
+
+
+def test_signal_trigger_falls_back_to_shortest_timeframe(api):
+    assert api._signal_trigger_timeframe("M5", ("M1", "M5", "H1")) == "M5"
+    assert api._signal_trigger_timeframe("M1", ("H1", "M15", "D1")) == "M15"
+    assert api.SIGNAL_TRIGGER_TIMEFRAME in api.BAR_TIMEFRAMES
+
+
+@pytest.fixture
+def serving(server, trained_system):
+    server.ml_system = trained_system
+    assert server.publish_model([SYMBOL])
+    server.get_symbol_manager(SYMBOL).data_buffer = make_bars(300, seed=3).to_dict("records")
+    return server
+
+
+def tick(t, close):
+    return {"datetime": t.strftime("%Y-%m-%d %H:%M:%S"), "open": close, "high": close, "low": close,
+            "close": close, "volume": 1}
+
+
+def test_bar_close_publishes_signal(api, serving, monkeypatch):
+    monkeypatch.setattr(api, "SIGNAL_TRIGGER_TIMEFRAME", "M1")
+    t0 = pd.Timestamp("2024-07-02 10:00:10")
+    assert serving.add_tick_data(tick(t0, 1.1), SYMBOL)
+    assert serving.signal_board.version(SYMBOL, "tick") == 0
+
+    # 次の分のティックで M1 のバーが確定し、signal-precompute スレッドが既定の /signal を計算して保存する
+    assert serving.add_tick_data(tick(t0 + pd.Timedelta(minutes=1), 1.1001), SYMBOL)
+    entry = serving.signal_board.wait(SYMBOL, "tick", since=0, timeout=30)
+    assert entry is not None
+    assert entry["bar_time"] == "2024-07-02T10:00:00"
+    assert entry["signal"] in ("BUY", "SELL", "HOLD")
+
+    # /signal は保存済みの結果を返す
+    cached = serving.signal_for(SYMBOL)
+    assert cached["cached"] and cached["version"] == entry["version"]
+
+
+def test_prediction_waits_for_model_lock(serving):
+    finished = threading.Event()
+    results = []
+
+    def predict():
+        results.append(serving.generate_trading_signal(SYMBOL))
+        finished.set()
+
+    with serving.model_lock:
+        thread = threading.Thread(target=predict)
+        thread.start()
+        # 入れ替え中（ロック中）は予測しない
+        assert not finished.wait(0.3)
+    thread.join(30)
+    assert finished.is_set() and results[0][3] == "Success"
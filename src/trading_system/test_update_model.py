@@ -0,0 +1,61 @@
+# 追加学習（update_model）: 予測が新しいデータに寄ること、スケーラーを保つこと、木の上限とフル再学習の目安
+import copy
+
+import numpy as np
+
+from conftest import make_bars
+
+
+def test_update_changes_predictions_and_keeps_scalers(ml, trained_system):
+    system = trained_system
+    recent = make_bars(300, seed=5, start="2024-07-02")
+    before = system.replay_signals(recent)["predicted_price"].values
+    lstm_scaler = copy.deepcopy(system.lstm_scaler)
+    feature_scaler = copy.deepcopy(system.ensemble_model.feature_scaler)
+
+    report = system.update_model(recent, rf_trees=4, gb_trees=5)
+
+    after = system.replay_signals(recent)["predicted_price"].values
+    assert report["mode"] == "incremental" and not report["needs_full_retrain"]
+    assert not np.allclose(before[~np.isnan(before)], after[~np.isnan(after)])
+    # 既存の木・LSTM と入力の尺度を揃えるため、スケーラーは前回のフル学習のまま
+    np.testing.assert_array_equal(system.lstm_scaler.data_min_, lstm_scaler.data_min_)
+    np.testing.assert_array_equal(system.lstm_scaler.data_max_, lstm_scaler.data_max_)
+    np.testing.assert_array_equal(system.ensemble_model.feature_scaler.mean_, feature_scaler.mean_)
+
+
+def test_forest_drops_oldest_trees_at_cap(ml, trained_system):
+    ensemble = trained_system.ensemble_model
+    original = ensemble.rf_model.estimators_[-1]
+    X = np.random.default_rng(0).normal(size=(50, ensemble.rf_model.n_features_in_))
+    np.testing.assert_allclose(ml.SlidingForest(ensemble.rf_model).predict(X), ensemble.rf_model.predict(X),
+                               rtol=1e-12)
+
+    trained_system.update_model(make_bars(300, seed=6), rf_trees=4, max_rf_trees=12)
+    forest = ensemble.rf_model
+    assert isinstance(forest, ml.SlidingForest)
+    # 10本 + 4本 → 上限12本。最初の2本を捨て、元の森の最後の木は残る
+    assert len(forest.trees) == 12 and forest.trees[7] is original
+
+    trained_system.update_model(make_bars(300, seed=7), rf_trees=4, max_rf_trees=12)
+    assert len(forest.trees) == 12 and forest.trees[3] is original
+
+    # フル再学習で元の設定の森に戻る
+    trained_system.train_from_features(trained_system.prepare_data(make_bars(600, seed=8)), verbose=0)
+    assert isinstance(ensemble.rf_model, ml.RandomForestRegressor)
+    assert len(ensemble.rf_model.estimators_) == 10
+
+
+def test_gb_cap_requests_full_retrain(trained_system):
+    gb = trained_system.ensemble_model.gb_model
+    report = trained_system.update_model(make_bars(300, seed=9), gb_trees=5, max_gb_trees=15)
+    assert not report["needs_full_retrain"] and gb.n_estimators_ == 15
+
+    # これ以上は段を足せない
+    report = trained_system.update_model(make_bars(300, seed=10), gb_trees=5, max_gb_trees=15)
+    assert report["needs_full_retrain"] and gb.n_estimators_ == 15
+
+    # フル再学習は元の段数で学習し直す（warm_start で足した段を引き継がない）
+    trained_system.train_from_features(trained_system.prepare_data(make_bars(600, seed=11)), verbose=0)
+    gb = trained_system.ensemble_model.gb_model
+    assert gb.n_estimators_ == 10 and not gb.warm_start
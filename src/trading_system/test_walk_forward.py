@@ -0,0 +1,57 @@
+# ウォークフォワード分割（重なり・先読みが無いこと、gap）と評価指標の確認
+import numpy as np
+import pytest
+
+from walk_forward import evaluate_predictions, walk_forward_splits
+
+
+@pytest.mark.parametrize("max_train_size", [None, 800])
+@pytest.mark.parametrize("gap", [0, 1, 5])
+def test_splits_do_not_leak(max_train_size, gap):
+    splits = walk_forward_splits(3000, n_folds=5, test_size=400, min_train_size=500,
+                                 max_train_size=max_train_size, gap=gap)
+    assert len(splits) == 5
+
+    previous_test_end = None
+    for (train_start, train_end), (test_start, test_end) in splits:
+        assert 0 <= train_start < train_end <= test_start < test_end <= 3000
+        # 学習末尾とテスト先頭の間はちょうど gap 本
+        assert test_start - train_end == gap
+        if max_train_size:
+            assert train_end - train_start == max_train_size
+        else:
+            assert train_start == 0
+        # テスト区間は連続して重ならない
+        if previous_test_end is not None:
+            assert test_start == previous_test_end
+        previous_test_end = test_end
+    assert previous_test_end == 3000
+
+
+def test_splits_skip_folds_with_short_training():
+    splits = walk_forward_splits(1200, n_folds=5, test_size=200, min_train_size=500)
+    # テスト開始 200, 400 のフォールドは学習が 500 本未満
+    assert [test for _, test in splits] == [(600, 800), (800, 1000), (1000, 1200)]
+
+
+def test_evaluate_predictions(ml):
+    current = np.array([1.0, 1.0, 1.0, 1.0])
+    # BUY（+0.2%）的中, SELL（-0.2%）外れ, 変化が小さく HOLD x2
+    predicted = np.array([1.002, 0.998, 1.0005, 0.9995])
+    next_price = np.array([1.001, 1.001, 0.999, 0.999])
+    metrics = evaluate_predictions(predicted, current, next_price)
+
+    assert metrics["buy_signals"] == 1 and metrics["sell_signals"] == 1
+    assert metrics["signal_hit"] == pytest.approx(0.5)
+    assert metrics["direction_hit"] == pytest.approx(0.5)
+    error = predicted - next_price
+    assert metrics["mae"] == pytest.approx(np.abs(error).mean())
+    assert metrics["rmse"] == pytest.approx(np.sqrt((error ** 2).mean()))
+
+
+def test_evaluate_predictions_without_signals(ml):
+    current = np.full(3, 1.0)
+    metrics = evaluate_predictions(current + 1e-5, current, current + 1e-5)
+    assert metrics["buy_signals"] == metrics["sell_signals"] == 0
+    assert np.isnan(metrics["signal_hit"])
+    assert metrics["mae"] == pytest.approx(0.0)
@@ -0,0 +1,233 @@
+"""
+ウォークフォワード（時系列分割）による学習・評価パイプライン
+
+- 特徴量は全履歴で1回だけ計算してキャッシュ（joblib）し、各フォールドはその行範囲を使う
+- フォールド × 設定の組み合わせをプロセスプールで並列実行。各ワーカーのスレッド数は固定して
+  プロセス数 × スレッド数がコア数を超えないようにする
+- フォールドごとに予測誤差と、generate_signal と同じしきい値で出したシグナルの的中率を出力
+"""
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+# 特徴量の定義を変えたら上げる（キャッシュのキーに含める）
+FEATURE_VERSION = 2
+
+
+# === 分割 ===
+def walk_forward_splits(n_rows, n_folds=5, test_size=None, min_train_size=500,
+                        max_train_size=None, gap=1):
+    """
+    時系列順のフォールド [(学習の (開始, 終了)), (テストの (開始, 終了))] を返す（終了は含まない）
+
+    - テスト区間は末尾から n_folds 個の連続区間、学習はテスト開始より前だけ
+    - max_train_size を指定すると直近の一定長（ローリング）、None なら先頭から（拡大ウィンドウ）
+    - gap: 学習末尾とテスト先頭の間を空ける本数（ターゲットが次の足の終値なので既定1本）
+    """
+    test_size = test_size or n_rows // (n_folds + 1)
+    splits = []
+    for k in range(n_folds):
+        test_start = n_rows - (n_folds - k) * test_size
+        train_end = test_start - gap
+        train_start = max(0, train_end - max_train_size) if max_train_size else 0
+        if train_end - train_start < min_train_size:
+            continue
+        splits.append(((train_start, train_end), (test_start, test_start + test_size)))
+    return splits
+
+
+# === 特徴量キャッシュ ===
+def _data_key(df):
+    digest = hashlib.sha1()
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        digest.update(np.ascontiguousarray(df[col].values, dtype=np.float64).tobytes())
+    digest.update(str(FEATURE_VERSION).encode())
+    return digest.hexdigest()[:16]
+
+
+def build_feature_cache(df, cache_dir):
+    """
+    prepare_data の結果をキャッシュに保存してパスを返す（同じデータなら再計算しない）
+
+    値は numpy 配列で保存するので、ワーカーは mmap で読み込める
+    """
+    from ml_trading_system import MLTradingSystem
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"features_{_data_key(df)}.joblib")
+    if not os.path.exists(path):
+        features = MLTradingSystem().prepare_data(df.reset_index(drop=True))
+        tmp_path = path + ".tmp"
+        joblib.dump({
+            'columns': list(features.columns),
+            'index': features.index.values,
+            'values': np.ascontiguousarray(features.values),
+        }, tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def load_feature_cache(path):
+    data = joblib.load(path, mmap_mode='r')
+    return pd.DataFrame(data['values'], columns=data['columns'], index=data['index'])
+
+
+# === ワーカー ===
+def _pin_threads(threads):
+    """ワーカーのスレッド数を固定（BLAS/OpenMP と TensorFlow）"""
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except (ImportError, RuntimeError):
+        # RuntimeError: TensorFlow が既に初期化済み
+        pass
+
+
+def evaluate_predictions(predicted, current_price, next_price):
+    """予測誤差とシグナル的中率"""
+    from ml_trading_system import MLTradingSystem
+
+    signals, _ = MLTradingSystem.apply_signal_rules(predicted, current_price)
+    error = predicted - next_price
+    actual_move = np.sign(next_price - current_price)
+    predicted_move = np.sign(predicted - current_price)
+
+    buy = signals == "BUY"
+    sell = signals == "SELL"
+    traded = buy | sell
+    hits = (buy & (actual_move > 0)) | (sell & (actual_move < 0))
+    return {
+        'mae': float(np.mean(np.abs(error))),
+        'rmse': float(np.sqrt(np.mean(error ** 2))),
+        'direction_hit': float(np.mean(predicted_move == actual_move)),
+        'buy_signals': int(buy.sum()),
+        'sell_signals': int(sell.sum()),
+        'signal_hit': float(hits.sum() / traded.sum()) if traded.any() else float('nan'),
+    }
+
+
+def _run_fold(task):
+    """1フォールド × 1設定を学習・評価（ワーカー側）"""
+    from ml_trading_system import MLTradingSystem, EnsembleModel
+
+    features = load_feature_cache(task['cache_path'])
+    (train_start, train_end), (test_start, test_end) = task['train'], task['test']
+    config = task['config']
+
+    started = time.perf_counter()
+    system = MLTradingSystem()
+    system.ensemble_model = EnsembleModel(rf_params=config.get('rf_params'), gb_params=config.get('gb_params'))
+    system.train_from_features(
+        features.iloc[train_start:train_end],
+        shuffle=False,
+        epochs=config.get('epochs', 100),
+        batch_size=config.get('batch_size', 32),
+        verbose=0,
+    )
+    train_seconds = time.perf_counter() - started
+
+    # テスト区間の各行を、その行までの特徴量だけで予測（最後の行は答えが無いので除外）
+    test_rows = np.arange(test_start, min(test_end, len(features) - 1))
+    predicted = system.predict_rows(features, test_rows)
+    close = features['close'].values
+    metrics = evaluate_predictions(predicted, close[test_rows], close[test_rows + 1])
+
+    row = {'config': config['name'], 'fold': task['fold']}
+    row.update(task['labels'])
+    row.update({'train_rows': train_end - train_start, 'test_rows': len(test_rows)})
+    row.update(metrics)
+    row['train_seconds'] = round(train_seconds, 1)
+    return row
+
+
+# === パイプライン ===
+def run_walk_forward(df, configs, n_folds=5, test_size=None, max_train_size=None,
+                     workers=None, threads_per_worker=1, cache_dir=None, log=print):
+    """
+    ウォークフォワード評価を実行してフォールドごとの結果を返す
+
+    Parameters:
+    - df: open/high/low/close/volume（と任意で datetime）を持つ時系列順の DataFrame
+    - configs: [{'name': ..., 'rf_params': {...}, 'gb_params': {...}, 'epochs': 100, 'batch_size': 32}, ...]
+    - workers: 同時に走らせるフォールド数（None なら コア数 / threads_per_worker）
+    - threads_per_worker: 各ワーカーの BLAS/TensorFlow スレッド数
+    """
+    cache_dir = cache_dir or os.path.join(current_dir, "work", "feature_cache")
+    workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    started = time.perf_counter()
+    cache_path = build_feature_cache(df, cache_dir)
+    features = load_feature_cache(cache_path)
+    log(f"[WF] Features: {features.shape[0]} rows x {features.shape[1]} cols ({time.perf_counter() - started:.1f}s)")
+
+    data = df.reset_index(drop=True)
+    if 'datetime' in data:
+        times = pd.to_datetime(data['datetime']).iloc[features.index.values].astype(str).values
+    else:
+        times = features.index.values.astype(str)
+
+    splits = walk_forward_splits(len(features), n_folds, test_size, max_train_size=max_train_size)
+    tasks = []
+    for config in configs:
+        for fold, (train, test) in enumerate(splits):
+            labels = {
+                'train_start': times[train[0]], 'train_end': times[train[1] - 1],
+                'test_start': times[test[0]], 'test_end': times[min(test[1], len(times) - 1) - 1],
+            }
+            tasks.append({'cache_path': cache_path, 'config': config, 'fold': fold,
+                          'train': train, 'test': test, 'labels': labels})
+    log(f"[WF] {len(splits)} folds x {len(configs)} configs on {workers} workers x {threads_per_worker} threads")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_pin_threads,
+                             initargs=(threads_per_worker,)) as pool:
+        results = pd.DataFrame(list(pool.map(_run_fold, tasks)))
+
+    log(f"[WF] Done in {time.perf_counter() - started:.1f}s")
+    return results
+
+
+def summarize_configs(results):
+    """設定ごとのフォールド平均（シグナル的中率の高い順）"""
+    metrics = ['mae', 'rmse', 'direction_hit', 'signal_hit', 'buy_signals', 'sell_signals', 'train_seconds']
+    summary = results.groupby('config')[metrics].mean()
+    return summary.sort_values('signal_hit', ascending=False)
+
+
+if __name__ == "__main__":
+    # === 設定 ===
+    data_path = os.path.join(current_dir, "work", "EURUSD_M5.csv")
+    output_dir = os.path.join(current_dir, "work", "walk_forward")
+    configs = [
+        {'name': 'baseline'},
+        {'name': 'rf300_gb200', 'rf_params': {'n_estimators': 300}, 'gb_params': {'n_estimators': 200}},
+        {'name': 'shallow_gb', 'gb_params': {'max_depth': 2, 'learning_rate': 0.05, 'n_estimators': 300}},
+        {'name': 'lstm_short', 'epochs': 20, 'batch_size': 128},
+    ]
+
+    df = pd.read_csv(data_path, parse_dates=['datetime'])
+    results = run_walk_forward(df, configs, n_folds=5, threads_per_worker=2)
+
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    results.to_csv(os.path.join(output_dir, f"walk_forward_folds_{timestamp}.csv"), index=False)
+    summary = summarize_configs(results)
+    summary.to_csv(os.path.join(output_dir, f"walk_forward_summary_{timestamp}.csv"))
+    print(summary.to_string())
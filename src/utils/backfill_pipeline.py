@@ -0,0 +1,322 @@
+import gzip
+import hashlib
+import queue
+import random
+import threading
+import time
+from io import BytesIO, StringIO
+
+import pandas as pd
+
+from bar_gaps import find_missing_ranges, symbol_sessions
+
+# キュー終端を示す番兵
+_DONE = object()
+
+
+class StageStats:
+    """ステージごとの処理件数と処理時間（スループット集計用）"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.units = 0  # fetch/transform: バー数, upload: バイト数
+        self.busy_seconds = 0.0
+        self.errors = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def record(self, units, seconds):
+        with self._lock:
+            self.items += 1
+            self.units += units
+            self.busy_seconds += seconds
+
+    def record_skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        rate = self.items / elapsed if elapsed > 0 else 0.0
+        unit_rate = self.units / elapsed if elapsed > 0 else 0.0
+        return (f"[STATS] {self.name}: {self.items} items, {self.units} units, "
+                f"{rate:.1f} items/s, {unit_rate:.1f} units/s, busy {self.busy_seconds:.2f}s, skipped {self.skipped}, errors {self.errors}")
+
+
+class RateLimiter:
+    """トークンバケット方式のレート制限（スレッドセーフ）"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# アップロード形式ごとの拡張子と put_object の追加引数
+UPLOAD_FORMATS = {
+    'csv': ('csv', {'ContentType': 'text/csv'}),
+    'csv.gz': ('csv.gz', {'ContentType': 'text/csv', 'ContentEncoding': 'gzip'}),
+    'parquet': ('parquet', {'ContentType': 'application/vnd.apache.parquet'}),
+}
+
+
+def serialize_partition(df, upload_format='csv'):
+    """1日分のバーをアップロード形式のバイト列に変換"""
+    if upload_format == 'parquet':
+        buffer = BytesIO()
+        df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+    csv_buffer = StringIO()
+    df.to_csv(csv_buffer, index=False)
+    body = csv_buffer.getvalue().encode('utf-8')
+    if upload_format == 'csv.gz':
+        # mtime=0 で同じ内容なら同じバイト列（ハッシュ比較のため）
+        body = gzip.compress(body, mtime=0)
+    return body
+
+
+def partition_key(symbol, timeframe_str, date, upload_format='csv'):
+    extension, _ = UPLOAD_FORMATS[upload_format]
+    year = f"{date.year}"
+    month = f"{date.month:02d}"
+    day = f"{date.day:02d}"
+    return f"{symbol}/timeframe={timeframe_str}/year={year}/month={month}/day={day}/{symbol}_{timeframe_str}.{extension}"
+
+
+def sibling_keys(key, upload_format):
+    """同じ日のパーティションの、他のアップロード形式のキー"""
+    extension, _ = UPLOAD_FORMATS[upload_format]
+    base = key[:-len(extension)]
+    return [base + other for other, _ in UPLOAD_FORMATS.values() if other != extension]
+
+
+def day_partitions(symbol, timeframe_str, day_frames, upload_format='csv'):
+    """日付ごとのS3キーと本文を生成（day_frames: {date: 1日分のDataFrame}）"""
+    for date in sorted(day_frames):
+        df_day = day_frames[date]
+        if df_day.empty:
+            continue
+        yield partition_key(symbol, timeframe_str, date, upload_format), serialize_partition(df_day, upload_format)
+
+
+class BackfillPipeline:
+    """
+    欠損補完のパイプライン（MT5取得 → 変換・ローカル保存 → S3アップロード）
+
+    - fetch: 呼び出しスレッドで逐次実行（MT5 APIはスレッドセーフではない）
+    - transform: 1スレッド。ローカルのパーティションへマージ・日別オブジェクト生成
+    - upload: スレッドプール。レート制限とリトライ付き
+    ステージ間は上限付きキューで接続し、後段が詰まれば前段が待つ
+    """
+
+    def __init__(self, s3, bucket, fetch_range, store,
+                 upload_workers=8, queue_size=64, max_retries=3, retry_backoff=0.5,
+                 upload_rate=50.0, inventory=None, upload_format='csv', empty_settle_days=2, log=print):
+        self.s3 = s3
+        self.bucket = bucket
+        self.fetch_range = fetch_range
+        self.store = store
+        self.upload_workers = upload_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.rate_limiter = RateLimiter(upload_rate)
+        self.inventory = inventory
+        if upload_format not in UPLOAD_FORMATS:
+            raise ValueError(f"Unsupported upload format: {upload_format}")
+        self.upload_format = upload_format
+        # MT5 がデータ無しと返した区間は、これより古ければ休場日等として記録し次回から取得しない
+        # （直近の区間は履歴の同期待ちの可能性があるので記録しない）
+        self.empty_settle = pd.Timedelta(days=empty_settle_days)
+        self.log = log
+
+        self.transform_queue = queue.Queue(maxsize=max(1, queue_size // 8))
+        self.upload_queue = queue.Queue(maxsize=queue_size)
+
+        self.stats = {
+            'fetch': StageStats('fetch'),
+            'transform': StageStats('transform'),
+            'upload': StageStats('upload'),
+        }
+        self.uploaded_keys = []
+        self.replaced_keys = []  # 現在の形式で置き換えた他形式のキー（run の最後に削除）
+        self._uploaded_lock = threading.Lock()
+
+    # === fetch ステージ ===
+    def _fetch_series(self, symbol, timeframe_str, window_start, window_end):
+        # 補完対象期間のパーティションの時刻列だけを読む
+        df_existing = self.store.read_range(symbol, timeframe_str, window_start, window_end, columns=["time"])
+
+        # 期待バーグリッドとの差分でバー単位の欠損区間を検出（隣接する欠損は1区間にまとまる、銘柄クラスのセッション外は除く）
+        # 以前の実行でデータ無しと確定した区間（休場日など）は除く
+        sessions = symbol_sessions(symbol, window_start, window_end)
+        known_empty = self.store.empty_ranges(symbol, timeframe_str)
+        missing_ranges = find_missing_ranges(df_existing["time"].values, window_start, window_end, timeframe_str,
+                                             sessions, known_empty)
+        if not missing_ranges:
+            self.log(f"[OK] No missing bars: {symbol} {timeframe_str}")
+
+        new_frames = []
+        for range_start, range_end, n_bars in missing_ranges:
+            self.log(f"[MISSING-BARS] Missing {symbol} {timeframe_str} {range_start} - {range_end} ({n_bars} bars)")
+            t0 = time.perf_counter()
+            df_range = self.fetch_range(symbol, timeframe_str, range_start, range_end)
+            fetched = 0 if df_range is None else len(df_range)
+            self.stats['fetch'].record(fetched, time.perf_counter() - t0)
+            if df_range is None:
+                continue
+            if df_range.empty:
+                if range_end <= pd.Timestamp(window_end) - self.empty_settle:
+                    self.store.record_empty_range(symbol, timeframe_str, range_start, range_end)
+                    self.log(f"[EMPTY] Recorded no-data range: {symbol} {timeframe_str} {range_start} - {range_end}")
+                continue
+            new_frames.append(df_range)
+
+        # 台帳があれば欠損が無くても変換ステージへ渡す（前回アップロードに失敗したパーティションを再送するため）
+        df_new = pd.concat(new_frames, ignore_index=True) if new_frames else None
+        if df_new is not None or self.inventory is not None:
+            self.transform_queue.put((symbol, timeframe_str, df_new, window_start, window_end))
+
+    # === transform ステージ ===
+    def _transform_worker(self):
+        while True:
+            item = self.transform_queue.get()
+            if item is _DONE:
+                break
+            symbol, timeframe_str, df_new, window_start, window_end = item
+            new_bars = 0 if df_new is None else len(df_new)
+            t0 = time.perf_counter()
+            try:
+                # 新規バーを含む日のパーティションだけを置き換える
+                day_frames = {}
+                if df_new is not None:
+                    day_frames = self.store.merge_bars(symbol, timeframe_str, df_new)
+                    self.log(f"[LOCAL] Saved: {symbol} {timeframe_str} {len(day_frames)} partitions ({new_bars} new bars)")
+
+                # 期間内の他のローカルパーティションも台帳と照合する
+                # （アップロードに失敗した日はローカルにだけあり、欠損検出には掛からない）
+                if self.inventory is not None:
+                    for d in self.store.list_dates(symbol, timeframe_str, window_start, window_end):
+                        if d not in day_frames:
+                            df_day = self.store.read_partition(symbol, timeframe_str, d)
+                            if df_day is not None:
+                                day_frames[d] = df_day
+
+                # マージ後の1日分でアップロード
+                for key, body in day_partitions(symbol, timeframe_str, day_frames, self.upload_format):
+                    # 内容ハッシュが台帳のETagと一致すればアップロード不要
+                    md5 = hashlib.md5(body).hexdigest()
+                    if self.inventory is not None and self.inventory.matches(key, md5):
+                        self.stats['upload'].record_skip()
+                        self._replace_siblings(key)
+                        continue
+                    self.upload_queue.put((key, body, md5))
+                self.stats['transform'].record(new_bars, time.perf_counter() - t0)
+            except Exception as e:
+                self.stats['transform'].record_error()
+                self.log(f"[ERROR] Failed to merge {symbol} {timeframe_str}: {e}")
+
+    def _replace_siblings(self, key):
+        """アップロード形式を変えた場合、同じ日の旧形式のオブジェクトを削除対象にする"""
+        if self.inventory is None:
+            return
+        stale = [sibling for sibling in sibling_keys(key, self.upload_format) if sibling in self.inventory.objects]
+        if stale:
+            with self._uploaded_lock:
+                self.replaced_keys.extend(stale)
+
+    # === upload ステージ ===
+    def _put_with_retry(self, key, body):
+        _, extra_args = UPLOAD_FORMATS[self.upload_format]
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self.s3.put_object(Bucket=self.bucket, Key=key, Body=body, **extra_args)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                wait = self.retry_backoff * (2 ** attempt) * (1 + random.random())
+                self.log(f"[RETRY] Upload failed ({attempt + 1}/{self.max_retries}): {key} - {e}")
+                time.sleep(wait)
+
+    def _upload_worker(self):
+        while True:
+            item = self.upload_queue.get()
+            if item is _DONE:
+                break
+            key, body, md5 = item
+            t0 = time.perf_counter()
+            try:
+                response = self._put_with_retry(key, body)
+                self.stats['upload'].record(len(body), time.perf_counter() - t0)
+                if self.inventory is not None:
+                    self.inventory.record_put(key, response.get('ETag'), len(body), md5)
+                with self._uploaded_lock:
+                    self.uploaded_keys.append(key)
+                self._replace_siblings(key)
+                self.log(f"Uploaded: {key}")
+            except Exception as e:
+                self.stats['upload'].record_error()
+                if self.inventory is not None:
+                    # 失敗時にリモートの状態が不明なので、次回は TTL 内でも列挙し直す
+                    self.inventory.invalidate(key)
+                self.log(f"[ERROR] Failed to upload: {key} - {e}")
+
+    def run(self, series, window_start, window_end):
+        """
+        series: [(symbol, timeframe_str), ...] を補完し、ステージ別の集計を返す
+        """
+        started = time.perf_counter()
+
+        transform_thread = threading.Thread(target=self._transform_worker, name="backfill-transform", daemon=True)
+        upload_threads = [
+            threading.Thread(target=self._upload_worker, name=f"backfill-upload-{i}", daemon=True)
+            for i in range(self.upload_workers)
+        ]
+        transform_thread.start()
+        for thread in upload_threads:
+            thread.start()
+
+        try:
+            for symbol, timeframe_str in series:
+                try:
+                    self._fetch_series(symbol, timeframe_str, window_start, window_end)
+                except Exception as e:
+                    self.stats['fetch'].record_error()
+                    self.log(f"[ERROR] Failed to backfill {symbol} {timeframe_str}: {e}")
+        finally:
+            self.transform_queue.put(_DONE)
+            transform_thread.join()
+            for _ in upload_threads:
+                self.upload_queue.put(_DONE)
+            for thread in upload_threads:
+                thread.join()
+
+        if self.replaced_keys:
+            for key in self.inventory.delete_keys(self.replaced_keys):
+                self.log(f"[CLEANUP] Deleted partition replaced by {self.upload_format}: {key}")
+
+        elapsed = time.perf_counter() - started
+        for stage in self.stats.values():
+            self.log(stage.summary(elapsed))
+        return self.stats
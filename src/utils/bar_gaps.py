@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+from session_calendar import calendar_for, calendar_for_class
+
+# 時間足ごとのpandas頻度（バーの開始時刻グリッド生成用）
+TIMEFRAME_FREQ = {
+    'M1': "1min",
+    'M5': "5min",
+    'M15': "15min",
+    'M30': "30min",
+    'H1': "1h",
+    'H4': "4h",
+    'D1': "1D",
+    'W1': "W-SUN",
+    'MN': "MS",
+}
+
+
+def _to_ns(values):
+    """datetime配列をUTCナイーブのint64(ns)配列に変換"""
+    idx = pd.DatetimeIndex(values)
+    if idx.tz is not None:
+        idx = idx.tz_convert('UTC').tz_localize(None)
+    return idx.values.astype('datetime64[ns]').view('i8')
+
+
+def fx_weekly_sessions(start, end):
+    """
+    FXの週次取引セッション（日曜17:00 NY ～ 金曜17:00 NY）をUTCで列挙
+
+    Returns:
+    - (opens, closes): UTCナイーブのint64(ns)配列（昇順）
+    """
+    return calendar_for_class('fx').sessions(start, end)
+
+
+def symbol_sessions(symbol, start, end):
+    """シンボルの銘柄クラス（FX・貴金属・株価指数）の取引セッションをUTCで列挙"""
+    return calendar_for(symbol).sessions(start, end)
+
+
+def expected_bar_grid(start, end, timeframe_str, sessions=None):
+    """
+    [start, end) に完全に収まるバーのうち、取引セッションと重なるものの開始・終了時刻を返す
+
+    Parameters:
+    - start, end: 期間（UTC）
+    - timeframe_str: 'M1', 'M5', ... , 'MN'
+    - sessions: (opens, closes) のint64(ns)配列。None の場合はFXの週次セッション
+
+    Returns:
+    - (bar_starts, bar_ends): int64(ns)配列（昇順）
+    """
+    freq = TIMEFRAME_FREQ.get(timeframe_str)
+    if freq is None:
+        raise ValueError(f"Unsupported timeframe: {timeframe_str}")
+
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end)
+    if start.tzinfo is not None:
+        start = start.tz_convert('UTC').tz_localize(None)
+    if end.tzinfo is not None:
+        end = end.tz_convert('UTC').tz_localize(None)
+
+    offset = pd.tseries.frequencies.to_offset(freq)
+    if timeframe_str in ('W1', 'MN'):
+        starts = pd.date_range(start=start.normalize(), end=end, freq=freq)
+    else:
+        starts = pd.date_range(start=start.ceil(freq), end=end, freq=freq)
+    starts = starts[starts >= start]
+    if len(starts) == 0:
+        empty = np.empty(0, dtype='i8')
+        return empty, empty
+
+    ends = starts + offset
+    bar_starts = _to_ns(starts)
+    bar_ends = _to_ns(ends)
+
+    # 未確定バー（end を跨ぐバー）は対象外
+    complete = bar_ends <= _to_ns([end])[0]
+    bar_starts = bar_starts[complete]
+    bar_ends = bar_ends[complete]
+
+    if timeframe_str in ('W1', 'MN'):
+        return bar_starts, bar_ends
+
+    if sessions is None:
+        sessions = fx_weekly_sessions(start, end)
+    opens, closes = sessions
+
+    # バー区間 [s, e) と重なるセッションがあるか（closes > s となる最初のセッションで判定）
+    pos = np.searchsorted(closes, bar_starts, side='right')
+    in_range = pos < len(closes)
+    overlaps = np.zeros(len(bar_starts), dtype=bool)
+    overlaps[in_range] = opens[pos[in_range]] < bar_ends[in_range]
+
+    return bar_starts[overlaps], bar_ends[overlaps]
+
+
+def find_missing_ranges(existing_times, start, end, timeframe_str, sessions=None, known_empty=None):
+    """
+    期待バーグリッドと既存タイムスタンプの差分から欠損区間を求める
+
+    Parameters:
+    - existing_times: 既存バーの時刻（UTC、順不同・重複可）
+    - start, end, timeframe_str, sessions: expected_bar_grid と同じ
+    - known_empty: データが無いと分かっている区間 [(start, end), ...]（休場日など）。
+      この中に完全に収まるバーは欠損として扱わない
+
+    Returns:
+    - [(range_start, range_end, missing_bars), ...]
+      range_end は排他的。グリッド上で連続する欠損バーは1区間にまとめる
+      （週末などセッション外の時間を挟んでも連続とみなす）
+    """
+    bar_starts, bar_ends = expected_bar_grid(start, end, timeframe_str, sessions)
+    if len(bar_starts) == 0:
+        return []
+
+    existing = _to_ns(existing_times) if len(existing_times) else np.empty(0, dtype='i8')
+    if len(existing) > 1 and not np.all(existing[1:] >= existing[:-1]):
+        existing = np.sort(existing)
+
+    # ソート済み配列同士の照合（重複は searchsorted の結果に影響しない）
+    pos = np.searchsorted(existing, bar_starts)
+    present = np.zeros(len(bar_starts), dtype=bool)
+    hit = pos < len(existing)
+    present[hit] = existing[pos[hit]] == bar_starts[hit]
+    for empty_start, empty_end in known_empty or ():
+        empty_start, empty_end = _to_ns([empty_start, empty_end])
+        present |= (bar_starts >= empty_start) & (bar_ends <= empty_end)
+
+    missing_idx = np.flatnonzero(~present)
+    if len(missing_idx) == 0:
+        return []
+
+    # グリッド上の連続区間にまとめる
+    breaks = np.flatnonzero(np.diff(missing_idx) != 1)
+    run_first = missing_idx[np.concatenate(([0], breaks + 1))]
+    run_last = missing_idx[np.concatenate((breaks, [len(missing_idx) - 1]))]
+
+    range_starts = pd.to_datetime(bar_starts[run_first])
+    range_ends = pd.to_datetime(bar_ends[run_last])
+    counts = run_last - run_first + 1
+
+    return [
+        (range_starts[i], range_ends[i], int(counts[i]))
+        for i in range(len(run_first))
+    ]
+
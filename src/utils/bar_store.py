@@ -0,0 +1,257 @@
+import json
+import os
+from datetime import date as date_cls
+
+import pandas as pd
+
+# Parquet（列指向）が使えればParquet、なければCSVで保存
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+FILE_FORMATS = ('parquet', 'csv')
+# ストアのファイル形式（ストアのルート直下。最初の書き込み時に作成）
+FORMAT_FILE = "_format.json"
+# MT5 がデータ無しと返した区間の記録（系列ディレクトリ直下）
+EMPTY_RANGES_FILE = "_empty_ranges.json"
+# 従来の単一CSVからの移行が最後まで終わった印（系列ディレクトリ直下）
+IMPORT_DONE_FILE = "_import_complete.json"
+
+
+class BarStore:
+    """
+    シンボル/時間足/年/月/日で分割したローカルのバーストア（S3と同じレイアウト）
+
+    base_dir/EURUSD/timeframe=M5/year=2025/month=06/day=13/EURUSD_M5.parquet
+
+    - 読み込みは指定期間に掛かるパーティションだけを開く
+    - 書き込みはパーティション単位で一時ファイル → os.replace による置き換え
+    - ファイル形式はストアのルートの _format.json に記録し、以降の実行でも同じ形式を使う
+      （pyarrow の有無で形式が変わらない）。読み込みはどちらの形式のパーティションも読む
+    """
+
+    def __init__(self, base_dir, file_format=None):
+        """
+        Parameters:
+        - file_format: 'parquet' / 'csv'。None の場合は記録済みの形式、未記録なら pyarrow があれば parquet
+          （記録と異なる形式を指定すると、以降の書き込みはその形式になり記録も更新する）
+        """
+        self.base_dir = base_dir
+        recorded = self._read_format()
+        if file_format is None:
+            file_format = recorded or ('parquet' if PARQUET_AVAILABLE else 'csv')
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"Unsupported file format: {file_format}")
+        if file_format == 'parquet' and not PARQUET_AVAILABLE:
+            raise ImportError(f"pyarrow is required for the parquet bar store: {base_dir}")
+        self.file_format = file_format
+        self._format_recorded = recorded == file_format
+
+    def _read_format(self):
+        path = os.path.join(self.base_dir, FORMAT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('format')
+
+    def _record_format(self):
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = os.path.join(self.base_dir, FORMAT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': self.file_format}, f)
+        os.replace(tmp_path, path)
+        self._format_recorded = True
+
+    # === パス ===
+    def series_dir(self, symbol, timeframe_str):
+        return os.path.join(self.base_dir, symbol, f"timeframe={timeframe_str}")
+
+    def partition_path(self, symbol, timeframe_str, date, file_format=None):
+        return os.path.join(
+            self.series_dir(symbol, timeframe_str),
+            f"year={date.year}", f"month={date.month:02d}", f"day={date.day:02d}",
+            f"{symbol}_{timeframe_str}.{file_format or self.file_format}"
+        )
+
+    def _existing_partition(self, symbol, timeframe_str, date):
+        """存在するパーティションの (パス, 形式)。現在の形式を優先し、無ければ他の形式（無ければ None）"""
+        for file_format in (self.file_format,) + tuple(f for f in FILE_FORMATS if f != self.file_format):
+            path = self.partition_path(symbol, timeframe_str, date, file_format)
+            if os.path.exists(path):
+                return path, file_format
+        return None
+
+    @staticmethod
+    def _list_values(path, name):
+        """'name=値' 形式のサブディレクトリの値を整数で列挙"""
+        if not os.path.isdir(path):
+            return []
+        values = []
+        for entry in os.listdir(path):
+            if entry.startswith(name + "="):
+                try:
+                    values.append(int(entry.split("=", 1)[1]))
+                except ValueError:
+                    pass
+        return sorted(values)
+
+    def list_dates(self, symbol, timeframe_str, start=None, end=None):
+        """期間 [start, end] に掛かるパーティションの日付一覧（年・月で枝刈り）"""
+        start_date = pd.Timestamp(start).date() if start is not None else date_cls.min
+        end_date = pd.Timestamp(end).date() if end is not None else date_cls.max
+
+        dates = []
+        root = self.series_dir(symbol, timeframe_str)
+        for year in self._list_values(root, "year"):
+            if year < start_date.year or year > end_date.year:
+                continue
+            year_dir = os.path.join(root, f"year={year}")
+            for month in self._list_values(year_dir, "month"):
+                if (year, month) < (start_date.year, start_date.month) or (year, month) > (end_date.year, end_date.month):
+                    continue
+                month_dir = os.path.join(year_dir, f"month={month:02d}")
+                for day in self._list_values(month_dir, "day"):
+                    d = date_cls(year, month, day)
+                    if start_date <= d <= end_date and self._existing_partition(symbol, timeframe_str, d):
+                        dates.append(d)
+        return dates
+
+    def has_series(self, symbol, timeframe_str):
+        return os.path.isdir(self.series_dir(symbol, timeframe_str))
+
+    # === データ無しの区間 ===
+    def empty_ranges(self, symbol, timeframe_str):
+        """MT5 がデータ無しと返した区間 [(start, end), ...]（休場日・ブローカー側の欠落）"""
+        path = os.path.join(self.series_dir(symbol, timeframe_str), EMPTY_RANGES_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in json.load(f)]
+
+    def record_empty_range(self, symbol, timeframe_str, start, end):
+        """データ無しの区間を追記（重なる・接する区間は1つにまとめる）"""
+        ranges = sorted(self.empty_ranges(symbol, timeframe_str) + [(pd.Timestamp(start), pd.Timestamp(end))])
+        merged = [list(ranges[0])]
+        for range_start, range_end in ranges[1:]:
+            if range_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], range_end)
+            else:
+                merged.append([range_start, range_end])
+
+        path = os.path.join(self.series_dir(symbol, timeframe_str), EMPTY_RANGES_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([[s.isoformat(), e.isoformat()] for s, e in merged], f)
+        os.replace(tmp_path, path)
+
+    # === 読み込み ===
+    def read_partition(self, symbol, timeframe_str, date, columns=None):
+        existing = self._existing_partition(symbol, timeframe_str, date)
+        if existing is None:
+            return None
+        path, file_format = existing
+        if file_format == 'parquet':
+            return pd.read_parquet(path, columns=columns)
+        df = pd.read_csv(path, usecols=columns, parse_dates=["time"] if columns is None or "time" in columns else None)
+        return df
+
+    def read_range(self, symbol, timeframe_str, start=None, end=None, columns=None):
+        """
+        期間 [start, end) のバーを時刻順で返す（該当パーティションのみ読み込み）
+
+        Parameters:
+        - start, end: None の場合は全期間
+        - columns: 読み込む列（'time' は常に含める）
+        """
+        if columns is not None and "time" not in columns:
+            columns = ["time"] + list(columns)
+
+        frames = []
+        for d in self.list_dates(symbol, timeframe_str, start, end):
+            df = self.read_partition(symbol, timeframe_str, d, columns)
+            if df is not None and not df.empty:
+                frames.append(df)
+
+        if not frames:
+            return pd.DataFrame(columns=columns if columns is not None else ["time"]).astype({"time": "datetime64[ns]"})
+
+        df = pd.concat(frames, ignore_index=True)
+        if start is not None:
+            df = df[df["time"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["time"] < pd.Timestamp(end)]
+        return df.reset_index(drop=True)
+
+    # === 書き込み ===
+    def write_partition(self, symbol, timeframe_str, date, df):
+        """1日分のパーティションを原子的に置き換える（他の形式の同じ日のファイルは削除）"""
+        if not self._format_recorded:
+            self._record_format()
+        path = self.partition_path(symbol, timeframe_str, date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        if self.file_format == 'parquet':
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_csv(tmp_path, index=False, encoding="utf-8")
+        os.replace(tmp_path, path)
+        for file_format in FILE_FORMATS:
+            other = self.partition_path(symbol, timeframe_str, date, file_format)
+            if file_format != self.file_format and os.path.exists(other):
+                os.remove(other)
+
+    def merge_bars(self, symbol, timeframe_str, df_new):
+        """
+        新規バーを日別パーティションへマージして書き込む（既存バーを優先）
+
+        Returns:
+        - {date: マージ後の1日分のDataFrame}（書き込んだパーティションのみ）
+        """
+        df_new = df_new.sort_values("time", kind="mergesort")
+        day_keys = df_new["time"].dt.date
+        merged = {}
+        for d, df_day_new in df_new.groupby(day_keys, sort=True):
+            df_existing = self.read_partition(symbol, timeframe_str, d)
+            if df_existing is not None and not df_existing.empty:
+                df_day = pd.concat([df_existing, df_day_new], ignore_index=True)
+                df_day.sort_values("time", kind="mergesort", inplace=True)
+                df_day.drop_duplicates(subset=["time"], keep="first", inplace=True)
+            else:
+                df_day = df_day_new.drop_duplicates(subset=["time"], keep="first")
+            df_day = df_day.reset_index(drop=True)
+            self.write_partition(symbol, timeframe_str, d, df_day)
+            merged[d] = df_day
+        return merged
+
+    def import_csv(self, csv_path, symbol, timeframe_str):
+        """
+        従来の単一CSV（<symbol>_<tf>.csv）をパーティションへ移行
+
+        全パーティションの書き込み後に完了の印を残す。途中で中断した場合は再実行すれば続きから移行される
+        （既存バーを優先してマージするので、移行済みの日や移行後に取得したバーはそのまま）
+        """
+        df = pd.read_csv(csv_path, parse_dates=["time"], encoding="utf-8-sig")
+        df["time"] = df["time"].dt.tz_localize(None)
+        df = df[~df[["open", "high", "low", "close"]].isnull().all(axis=1)]
+        merged = self.merge_bars(symbol, timeframe_str, df)
+
+        path = os.path.join(self.series_dir(symbol, timeframe_str), IMPORT_DONE_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': os.path.basename(csv_path),
+                'bars': len(df),
+                'first': df["time"].min().isoformat() if len(df) else None,
+                'last': df["time"].max().isoformat() if len(df) else None,
+            }, f)
+        os.replace(tmp_path, path)
+        return merged
+
+    def import_complete(self, symbol, timeframe_str):
+        """import_csv による移行が最後まで終わっているか"""
+        return os.path.exists(os.path.join(self.series_dir(symbol, timeframe_str), IMPORT_DONE_FILE))
@@ -14,11 +14,18 @@ from datetime import datetime, timedelta
 import pytz
 import os
 import re
+from backfill_pipeline import BackfillPipeline
+from bar_store import BarStore
+from s3_inventory import S3Inventory, month_prefixes
 
 # === 設定 ===
 bucket = 'mt5-cld'
 session = boto3.Session()
-s3 = session.client('s3')
+# S3互換のローカルサーバー（MinIO等）で動かす場合は S3_ENDPOINT_URL を指定
+s3 = session.client('s3', endpoint_url=os.environ.get('S3_ENDPOINT_URL'))
+upload_workers = 8
+upload_rate = 50.0  # put_object の上限 (req/s)
+upload_format = 'csv'  # 'csv' / 'csv.gz' / 'parquet'（parquetはpyarrowが必要）
 symbols = ['EURUSD']
 timeframes = {
     'M5': mt5.TIMEFRAME_M5,
@@ -28,156 +35,92 @@ timeframes = {
     #'W1': mt5.TIMEFRAME_W1,
     #'MN': mt5.TIMEFRAME_MN1
 }
-# pandas用の頻度マップ
-freq_map = {
-    'M5': "5min",
-    #'M15': "15min",
-    #'H1': "1h",
-    #'D1': "1d",
-    #'W1': "W",
-    #'MN': "ME"
-}
 
 # === 日付リスト ===
 today_utc = datetime.now(pytz.utc).date()
 dates_utc = [(today_utc - timedelta(days=i)) for i in range(90)]
-
-# === S3上のCSVファイル一覧を取得 ===
-def list_all_s3_keys():
-    keys = set()
-    continuation_token = None
-    while True:
-        kwargs = {'Bucket': bucket, 'Prefix': ''}
-        if continuation_token:
-            kwargs['ContinuationToken'] = continuation_token
-        response = s3.list_objects_v2(**kwargs)
-        for obj in response.get('Contents', []):
-            keys.add(obj['Key'])
-        if response.get('IsTruncated'):
-            continuation_token = response['NextContinuationToken']
-        else:
-            break
-    return keys
+window_start = datetime(dates_utc[-1].year, dates_utc[-1].month, dates_utc[-1].day)
+window_end = datetime.now(pytz.utc).replace(tzinfo=None)
 
 # === MT5初期化 ===
 if not mt5.initialize():
     raise RuntimeError("MT5 initialization failed")
 
-# === 欠損日付のデータを取得してアップロード ===
-def fetch_and_upload(symbol, timeframe_str, date):
+# === ローカル保存先 ===
+base_dir = "C:/MT5_portable/MQL5/src/data"
+# symbol/timeframe=/year=/month=/day= で分割したバーストア（S3と同じレイアウト）
+store_dir = os.path.join(base_dir, "bars")
+columns = ["symbol", "time", "open", "high", "low", "close", "tick_volume", "spread", "real_volume"]
+
+# === 欠損区間のデータをMT5から一括取得 ===
+def fetch_range(symbol, timeframe_str, range_start, range_end):
+    """取得失敗は None、MT5 にデータが無ければ空の DataFrame（休場日等として記録される）"""
     timeframe = timeframes[timeframe_str]
-    tz = pytz.utc
-    start = datetime(date.year, date.month, date.day, tzinfo=tz)
-    end = start + timedelta(days=1)
+    start = pytz.utc.localize(range_start.to_pydatetime())
+    end = pytz.utc.localize(range_end.to_pydatetime())
 
     rates = mt5.copy_rates_range(symbol, timeframe, start, end)
     if rates is None:
-        log(f"[ERROR] Failed to fetch MT5 data: {symbol} {timeframe_str} {date} (rates is None)")
-        return
+        log(f"[ERROR] Failed to fetch MT5 data: {symbol} {timeframe_str} {range_start} - {range_end} (rates is None)")
+        return None
     elif len(rates) == 0:
-        log(f"[INFO] No market data in MT5 for: {symbol} {timeframe_str} {date} (empty)")
-        return
+        log(f"[INFO] No market data in MT5 for: {symbol} {timeframe_str} {range_start} - {range_end} (empty)")
+        return pd.DataFrame(columns=columns)
 
     df = pd.DataFrame(rates)
     df['symbol'] = symbol
     df['time'] = pd.to_datetime(df['time'], unit='s')
 
+    # copy_rates_range は終端を含むため、区間外（未確定バーを含む）を除外
+    df = df[(df['time'] >= range_start) & (df['time'] < range_end)]
+
     # ここですぐに NaN 行を除外
     df = df[~df[["open", "high", "low", "close"]].isnull().all(axis=1)]
 
-    #  有効データが1件もなければ return（これが重要）
+    #  有効データが1件もなければ空
     if df.empty:
-        log(f"[INFO] No valid OHLC data for {symbol} {timeframe_str} {date}")
-        return
-
-    year = f"{date.year}"
-    month = f"{date.month:02d}"
-    day = f"{date.day:02d}"
-    key = f"{symbol}/timeframe={timeframe_str}/year={year}/month={month}/day={day}/{symbol}_{timeframe_str}.csv"
-
-    csv_buffer = StringIO()
-    df = df[["symbol", "time", "open", "high", "low", "close", "tick_volume", "spread", "real_volume"]]
-    df.to_csv(csv_buffer, index=False, encoding='utf-8-sig')
-
-    # === ローカル保存処理（階層化・日付分割なし） ===
-    local_filename = f"{symbol}_{timeframe_str}.csv"
-    base_dir = "C:/MT5_portable/MQL5/src/data"
-    local_path = os.path.join(base_dir, local_filename)
-
-    if not os.path.exists(base_dir):
-        raise FileNotFoundError(f"Directory does not exist: {base_dir}")
-
-    if os.path.exists(local_path):
-        df_existing = pd.read_csv(local_path, parse_dates=["time"])
-        df_existing["time"] = df_existing["time"].dt.tz_localize(None)
-        df["time"] = df["time"].dt.tz_localize(None)
-        df = pd.concat([df_existing, df], ignore_index=True)
-        df.drop_duplicates(subset=["time"], inplace=True)
-        df.sort_values("time", inplace=True)
-
-    # open, high, low, close が全て NaN の行を除外
-    df = df[~df[["open", "high", "low", "close"]].isnull().all(axis=1)]
-    df.to_csv(local_path, index=False, encoding="utf-8-sig")
-    log(f"[LOCAL] Saved: {local_path}")
-
-    # === 欠損補完処理 ===
-    freq = freq_map.get(timeframe_str)
-    if freq is None:
-        raise ValueError(f"Unsupported timeframe: {timeframe_str}")
-
-    if freq == "M":
-        start_time = df["time"].min().replace(day=1)
-        end_time = (df["time"].max().replace(day=1) + pd.DateOffset(months=1))
-    elif freq == "W":
-        start_time = df["time"].min() - timedelta(days=df["time"].min().weekday())
-        end_time = df["time"].max() + timedelta(days=6 - df["time"].max().weekday())
-    else:
-        start_time = df["time"].min().floor(freq)
-        end_time = df["time"].max().ceil(freq)
-
-    df.to_csv(local_path, index=False, encoding="utf-8-sig")
-    print(f"[LOCAL] Saved: {local_path}")
-
-    # === S3アップロード ===
-    s3.put_object(Bucket=bucket, Key=key, Body=csv_buffer.getvalue())
-    log(f"Uploaded: {key}")
+        log(f"[INFO] No valid OHLC data for {symbol} {timeframe_str} {range_start} - {range_end}")
+        return df[columns]
+
+    log(f"[FETCH] {symbol} {timeframe_str} {range_start} - {range_end}: {len(df)} bars")
+    return df[columns]
 
 # === 実行 ===
-existing_keys = list_all_s3_keys()
+if not os.path.exists(base_dir):
+    raise FileNotFoundError(f"Directory does not exist: {base_dir}")
+
+# バケット全体ではなく、補完対象期間の月次プレフィックスだけを台帳に同期
+# （同期から6時間以内のプレフィックスは列挙し直さないので、その間の外部での変更は反映されない。
+#   以下の cleanup も同期した期間のプレフィックス配下だけが対象）
+inventory = S3Inventory(s3, bucket, os.path.join(base_dir, f"s3_inventory_{bucket}.json"), log=log)
+window_prefixes = month_prefixes(symbols, timeframes, window_start, window_end)
+inventory.sync(window_prefixes)
 log("S3 key list loaded")
 
-valid_key_re = re.compile(r"^[A-Z]{6}/timeframe=[A-Z0-9]+/year=\d{4}/month=\d{2}/day=\d{2}/[A-Z]{6}_[A-Z0-9]+\.csv$")
-for key in existing_keys.copy():
-    if not valid_key_re.match(key):
-        try:
-            s3.delete_object(Bucket=bucket, Key=key)
-            log(f"[CLEANUP] Deleted unexpected key: {key}")
-            existing_keys.remove(key)
-        except Exception as e:
-            log(f"[ERROR] Failed to delete key: {key} - {e}")
+valid_key_re = re.compile(r"^[A-Z]{6}/timeframe=[A-Z0-9]+/year=\d{4}/month=\d{2}/day=\d{2}/[A-Z]{6}_[A-Z0-9]+\.(csv|csv\.gz|parquet)$")
+inventory.cleanup(valid_key_re, window_prefixes)
 
+# 従来の単一CSVがある系列はパーティションへ移行（完了の印が無ければ、中断した移行も続きから）
+store = BarStore(store_dir)
 for symbol in symbols:
-    for tf_str, tf in timeframes.items():
-        local_filename = f"{symbol}_{tf_str}.csv"
-        base_dir = "C:/MT5_portable/MQL5/src/data"
-        local_path = os.path.join(base_dir, local_filename)
-
-        if os.path.exists(local_path):
-            try:
-                df_existing = pd.read_csv(local_path, parse_dates=["time"])
-                df_existing["time"] = df_existing["time"].dt.tz_localize(None)
-                for date in dates_utc:
-                    date_start = datetime(date.year, date.month, date.day)
-                    date_end = date_start + timedelta(days=1)
-                    mask = (df_existing["time"] >= date_start) & (df_existing["time"] < date_end)
-                    if not mask.any():
-                        log(f"[MISSING-DATE] Missing {symbol} {tf_str} on {date}")
-                        fetch_and_upload(symbol, tf_str, date)
-            except Exception as e:
-                log(f"[ERROR] Failed to read existing CSV for {symbol} {tf_str}: {e}")
-        else:
-            for date in dates_utc:
-                fetch_and_upload(symbol, tf_str, date)
+    for tf_str in timeframes:
+        legacy_path = os.path.join(base_dir, f"{symbol}_{tf_str}.csv")
+        if os.path.exists(legacy_path) and not store.import_complete(symbol, tf_str):
+            if store.has_series(symbol, tf_str):
+                log(f"[LOCAL] Resuming incomplete migration of {legacy_path}")
+            migrated = store.import_csv(legacy_path, symbol, tf_str)
+            log(f"[LOCAL] Migrated {legacy_path} into {len(migrated)} partitions")
+
+# MT5取得 → マージ・ローカル保存 → S3アップロード をパイプラインで並行実行
+pipeline = BackfillPipeline(
+    s3, bucket, fetch_range, store,
+    upload_workers=upload_workers, upload_rate=upload_rate,
+    inventory=inventory, upload_format=upload_format, log=log
+)
+series = [(symbol, tf_str) for symbol in symbols for tf_str in timeframes]
+pipeline.run(series, window_start, window_end)
+inventory.save()
+log(f"[INVENTORY] {len(inventory.objects)} keys tracked, {inventory.request_count} list/delete requests")
 
 mt5.shutdown()
 log("All missing files fetched and uploaded.")
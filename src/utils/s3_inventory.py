@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+# delete_objects 1回あたりの上限
+DELETE_BATCH_SIZE = 1000
+
+
+def month_prefix(symbol, timeframe_str, year, month):
+    """symbol/timeframe=/year=/month= 単位のS3プレフィックス"""
+    return f"{symbol}/timeframe={timeframe_str}/year={year}/month={month:02d}/"
+
+
+def month_prefixes(symbols, timeframes, start, end):
+    """期間 [start, end] に掛かる月次プレフィックスを列挙"""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append((year, month))
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return [
+        month_prefix(symbol, timeframe_str, year, month)
+        for symbol in symbols
+        for timeframe_str in timeframes
+        for year, month in months
+    ]
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class S3Inventory:
+    """
+    S3キーとETagのローカル台帳（マニフェスト）
+
+    バケット全体を毎回列挙せず、必要な月次プレフィックスだけを list_objects_v2 で同期する。
+    自分でアップロード・削除したキーは台帳に直接反映するので再列挙は不要。
+
+    - 同期から ttl_seconds（既定6時間）以内のプレフィックスは再列挙しないため、
+      その間に他のプロセスや手作業で変更・削除されたオブジェクトは台帳に反映されない
+      （必要なら sync(force=True) で取り直す）
+    - cleanup・keys が扱うのは同期済みプレフィックス配下のキーだけ（バケット全体ではない）
+    - 書き込みに失敗したキーは invalidate でプレフィックスの同期時刻を消し、次回の sync で列挙し直す
+    """
+
+    def __init__(self, s3, bucket, manifest_path, ttl_seconds=6 * 3600, log=print):
+        self.s3 = s3
+        self.bucket = bucket
+        self.manifest_path = manifest_path
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.log = log
+
+        self.objects = {}   # key -> {'etag', 'size', 'last_modified', 'md5'(任意)}
+        self.prefixes = {}  # prefix -> 最終同期時刻 (ISO)
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.objects = data.get('objects', {})
+            self.prefixes = data.get('prefixes', {})
+        except Exception as e:
+            self.log(f"[WARN] Failed to load S3 inventory, starting empty: {e}")
+            self.objects = {}
+            self.prefixes = {}
+
+    def save(self):
+        with self._lock:
+            data = {'bucket': self.bucket, 'objects': self.objects, 'prefixes': self.prefixes}
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.manifest_path)
+
+    def is_fresh(self, prefix):
+        synced_at = self.prefixes.get(prefix)
+        if synced_at is None:
+            return False
+        return _utcnow() - datetime.fromisoformat(synced_at) < self.ttl
+
+    def invalidate(self, key):
+        """key を含む月次プレフィックスを未同期に戻す（次回の sync で TTL に関係なく列挙し直す）"""
+        with self._lock:
+            for prefix in [p for p in self.prefixes if key.startswith(p)]:
+                del self.prefixes[prefix]
+
+    def sync_prefix(self, prefix):
+        """プレフィックス配下を列挙し、台帳の該当部分を置き換える"""
+        listed = {}
+        continuation_token = None
+        while True:
+            kwargs = {'Bucket': self.bucket, 'Prefix': prefix}
+            if continuation_token:
+                kwargs['ContinuationToken'] = continuation_token
+            response = self.s3.list_objects_v2(**kwargs)
+            self.request_count += 1
+            for obj in response.get('Contents', []):
+                listed[obj['Key']] = {
+                    'etag': obj.get('ETag', '').strip('"'),
+                    'size': obj.get('Size', 0),
+                    'last_modified': obj['LastModified'].isoformat() if 'LastModified' in obj else None,
+                }
+            if response.get('IsTruncated'):
+                continuation_token = response['NextContinuationToken']
+            else:
+                break
+
+        with self._lock:
+            for key in [k for k in self.objects if k.startswith(prefix)]:
+                if key not in listed:
+                    del self.objects[key]
+                elif self.objects[key].get('md5') and self.objects[key]['etag'] == listed[key]['etag']:
+                    # ETagが変わっていなければ自分でアップロードした時の内容ハッシュを引き継ぐ
+                    listed[key]['md5'] = self.objects[key]['md5']
+            self.objects.update(listed)
+            self.prefixes[prefix] = _utcnow().isoformat()
+        return listed
+
+    def sync(self, prefixes, force=False):
+        """TTL切れ・未同期のプレフィックスのみ同期"""
+        synced = 0
+        for prefix in prefixes:
+            if force or not self.is_fresh(prefix):
+                self.sync_prefix(prefix)
+                synced += 1
+        self.log(f"[INVENTORY] Synced {synced}/{len(prefixes)} prefixes ({self.request_count} requests)")
+        return synced
+
+    def keys(self, prefix=''):
+        return {key for key in self.objects if key.startswith(prefix)}
+
+    def etag(self, key):
+        entry = self.objects.get(key)
+        return entry['etag'] if entry else None
+
+    def matches(self, key, md5):
+        """リモートの内容が md5 と同一か（単一パートのETag、またはアップロード時に記録した内容ハッシュで判定）"""
+        entry = self.objects.get(key)
+        if entry is None:
+            return False
+        return entry['etag'] == md5 or entry.get('md5') == md5
+
+    def record_put(self, key, etag, size, md5=None):
+        with self._lock:
+            self.objects[key] = {
+                'etag': (etag or '').strip('"'),
+                'size': size,
+                'last_modified': _utcnow().isoformat(),
+            }
+            if md5:
+                self.objects[key]['md5'] = md5
+
+    def delete_keys(self, keys):
+        """delete_objects で最大1000件ずつ削除し、成功分を台帳から除く"""
+        keys = sorted(keys)
+        deleted = []
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[i:i + DELETE_BATCH_SIZE]
+            try:
+                response = self.s3.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+                self.request_count += 1
+            except Exception as e:
+                self.log(f"[ERROR] Failed to delete batch of {len(batch)} keys: {e}")
+                continue
+
+            failed = {err['Key'] for err in response.get('Errors', [])}
+            for err in response.get('Errors', []):
+                self.log(f"[ERROR] Failed to delete key: {err['Key']} - {err.get('Message')}")
+            ok = [key for key in batch if key not in failed]
+            with self._lock:
+                for key in ok:
+                    self.objects.pop(key, None)
+            deleted.extend(ok)
+        return deleted
+
+    def cleanup(self, valid_key_re, prefixes):
+        """同期済みプレフィックス配下で命名規則に合わないキーを一括削除"""
+        prefixes = tuple(prefixes)
+        invalid = [
+            key for key in self.objects
+            if key.startswith(prefixes) and not valid_key_re.match(key)
+        ]
+        if not invalid:
+            return []
+        deleted = self.delete_keys(invalid)
+        for key in deleted:
+            self.log(f"[CLEANUP] Deleted unexpected key: {key}")
+        return deleted
@@ -0,0 +1,162 @@
+"""
+銘柄クラス（FX・貴金属・株価指数）ごとの取引セッションカレンダー
+
+- セッションは NY 時間の週次スケジュールで定義し、期間内の開始・終了時刻を UTC（ナイーブ int64 ns）で
+  まとめて生成する（夏時間の切り替えは tz_localize で処理）
+- 1時刻の判定は二分探索で O(log n)、配列はまとめて np.searchsorted で判定する
+- タイムゾーン無しの時刻は UTC とみなす（tz 引数で変更可）
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+NY_TZ = 'America/New_York'
+
+# 週次スケジュール: [(開始曜日, 開始時, 終了曜日, 終了時), ...]（曜日は 0=月曜 ～ 6=日曜、NY 時間）
+SESSION_RULES = {
+    # 日曜17:00 ～ 金曜17:00
+    'fx': [(6, 17, 4, 17)],
+    # 日曜18:00 ～ 金曜17:00、月～木は17:00～18:00 が休止（CME Globex と同じ）
+    'metals': [(6, 18, 0, 17), (0, 18, 1, 17), (1, 18, 2, 17), (2, 18, 3, 17), (3, 18, 4, 17)],
+    'indices': [(6, 18, 0, 17), (0, 18, 1, 17), (1, 18, 2, 17), (2, 18, 3, 17), (3, 18, 4, 17)],
+}
+
+METAL_PREFIXES = ('XAU', 'XAG', 'XPT', 'XPD', 'GOLD', 'SILVER')
+INDEX_SYMBOLS = {'US30', 'US100', 'US500', 'USTEC', 'NAS100', 'SPX500', 'DJ30', 'US2000'}
+
+
+def symbol_class(symbol):
+    """シンボル名から 'fx' / 'metals' / 'indices' を判定（該当しなければ 'fx'）"""
+    name = symbol.upper().split('.')[0].rstrip('#')  # ブローカーの接尾辞（.cash, # など）を除く
+    if name.startswith(METAL_PREFIXES):
+        return 'metals'
+    if name in INDEX_SYMBOLS:
+        return 'indices'
+    return 'fx'
+
+
+def to_utc_ns(values, tz=None):
+    """時刻の配列を UTC の int64(ns) 配列に変換（タイムゾーン無しは tz、未指定なら UTC とみなす）"""
+    idx = pd.DatetimeIndex(values)
+    if idx.tz is None:
+        if tz is None:
+            return idx.values.astype('datetime64[ns]').view('i8')
+        idx = idx.tz_localize(tz, ambiguous=False, nonexistent='shift_forward')
+    return idx.tz_convert('UTC').tz_localize(None).values.astype('datetime64[ns]').view('i8')
+
+
+def _timestamp_ns(timestamp, tz=None):
+    ts = pd.Timestamp(timestamp)
+    if ts.tzinfo is None and tz is not None:
+        ts = ts.tz_localize(tz, ambiguous=False, nonexistent='shift_forward')
+    return ts.value  # tz 付きは UTC の ns、tz 無しはそのまま UTC とみなす
+
+
+class SessionCalendar:
+    def __init__(self, rule, start_year=2000, end_year=2040, tz=NY_TZ):
+        """
+        Parameters:
+        - rule: SESSION_RULES のキー、または同じ形式の週次スケジュール
+        - start_year, end_year: 事前に生成する期間（範囲外を問い合わせると自動で広げる）
+        - tz: スケジュールのタイムゾーン
+        """
+        self.rule = rule
+        self.weekly = SESSION_RULES[rule] if isinstance(rule, str) else list(rule)
+        self.tz = tz
+        self._lock = threading.Lock()
+        self._build(start_year, end_year)
+
+    def _build(self, start_year, end_year):
+        # 開始の週の月曜日を基準に、各セッションの開始・終了を週単位でずらして生成
+        mondays = pd.date_range(pd.Timestamp(start_year, 1, 1) - pd.Timedelta(days=7),
+                                pd.Timestamp(end_year + 1, 1, 1), freq='W-MON')
+        opens, closes = [], []
+        for open_day, open_hour, close_day, close_hour in self.weekly:
+            open_offset = pd.Timedelta(days=open_day - 7 if open_day > close_day else open_day, hours=open_hour)
+            close_offset = pd.Timedelta(days=close_day, hours=close_hour)
+            opens.append(to_utc_ns(mondays + open_offset, self.tz))
+            closes.append(to_utc_ns(mondays + close_offset, self.tz))
+
+        opens = np.concatenate(opens)
+        closes = np.concatenate(closes)
+        order = np.argsort(opens, kind='stable')
+        # 判定中に範囲の拡張が走っても開始・終了の組が食い違わないよう、1つの属性で入れ替える
+        self._intervals = (opens[order], closes[order])
+        self.start_year, self.end_year = start_year, end_year
+        self._first_ns = to_utc_ns([pd.Timestamp(start_year, 1, 1)])[0]
+        self._last_ns = to_utc_ns([pd.Timestamp(end_year + 1, 1, 1)])[0]
+
+    def _ensure(self, lo_ns, hi_ns):
+        if lo_ns >= self._first_ns and hi_ns < self._last_ns:
+            return
+        with self._lock:
+            start_year = min(self.start_year, pd.Timestamp(lo_ns).year - 1)
+            end_year = max(self.end_year, pd.Timestamp(hi_ns).year + 1)
+            if (start_year, end_year) != (self.start_year, self.end_year):
+                self._build(start_year, end_year)
+
+    @property
+    def opens(self):
+        return self._intervals[0]
+
+    @property
+    def closes(self):
+        return self._intervals[1]
+
+    # === 判定 ===
+    def is_open(self, timestamp=None, tz=None):
+        """1時刻がセッション中か（None は現在時刻）"""
+        t = pd.Timestamp.now(tz='UTC').value if timestamp is None else _timestamp_ns(timestamp, tz)
+        self._ensure(t, t)
+        opens, closes = self._intervals
+        pos = int(np.searchsorted(opens, t, side='right')) - 1
+        return pos >= 0 and t < closes[pos]
+
+    def is_open_array(self, values, tz=None):
+        """時刻の配列に対するセッション中かどうかの bool 配列"""
+        t = to_utc_ns(values, tz)
+        if len(t) == 0:
+            return np.zeros(0, dtype=bool)
+        self._ensure(t.min(), t.max())
+        opens, closes = self._intervals
+        pos = np.searchsorted(opens, t, side='right') - 1
+        valid = pos >= 0
+        mask = np.zeros(len(t), dtype=bool)
+        mask[valid] = t[valid] < closes[pos[valid]]
+        return mask
+
+    def sessions(self, start, end):
+        """
+        [start, end] と重なるセッション（前後1つずつ余分に含む）
+
+        Returns:
+        - (opens, closes): UTCナイーブのint64(ns)配列（昇順）
+        """
+        lo = _timestamp_ns(start)
+        hi = _timestamp_ns(end)
+        self._ensure(lo, hi)
+        opens, closes = self._intervals
+        first = max(int(np.searchsorted(closes, lo, side='left')) - 1, 0)
+        last = int(np.searchsorted(opens, hi, side='right')) + 1
+        return opens[first:last], closes[first:last]
+
+
+_CALENDARS = {}
+_CALENDARS_LOCK = threading.Lock()
+
+
+def calendar_for_class(name):
+    """銘柄クラスごとに1つだけ生成して使い回す"""
+    calendar = _CALENDARS.get(name)
+    if calendar is None:
+        with _CALENDARS_LOCK:
+            calendar = _CALENDARS.get(name)
+            if calendar is None:
+                calendar = _CALENDARS[name] = SessionCalendar(name)
+    return calendar
+
+
+def calendar_for(symbol):
+    return calendar_for_class(symbol_class(symbol))
+
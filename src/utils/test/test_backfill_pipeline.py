@@ -0,0 +1,119 @@
+# moto のS3で補完パイプラインを2回実行（1回目でアップロード、2回目は欠損なし・アップロードなし）
+# アップロードに失敗したパーティションは次の実行で再送される
+import os
+import sys
+
+import boto3
+import pandas as pd
+import pytest
+
+moto = pytest.importorskip("moto")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backfill_pipeline import BackfillPipeline
+from bar_gaps import expected_bar_grid, symbol_sessions
+from bar_store import BarStore
+from s3_inventory import S3Inventory, month_prefixes
+
+BUCKET = "mt5-test"
+WINDOW_START = pd.Timestamp("2024-07-01")
+WINDOW_END = pd.Timestamp("2024-07-09")
+
+
+def fake_fetch_range(calls):
+    """MT5 の代わりに、区間内のセッション中のバーを返す"""
+    def fetch_range(symbol, timeframe_str, range_start, range_end):
+        calls.append((symbol, timeframe_str, range_start, range_end))
+        starts, _ = expected_bar_grid(range_start, range_end, timeframe_str,
+                                      symbol_sessions(symbol, range_start, range_end))
+        times = pd.to_datetime(starts)
+        price = 1.1 + pd.Series(range(len(times)), dtype=float) * 1e-5
+        return pd.DataFrame({
+            "symbol": symbol, "time": times, "open": price, "high": price + 1e-4, "low": price - 1e-4,
+            "close": price, "tick_volume": 10, "spread": 1, "real_volume": 0,
+        })
+    return fetch_range
+
+
+def run_backfill(s3, tmp_path, calls, **kwargs):
+    store = BarStore(str(tmp_path / "bars"))
+    inventory = S3Inventory(s3, BUCKET, str(tmp_path / "inventory.json"), log=lambda msg: None)
+    inventory.sync(month_prefixes(["EURUSD"], ["M5"], WINDOW_START, WINDOW_END))
+    pipeline = BackfillPipeline(s3, BUCKET, fake_fetch_range(calls), store, upload_workers=2, upload_rate=0,
+                                inventory=inventory, log=lambda msg: None, **kwargs)
+    stats = pipeline.run([("EURUSD", "M5")], WINDOW_START, WINDOW_END)
+    inventory.save()
+    return pipeline, stats
+
+
+def test_second_run_finds_nothing_to_upload(tmp_path):
+    with moto.mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+
+        first_calls = []
+        first, stats = run_backfill(s3, tmp_path, first_calls)
+        keys = sorted(obj["Key"] for obj in s3.list_objects_v2(Bucket=BUCKET)["Contents"])
+        assert first_calls
+        assert stats['upload'].errors == 0 and stats['transform'].errors == 0
+        # 7/1(月) ～ 7/8(月) のうち、セッション中のバーがある日（土曜以外）
+        assert len(keys) == 7
+        assert sorted(first.uploaded_keys) == keys
+        assert keys[0] == "EURUSD/timeframe=M5/year=2024/month=07/day=01/EURUSD_M5.csv"
+
+        second_calls = []
+        second, stats = run_backfill(s3, tmp_path, second_calls)
+        assert second_calls == []
+        assert second.uploaded_keys == []
+        assert stats['upload'].items == 0
+        assert stats['upload'].skipped == 7
+
+
+def test_failed_upload_is_repaired_next_run(tmp_path):
+    failing_key = "EURUSD/timeframe=M5/year=2024/month=07/day=03/EURUSD_M5.csv"
+
+    def fail_put(params, **kwargs):
+        if params["Key"] == failing_key:
+            raise ConnectionError("injected put_object failure")
+
+    with moto.mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+
+        s3.meta.events.register("before-parameter-build.s3.PutObject", fail_put)
+        first, stats = run_backfill(s3, tmp_path, [], max_retries=0)
+        s3.meta.events.unregister("before-parameter-build.s3.PutObject", fail_put)
+        keys = {obj["Key"] for obj in s3.list_objects_v2(Bucket=BUCKET)["Contents"]}
+        assert stats['upload'].errors == 1
+        assert failing_key not in keys and len(keys) == 6
+        # 失敗したキーの月次プレフィックスは次回 TTL 内でも列挙し直す
+        assert not first.inventory.is_fresh(month_prefixes(["EURUSD"], ["M5"], WINDOW_START, WINDOW_START)[0])
+
+        # ローカルには保存済みなので欠損は無いが、台帳に無いパーティションとして再送される
+        calls = []
+        second, stats = run_backfill(s3, tmp_path, calls, max_retries=0)
+        keys = {obj["Key"] for obj in s3.list_objects_v2(Bucket=BUCKET)["Contents"]}
+        assert calls == []
+        assert second.uploaded_keys == [failing_key]
+        assert stats['upload'].skipped == 6 and stats['upload'].errors == 0
+        assert failing_key in keys and len(keys) == 7
+
+
+def test_format_switch_replaces_old_objects(tmp_path):
+    with moto.mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+        run_backfill(s3, tmp_path, [])
+
+        # 形式を変えると全日を新しい形式でアップロードし、旧形式のオブジェクトは削除
+        switched, stats = run_backfill(s3, tmp_path, [], upload_format="csv.gz")
+        keys = sorted(obj["Key"] for obj in s3.list_objects_v2(Bucket=BUCKET)["Contents"])
+        assert len(keys) == 7 and all(key.endswith(".csv.gz") for key in keys)
+        assert sorted(switched.uploaded_keys) == keys
+        assert sorted(switched.replaced_keys) == [key[:-len(".gz")] for key in keys]
+        assert not any(key.endswith(".csv") for key in switched.inventory.objects)
+
+        # 同じ内容は台帳のハッシュ一致でスキップ（削除対象も無い）
+        unchanged, stats = run_backfill(s3, tmp_path, [], upload_format="csv.gz")
+        assert unchanged.uploaded_keys == [] and unchanged.replaced_keys == []
+        assert stats['upload'].skipped == 7 and stats['upload'].items == 0
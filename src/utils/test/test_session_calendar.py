@@ -0,0 +1,98 @@
+# 取引セッションカレンダー: 夏時間の切り替え、週の開始・終了の境界、配列判定と1時刻判定の一致、範囲の自動拡張
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from session_calendar import NY_TZ, SessionCalendar, calendar_for, symbol_class
+
+
+@pytest.mark.parametrize("symbol, expected", [
+    ("EURUSD", "fx"), ("XAUUSD", "metals"), ("GOLD.cash", "metals"), ("US500", "indices"), ("NAS100#", "indices"),
+])
+def test_symbol_class(symbol, expected):
+    assert symbol_class(symbol) == expected
+
+
+@pytest.mark.parametrize("timestamp, expected", [
+    # 夏時間（EDT）は日曜 21:00 UTC に開始、金曜 21:00 UTC に終了
+    ("2024-07-07 20:59:59", False), ("2024-07-07 21:00", True),
+    ("2024-07-12 20:59:59", True), ("2024-07-12 21:00", False),
+    # 冬時間（EST）は 22:00 UTC
+    ("2024-01-07 21:30", False), ("2024-01-07 22:00", True),
+    ("2024-01-12 21:59:59", True), ("2024-01-12 22:00", False),
+    # 土曜は終日休場、週の途中は 24 時間
+    ("2024-07-06 12:00", False), ("2024-07-09 21:30", True),
+])
+def test_fx_weekly_edges(timestamp, expected):
+    assert calendar_for("EURUSD").is_open(timestamp) == expected
+
+
+def test_dst_transition_weeks():
+    fx = calendar_for("EURUSD")
+    # 2024-03-10（日）に夏時間開始: その週の日曜オープンは既に 21:00 UTC
+    assert not fx.is_open("2024-03-10 20:59")
+    assert fx.is_open("2024-03-10 21:00")
+    # 前の金曜は冬時間のまま 22:00 UTC に終了
+    assert fx.is_open("2024-03-08 21:30")
+    assert not fx.is_open("2024-03-08 22:00")
+    # 2024-11-03（日）に冬時間へ戻る: 日曜オープンは 22:00 UTC、前の金曜は 21:00 UTC に終了
+    assert not fx.is_open("2024-11-03 21:30")
+    assert fx.is_open("2024-11-03 22:00")
+    assert not fx.is_open("2024-11-01 21:00")
+
+
+def test_timezone_argument():
+    fx = calendar_for("EURUSD")
+    assert fx.is_open(pd.Timestamp("2024-07-07 17:00", tz=NY_TZ))
+    assert not fx.is_open("2024-07-07 16:59", tz=NY_TZ)
+    # UTC+3 のサーバー時間で金曜 23:59 は NY 16:59（夏時間）
+    assert fx.is_open("2024-07-12 23:59", tz="Etc/GMT-3")
+    assert not fx.is_open("2024-07-13 00:00", tz="Etc/GMT-3")
+
+
+def test_metals_daily_break():
+    gold = calendar_for("XAUUSD")
+    # 月～木の NY 17:00～18:00 は休止（FX は取引中）
+    assert not gold.is_open("2024-07-09 21:30")
+    assert gold.is_open("2024-07-09 22:00")
+    assert calendar_for("EURUSD").is_open("2024-07-09 21:30")
+    # 日曜は 18:00 NY に開始
+    assert not gold.is_open("2024-07-07 21:30")
+    assert gold.is_open("2024-07-07 22:00")
+
+
+@pytest.mark.parametrize("rule", ["fx", "metals"])
+def test_array_matches_single(rule):
+    calendar = SessionCalendar(rule, start_year=2023, end_year=2025)
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp("2023-01-01").value
+    end = pd.Timestamp("2025-12-31").value
+    times = pd.to_datetime(np.sort(rng.integers(start, end, 2000)))
+    # 境界ちょうどと直前の時刻も含める
+    edges = pd.to_datetime(np.concatenate([calendar.opens[:50], calendar.closes[:50]]))
+    times = times.append(edges).append(edges - pd.Timedelta(1, "ns"))
+
+    mask = calendar.is_open_array(times)
+    assert mask.dtype == bool and 0 < mask.mean() < 1
+    assert list(mask) == [calendar.is_open(t) for t in times]
+    assert len(calendar.is_open_array([])) == 0
+
+
+def test_range_grows_on_demand():
+    calendar = SessionCalendar("fx", start_year=2024, end_year=2024)
+    assert (calendar.start_year, calendar.end_year) == (2024, 2024)
+
+    assert calendar.is_open("2030-07-09 12:00")
+    assert calendar.end_year >= 2030 and calendar.start_year == 2024
+    assert not calendar.is_open_array(["2010-07-10 12:00"])[0]
+    assert calendar.start_year <= 2010
+
+    # 広げた後も開始・終了は昇順で、各セッションは開始 < 終了
+    assert np.all(np.diff(calendar.opens) > 0)
+    assert np.all(calendar.opens < calendar.closes)
+    opens, closes = calendar.sessions("2010-07-05", "2010-07-12")
+    assert len(opens) == len(closes) >= 2